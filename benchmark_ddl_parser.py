@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DDL解析对比基准
+比较原有整文件正则解析与逐行流式解析的耗时、内存峰值和解析结果:
+
+    python benchmark_ddl_parser.py [DDL文件 ...]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+from db_structure_analyzer import DDLAnalyzer, DDLStreamParser
+
+DEFAULT_FILES = ['bosnds3.ddl', 'boslportal4.ddl']
+ROUNDS = 3
+
+
+def measure(parse, file_path: str):
+    """返回 (结果, 最短耗时秒数, 内存峰值字节数)"""
+    best = None
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        result = parse(file_path)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    parse(file_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def parse_regex(file_path: str):
+    return DDLAnalyzer().parse_ddl_file_regex(file_path)['tables']
+
+
+def parse_stream(file_path: str):
+    return DDLStreamParser().parse_file(file_path).result()
+
+
+def column_differences(regex_tables, stream_tables):
+    """两种解析都找到的表中，列数或列类型不一致的表"""
+    differences = []
+    for name, table in regex_tables.items():
+        expected = stream_tables.get(name)
+        if expected is None:
+            continue
+        regex_columns = [(column['name'], column['type']) for column in table['columns']]
+        stream_columns = [(column['name'], column['type']) for column in expected['columns']]
+        if regex_columns != stream_columns:
+            differences.append((name, regex_columns, stream_columns))
+    return differences
+
+
+def compare(file_path: str):
+    print(f"\n📄 {file_path} ({os.path.getsize(file_path) / 1024 / 1024:.1f} MB)")
+    print("=" * 60)
+
+    regex_tables, regex_seconds, regex_peak = measure(parse_regex, file_path)
+    schema, stream_seconds, stream_peak = measure(parse_stream, file_path)
+    stream_tables = schema['tables']
+
+    print(f"正则解析: {regex_seconds * 1000:.0f} ms, 内存峰值 {regex_peak / 1024 / 1024:.1f} MB, "
+          f"表 {len(regex_tables)}")
+    print(f"流式解析: {stream_seconds * 1000:.0f} ms, 内存峰值 {stream_peak / 1024 / 1024:.1f} MB, "
+          f"表 {len(stream_tables)}, 索引 {len(schema['indexes'])}, 约束 {len(schema['constraints'])}, "
+          f"表空间 {len(schema['tablespaces'])}")
+
+    missing = sorted(set(stream_tables) - set(regex_tables))
+    temporary = sum(1 for name in missing if stream_tables[name]['temporary'])
+    print(f"\n• 正则解析遗漏的表: {len(missing)} 个（其中临时表 {temporary} 个）")
+    if missing:
+        print(f"  例如: {', '.join(missing[:5])}")
+
+    differences = column_differences(regex_tables, stream_tables)
+    miscounted = [item for item in differences if len(item[1]) != len(item[2])]
+    print(f"• 列解析不一致的表: {len(differences)} 个，其中列数不同 {len(miscounted)} 个（如 NUMBER(18, 2) 被逗号拆开）")
+    for name, regex_columns, stream_columns in (miscounted or differences)[:3]:
+        wrong = [(regex, stream) for regex, stream in zip(regex_columns, stream_columns) if regex != stream]
+        print(f"  {name}: 正则 {len(regex_columns)} 列 / 流式 {len(stream_columns)} 列", end="")
+        if wrong:
+            print(f"，如 {wrong[0][0][0]} {wrong[0][0][1]} → {wrong[0][1][0]} {wrong[0][1][1]}", end="")
+        print()
+
+
+def main() -> int:
+    files = sys.argv[1:] or [file for file in DEFAULT_FILES if os.path.exists(file)]
+    if not files:
+        print("⚠ 未找到DDL文件")
+        return 1
+    for file_path in files:
+        compare(file_path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
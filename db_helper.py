@@ -7,10 +7,17 @@
 
 import cx_Oracle
 import json
+import pickle
+import os
 import pandas as pd
 from typing import Dict, List, Optional
 from pathlib import Path
 
+# 批量加载数据字典时每次往返取回的行数
+CATALOG_ARRAYSIZE = 5000
+# 数据字典本地缓存目录，按 last_ddl_time 判断是否过期
+CATALOG_CACHE_DIR = Path('database_structure') / 'cache'
+
 
 class DatabaseHelper:
     """数据库辅助类"""
@@ -26,6 +33,7 @@ class DatabaseHelper:
         }
         self.connection = None
         self.structure_cache = {}
+        self.catalogs = {}
         
     def connect(self, username: str = None) -> bool:
         """连接数据库"""
@@ -87,19 +95,162 @@ class DatabaseHelper:
             return []
     
     def describe_table(self, table_name: str, schema: str = None) -> Dict:
-        """描述表结构"""
+        """描述表结构（第一次调用时批量加载整个 schema 的数据字典）"""
+        if not self.connection:
+            print("❌ 请先连接数据库")
+            return {}
+        
+        schema = schema or self.config['username'].upper()
+        table_key = f"{schema}.{table_name.upper()}"
+        
+        # 检查缓存
+        if table_key in self.structure_cache:
+            return self.structure_cache[table_key]
+        
+        catalog = self.load_catalog(schema)
+        if table_name.upper() in catalog:
+            return catalog[table_name.upper()]
+        return self._describe_table_single(table_name, schema)
+    
+    def load_catalog(self, schema: str = None, refresh: bool = False) -> Dict[str, Dict]:
+        """批量加载整个 schema 的表结构，返回 {表名: describe_table 格式的结构}
+        
+        列、主键、索引各用一条按 owner 过滤的集合查询取回（cursor.arraysize 为 CATALOG_ARRAYSIZE），
+        结果保存到本地缓存；之后只需查询一次 all_objects 的 MAX(last_ddl_time) 和对象数，未变化时直接读取缓存
+        """
         if not self.connection:
             print("❌ 请先连接数据库")
             return {}
         
+        schema = schema or self.config['username'].upper()
+        if schema in self.catalogs and not refresh:
+            return self.catalogs[schema]
+        
         try:
-            schema = schema or self.config['username'].upper()
-            table_key = f"{schema}.{table_name.upper()}"
-            
-            # 检查缓存
-            if table_key in self.structure_cache:
-                return self.structure_cache[table_key]
+            cursor = self.connection.cursor()
+            cursor.execute("""
+            SELECT MAX(last_ddl_time), COUNT(*)
+            FROM all_objects
+            WHERE owner = :schema AND object_type IN ('TABLE', 'INDEX')
+            """, {'schema': schema})
+            last_ddl_time, object_count = cursor.fetchone()
+            version = [last_ddl_time.isoformat() if last_ddl_time else None, object_count]
             
+            cache_file = CATALOG_CACHE_DIR / f"catalog_{schema}.pickle"
+            catalog = None if refresh else self._load_catalog_cache(cache_file, version)
+            if catalog is None:
+                catalog = self._fetch_catalog(cursor, schema)
+                self._save_catalog_cache(cache_file, version, catalog)
+                print(f"📚 已加载 {schema} 的数据字典: {len(catalog)} 个表")
+            cursor.close()
+        except Exception as e:
+            print(f"❌ 加载数据字典失败: {e}")
+            return {}
+        
+        self.catalogs[schema] = catalog
+        for table_name, table_info in catalog.items():
+            self.structure_cache[f"{schema}.{table_name}"] = table_info
+        return catalog
+    
+    @staticmethod
+    def _fetch_catalog(cursor, schema: str) -> Dict[str, Dict]:
+        """三条集合查询取回整个 schema 的列、主键和索引"""
+        cursor.arraysize = CATALOG_ARRAYSIZE
+        catalog = {}
+        
+        # 获取列信息
+        cursor.execute("""
+        SELECT 
+            c.table_name,
+            c.column_name,
+            c.data_type,
+            c.data_length,
+            c.data_precision,
+            c.data_scale,
+            c.nullable,
+            c.data_default,
+            c.column_id
+        FROM all_tab_columns c
+        JOIN all_tables t ON t.owner = c.owner AND t.table_name = c.table_name
+        WHERE c.owner = :schema
+        ORDER BY c.table_name, c.column_id
+        """, {'schema': schema})
+        for row in cursor:
+            table = catalog.get(row[0])
+            if table is None:
+                table = catalog[row[0]] = {
+                    'schema': schema,
+                    'table_name': row[0],
+                    'columns': [],
+                    'primary_keys': [],
+                    'indexes': [],
+                    'column_count': 0
+                }
+            table['columns'].append({
+                'name': row[1],
+                'type': row[2],
+                'length': row[3],
+                'precision': row[4],
+                'scale': row[5],
+                'nullable': row[6] == 'Y',
+                'default': row[7],
+                'position': row[8]
+            })
+            table['column_count'] += 1
+        
+        # 获取主键信息
+        cursor.execute("""
+        SELECT c.table_name, cc.column_name
+        FROM all_constraints c
+        JOIN all_cons_columns cc ON cc.owner = c.owner AND cc.constraint_name = c.constraint_name
+        WHERE c.owner = :schema AND c.constraint_type = 'P'
+        ORDER BY c.table_name, cc.position
+        """, {'schema': schema})
+        for table_name, column_name in cursor:
+            if table_name in catalog:
+                catalog[table_name]['primary_keys'].append(column_name)
+        
+        # 获取索引信息
+        cursor.execute("""
+        SELECT table_name, index_name, index_type, uniqueness
+        FROM all_indexes
+        WHERE owner = :schema
+        ORDER BY table_name, index_name
+        """, {'schema': schema})
+        for table_name, index_name, index_type, uniqueness in cursor:
+            if table_name in catalog:
+                catalog[table_name]['indexes'].append(
+                    {'name': index_name, 'type': index_type, 'unique': uniqueness == 'UNIQUE'})
+        
+        return catalog
+    
+    @staticmethod
+    def _load_catalog_cache(cache_file: Path, version: list) -> Optional[Dict]:
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️  读取数据字典缓存失败: {e}")
+            return None
+        return cached['tables'] if cached.get('version') == version else None
+    
+    @staticmethod
+    def _save_catalog_cache(cache_file: Path, version: list, catalog: Dict):
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = cache_file.with_suffix('.tmp')
+            with open(temp_file, 'wb') as f:
+                pickle.dump({'version': version, 'tables': catalog}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, cache_file)
+        except Exception as e:
+            print(f"⚠️  保存数据字典缓存失败: {e}")
+    
+    def _describe_table_single(self, table_name: str, schema: str) -> Dict:
+        """逐表查询表结构（数据字典批量加载结果中没有的对象，如视图）"""
+        try:
+            table_key = f"{schema}.{table_name.upper()}"
             cursor = self.connection.cursor()
             
             # 获取列信息
@@ -140,6 +291,7 @@ class DatabaseHelper:
             FROM all_cons_columns cc
             JOIN all_constraints c ON cc.constraint_name = c.constraint_name
             WHERE c.owner = :schema 
+              AND cc.owner = c.owner
               AND c.table_name = :table_name 
               AND c.constraint_type = 'P'
             ORDER BY cc.position
@@ -181,9 +333,9 @@ class DatabaseHelper:
             return {}
     
     def search_tables_by_keyword(self, keyword: str, schema: str = None) -> List[str]:
-        """根据关键词搜索表"""
-        tables = self.get_table_list(schema)
-        return [table for table in tables if keyword.upper() in table.upper()]
+        """根据关键词搜索表（在已加载的数据字典中查找）"""
+        catalog = self.load_catalog(schema)
+        return sorted(table for table in catalog if keyword.upper() in table.upper())
     
     def search_columns_by_keyword(self, keyword: str, schema: str = None) -> List[Dict]:
         """根据关键词搜索列"""
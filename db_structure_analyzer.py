@@ -6,11 +6,512 @@
 """
 
 import os
+import io
+import argparse
 import re
 import json
+import zlib
+import pickle
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Tuple
 from pathlib import Path
 
+from schema_store import store_path, write_store
+
+# 含字符串、引号标识符或注释的行逐个匹配；未闭合的字符串延续到下一行
+_TOKEN_RE = re.compile(r"""\s+|--.*|/\*|'(?:[^']|'')*'?|"[^"]*"|[A-Za-z_][\w$#]*|\d+(?:\.\d+)?|\S""")
+# 字符串的剩余部分（到闭合引号为止）
+_STRING_TAIL_RE = re.compile(r"(?:[^']|'')*'")
+# PL/SQL 块内部含分号，以单独一行的 / 结束
+_PLSQL_RE = re.compile(r'\s*(?:CREATE\s+(?:OR\s+REPLACE\s+)?(?:EDITIONABLE\s+)?'
+                       r'(?:TRIGGER|PROCEDURE|FUNCTION|PACKAGE|TYPE)|DECLARE|BEGIN)\b', re.IGNORECASE)
+
+# 列定义中类型之后的关键字
+_COLUMN_KEYWORDS = {'DEFAULT', 'NOT', 'NULL', 'CONSTRAINT', 'PRIMARY', 'UNIQUE', 'CHECK', 'REFERENCES',
+                    'ENABLE', 'DISABLE', 'COLLATE', 'GENERATED', 'VISIBLE', 'INVISIBLE', 'SORT', 'ENCRYPT'}
+_CONSTRAINT_KEYWORDS = {'CONSTRAINT', 'PRIMARY', 'UNIQUE', 'CHECK', 'FOREIGN'}
+
+
+def _name(token: str) -> str:
+    return token.strip('"')
+
+
+def _render(tokens: List[str]) -> str:
+    """把记号还原为紧凑的 SQL 文本，如 NUMBER(18, 2)、DEFAULT 'Y' NOT NULL"""
+    text = ''
+    for token in tokens:
+        if text and token not in ('(', ')', ',', '.') and text[-1] not in '(.':
+            text += ' '
+        text += token
+    return text
+
+
+def _split_group(tokens: List[str], start: int) -> Tuple[List[List[str]], int]:
+    """tokens[start] 为 '('，按最外层逗号切分括号内的内容，返回 (各项记号, 右括号之后的位置)"""
+    items, current, depth = [], [], 0
+    for index in range(start, len(tokens)):
+        token = tokens[index]
+        if token == '(':
+            depth += 1
+            if depth == 1:
+                continue
+        elif token == ')':
+            depth -= 1
+            if depth == 0:
+                if current:
+                    items.append(current)
+                return items, index + 1
+        elif token == ',' and depth == 1:
+            items.append(current)
+            current = []
+            continue
+        current.append(token)
+    if current:
+        items.append(current)
+    return items, len(tokens)
+
+
+def _qualified(tokens: List[str], index: int) -> Tuple[str, str, int]:
+    """解析 schema.name 或 name，返回 (schema, name, 下一个位置)"""
+    if index + 2 < len(tokens) and tokens[index + 1] == '.':
+        return _name(tokens[index]), _name(tokens[index + 2]), index + 3
+    return None, _name(tokens[index]), index + 1
+
+
+def _keyword_value(tokens: List[str], keyword: str, start: int = 0):
+    """最外层 keyword 之后的记号，如 TABLESPACE 之后的表空间名"""
+    depth = 0
+    for index in range(start, len(tokens) - 1):
+        token = tokens[index]
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0 and token.upper() == keyword:
+            return _name(tokens[index + 1])
+    return None
+
+
+class DDLStreamParser:
+    """DDL 单遍流式解析器
+
+    逐行切分记号，跟踪跨行字符串、块注释和 PL/SQL 块的状态，遇到语句结束的分号即解析该语句，
+    只在内存中保留当前语句的记号。解析表、索引、约束、表空间及列注释
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.indexes = {}
+        self.constraints = {}
+        self.tablespaces = {}
+        self.comments = {}
+        self._tokens = []
+        self._string = None
+        self._in_comment = False
+        self._in_plsql = False
+
+    def parse_file(self, file_path: str) -> 'DDLStreamParser':
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                self.feed(line)
+        self.close()
+        return self
+
+    def feed(self, line: str):
+        """读入一行"""
+        if self._in_plsql:
+            if line.strip() == '/':
+                self._in_plsql = False
+            return
+
+        position = 0
+        if self._in_comment:
+            end = line.find('*/')
+            if end < 0:
+                return
+            self._in_comment = False
+            position = end + 2
+        elif self._string is not None:
+            match = _STRING_TAIL_RE.match(line)
+            if match is None:
+                self._string += line
+                return
+            self._tokens.append(self._string + match.group())
+            self._string = None
+            position = match.end()
+        elif not self._tokens and _PLSQL_RE.match(line):
+            self._in_plsql = True
+            return
+
+        if position == 0 and "'" not in line and '"' not in line and '--' not in line and '/*' not in line:
+            # 不含字符串和注释的普通行（绝大多数行），在结构符号两侧补空格后按空白切分
+            tokens = line.replace('(', ' ( ').replace(')', ' ) ').replace(',', ' , ').replace('.', ' . ').split()
+            if ';' not in line:
+                self._tokens.extend(tokens)
+                return
+            tokens = ' '.join(tokens).replace(';', ' ; ').split()
+        else:
+            tokens = self._scan(line, position)
+
+        for token in tokens:
+            if token == ';':
+                self._finish()
+            else:
+                self._tokens.append(token)
+
+    def _scan(self, line: str, position: int) -> List[str]:
+        """逐个匹配含字符串或注释的行"""
+        tokens = []
+        while position < len(line):
+            match = _TOKEN_RE.match(line, position)
+            token = match.group()
+            position = match.end()
+            first = token[0]
+            if first.isspace():
+                continue
+            if token.startswith('--'):
+                break
+            if token == '/*':
+                end = line.find('*/', position)
+                if end < 0:
+                    self._in_comment = True
+                    break
+                position = end + 2
+                continue
+            if first == "'" and not _STRING_TAIL_RE.fullmatch(token, 1):
+                self._string = token + line[position:]
+                break
+            tokens.append(token)
+        return tokens
+
+    def close(self):
+        """文件结束时解析最后一条未以分号结束的语句"""
+        self._finish()
+
+    def _finish(self):
+        tokens, self._tokens = self._tokens, []
+        while tokens and tokens[0] == '/':
+            tokens = tokens[1:]
+        if len(tokens) < 3:
+            return
+
+        words = [token.upper() for token in tokens[:5]]
+        if words[0] == 'CREATE':
+            index = 1
+            while index < len(words) and words[index] in ('GLOBAL', 'TEMPORARY', 'UNIQUE', 'BITMAP',
+                                                          'SMALLFILE', 'BIGFILE', 'UNDO'):
+                index += 1
+            kind = words[index] if index < len(words) else None
+            if kind == 'TABLE':
+                self._create_table(tokens, index + 1, 'TEMPORARY' in words[1:index])
+            elif kind == 'INDEX':
+                self._create_index(tokens, index + 1, 'UNIQUE' in words[1:index], 'BITMAP' in words[1:index])
+            elif kind == 'TABLESPACE':
+                self._create_tablespace(tokens, index + 1, words[1:index])
+        elif words[:2] == ['ALTER', 'TABLE']:
+            self._alter_table(tokens)
+        elif words[:2] == ['COMMENT', 'ON']:
+            self._comment(tokens)
+
+    def _create_table(self, tokens: List[str], index: int, temporary: bool):
+        schema, table_name, index = _qualified(tokens, index)
+        columns = []
+        if index < len(tokens) and tokens[index] == '(':
+            items, index = _split_group(tokens, index)
+            for item in items:
+                if item[0].upper() in _CONSTRAINT_KEYWORDS:
+                    self._add_constraint(table_name, item)
+                elif len(item) >= 2:
+                    columns.append(self._column(item))
+
+        self.tables[table_name] = {
+            'schema': schema,
+            'name': table_name,
+            'columns': columns,
+            'column_count': len(columns),
+            'temporary': temporary,
+            'tablespace': _keyword_value(tokens, 'TABLESPACE', index)
+        }
+
+    @staticmethod
+    def _column(item: List[str]) -> Dict:
+        """列定义：名称、类型（含精度，如 NUMBER(18, 2)）、是否可空"""
+        end = 2
+        while end < len(item):
+            if item[end] == '(':
+                end = item.index(')', end) + 1
+            elif item[end][0].isalpha() and item[end].upper() not in _COLUMN_KEYWORDS:
+                end += 1
+            else:
+                break
+        if end == len(item):
+            nullable = True
+        else:
+            options = ' '.join(item[end:]).upper()
+            nullable = 'NOT NULL' not in options and 'PRIMARY' not in options
+        return {
+            'name': _name(item[0]),
+            'type': _render(item[1:end]),
+            'nullable': nullable,
+            'definition': _render(item)
+        }
+
+    def _create_index(self, tokens: List[str], index: int, unique: bool, bitmap: bool):
+        schema, index_name, index = _qualified(tokens, index)
+        if index >= len(tokens) or tokens[index].upper() != 'ON':
+            return
+        _, table_name, index = _qualified(tokens, index + 1)
+        columns = []
+        if index < len(tokens) and tokens[index] == '(':
+            items, index = _split_group(tokens, index)
+            for item in items:
+                if len(item) > 1 and item[-1].upper() == 'ASC':
+                    item = item[:-1]
+                columns.append(_name(item[0]) if len(item) == 1 else _render(item))
+
+        self.indexes[index_name] = {
+            'schema': schema,
+            'name': index_name,
+            'table': table_name,
+            'columns': columns,
+            'unique': unique,
+            'bitmap': bitmap,
+            'tablespace': _keyword_value(tokens, 'TABLESPACE', index)
+        }
+
+    def _create_tablespace(self, tokens: List[str], index: int, modifiers: List[str]):
+        name = _name(tokens[index])
+        self.tablespaces[name] = {
+            'name': name,
+            'modifiers': modifiers,
+            'options': _render(tokens[index + 1:])
+        }
+
+    def _alter_table(self, tokens: List[str]):
+        _, table_name, index = _qualified(tokens, 2)
+        if index < len(tokens) and tokens[index].upper() == 'ADD':
+            self._add_constraint(table_name, tokens[index + 1:])
+
+    def _add_constraint(self, table_name: str, tokens: List[str]):
+        """CONSTRAINT name PRIMARY KEY|UNIQUE|FOREIGN KEY|CHECK (...)
+
+        未命名的约束以 表名_类型_定义的CRC32 命名，只取决于约束本身，分块解析时名称不变
+        """
+        index = 2 if tokens[0].upper() == 'CONSTRAINT' else 0
+        if index >= len(tokens):
+            return
+
+        kind = tokens[index].upper()
+        if index:
+            name = _name(tokens[1])
+        else:
+            name = f"{table_name}_{kind.lower()}_{zlib.crc32(_render(tokens).encode('utf-8')):08x}"
+        if kind in ('PRIMARY', 'FOREIGN'):
+            kind += ' KEY'
+            index += 1
+        index += 1
+        items, index = _split_group(tokens, index) if index < len(tokens) and tokens[index] == '(' else ([], index)
+
+        constraint = {'name': name, 'table': table_name, 'type': kind}
+        if kind == 'CHECK':
+            constraint['condition'] = ', '.join(_render(item) for item in items)
+        else:
+            constraint['columns'] = [_name(item[0]) for item in items]
+
+        upper = [token.upper() for token in tokens]
+        if 'REFERENCES' in upper[index:]:
+            position = upper.index('REFERENCES', index)
+            _, referenced, position = _qualified(tokens, position + 1)
+            referenced_columns = []
+            if position < len(tokens) and tokens[position] == '(':
+                columns, position = _split_group(tokens, position)
+                referenced_columns = [_name(item[0]) for item in columns]
+            constraint['references'] = {'table': referenced, 'columns': referenced_columns}
+            if upper[position:position + 2] == ['ON', 'DELETE']:
+                constraint['on_delete'] = 'CASCADE' if upper[position + 2] == 'CASCADE' else 'SET NULL'
+        tablespace = _keyword_value(tokens, 'TABLESPACE', index)
+        if tablespace:
+            constraint['tablespace'] = tablespace
+        self.constraints[name] = constraint
+
+    def _comment(self, tokens: List[str]):
+        """COMMENT ON TABLE|COLUMN ... IS '...'"""
+        upper = [token.upper() for token in tokens]
+        if 'IS' not in upper or not tokens[-1].startswith("'"):
+            return
+        target = [_name(token) for token in tokens[3:upper.index('IS')] if token != '.']
+        text = tokens[-1][1:-1].replace("''", "'")
+        if upper[2] == 'COLUMN' and len(target) >= 2:
+            self.comments[(target[-2], target[-1])] = text
+        elif upper[2] == 'TABLE' and target:
+            self.comments[(target[-1], None)] = text
+
+    def merge(self, other: 'DDLStreamParser') -> 'DDLStreamParser':
+        """按文件顺序合并后一个语句块的解析结果"""
+        self.tables.update(other.tables)
+        self.indexes.update(other.indexes)
+        self.constraints.update(other.constraints)
+        self.tablespaces.update(other.tablespaces)
+        self.comments.update(other.comments)
+        return self
+
+    def result(self) -> Dict:
+        """把主键、索引、注释关联到各表，返回解析结果"""
+        for table in self.tables.values():
+            table['primary_key'] = []
+            table['indexes'] = []
+        for constraint in self.constraints.values():
+            table = self.tables.get(constraint['table'])
+            if table is not None and constraint['type'] == 'PRIMARY KEY':
+                table['primary_key'] = constraint['columns']
+        for index_name, index in self.indexes.items():
+            table = self.tables.get(index['table'])
+            if table is not None:
+                table['indexes'].append(index_name)
+        for (table_name, column_name), text in self.comments.items():
+            table = self.tables.get(table_name)
+            if table is None:
+                continue
+            if column_name is None:
+                table['comment'] = text
+                continue
+            for column in table['columns']:
+                if column['name'] == column_name:
+                    column['comment'] = text
+                    break
+
+        return {
+            'tables': self.tables,
+            'indexes': self.indexes,
+            'constraints': self.constraints,
+            'tablespaces': self.tablespaces
+        }
+
+
+# 超过该大小的DDL文件按语句边界切分为多个块，由进程池并行解析
+CHUNK_BYTES = 1024 * 1024
+# 解析结果缓存的格式版本，解析逻辑变化时递增使旧缓存失效
+PARSE_CACHE_VERSION = 1
+# 顶格书写的语句开头，前一个非空行以 ; 或 / 结束时视为语句边界
+_STATEMENT_START_RE = re.compile(rb'(?:CREATE|ALTER|COMMENT)\s', re.IGNORECASE)
+
+
+def split_statement_chunks(file_path: str, chunk_bytes: int = CHUNK_BYTES) -> List[Tuple[int, int]]:
+    """把文件切分为约 chunk_bytes 大小的 (起始偏移, 结束偏移) 块，每块都从一条语句的开头开始"""
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, 'rb') as f:
+        target = chunk_bytes
+        while target < size:
+            f.seek(target)
+            f.readline()  # 跳过可能不完整的一行
+            previous = b''
+            boundary = size
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if _STATEMENT_START_RE.match(line) and (previous.endswith(b';') or previous == b'/'):
+                    boundary = offset
+                    break
+                if line.strip():
+                    previous = line.strip()
+            if boundary >= size:
+                break
+            bounds.append(boundary)
+            target = boundary + chunk_bytes
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_chunk(file_path: str, start: int, end: int) -> DDLStreamParser:
+    """解析文件中的一个语句块（进程池任务）"""
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    parser = DDLStreamParser()
+    for line in io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='ignore'):
+        parser.feed(line)
+    parser.close()
+    return parser
+
+
+def file_digest(file_path: str) -> str:
+    """文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_cached_schema(cache_file: Path, digest: str):
+    if not cache_file.exists():
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception as e:
+        print(f"⚠ 读取解析缓存 {cache_file} 失败: {e}")
+        return None
+    if cached.get('version') != PARSE_CACHE_VERSION or cached.get('digest') != digest:
+        return None
+    return cached['schema']
+
+
+def _save_cached_schema(cache_file: Path, digest: str, schema: Dict):
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = cache_file.with_suffix('.tmp')
+    with open(temp_file, 'wb') as f:
+        pickle.dump({'version': PARSE_CACHE_VERSION, 'digest': digest, 'schema': schema}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, cache_file)
+
+
+def parse_ddl_files(ddl_files: List[str], cache_dir: Path = None, workers: int = None,
+                    chunk_bytes: int = CHUNK_BYTES) -> Tuple[Dict[str, Dict], set]:
+    """解析多个DDL文件，返回 ({文件: 解析结果}, 命中缓存的文件集合)
+
+    内容未变化（SHA-256 与缓存一致）的文件直接读取缓存；其余文件切分为语句块后由进程池并行解析，
+    各块结果按文件顺序合并，与整文件顺序解析的结果相同
+    """
+    schemas, cached, digests, tasks = {}, set(), {}, []
+    for file_path in ddl_files:
+        if cache_dir is not None:
+            digests[file_path] = file_digest(file_path)
+            schema = _load_cached_schema(cache_dir / f"{Path(file_path).stem}.pickle", digests[file_path])
+            if schema is not None:
+                schemas[file_path] = schema
+                cached.add(file_path)
+                continue
+        for start, end in split_statement_chunks(file_path, chunk_bytes):
+            tasks.append((file_path, start, end))
+
+    if not tasks:
+        return schemas, cached
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    print(f"正在解析 {len(set(task[0] for task in tasks))} 个文件（{len(tasks)} 个语句块，{workers} 个进程）...")
+    if workers == 1:
+        parsers = [parse_chunk(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsers = list(executor.map(parse_chunk, *zip(*tasks)))
+
+    merged = {}
+    for (file_path, _, _), parser in zip(tasks, parsers):
+        if file_path in merged:
+            merged[file_path].merge(parser)
+        else:
+            merged[file_path] = parser
+    for file_path, parser in merged.items():
+        schemas[file_path] = parser.result()
+        if cache_dir is not None:
+            _save_cached_schema(cache_dir / f"{Path(file_path).stem}.pickle", digests[file_path], schemas[file_path])
+    return schemas, cached
+
 
 class DDLAnalyzer:
     """DDL文件分析器"""
@@ -21,17 +522,20 @@ class DDLAnalyzer:
         self.constraints = {}
         
     def parse_ddl_file(self, file_path: str) -> Dict:
-        """解析DDL文件"""
+        """解析DDL文件（逐行流式解析表、索引、约束和表空间）"""
         print(f"正在解析文件: {file_path}")
         
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
+        return self.build_analysis(file_path, DDLStreamParser().parse_file(file_path).result())
+    
+    def build_analysis(self, file_path: str, schema: Dict) -> Dict:
+        """由解析结果生成分析结果"""
         # 提取数据库名称
         db_name = self._extract_db_name(file_path)
         
-        # 解析表结构
-        tables = self._parse_tables(content, db_name)
+        tables = schema['tables']
+        self.tables.update(tables)
+        self.indexes.update(schema['indexes'])
+        self.constraints.update(schema['constraints'])
         
         # 按功能模块分类
         categorized_tables = self._categorize_tables(tables)
@@ -39,10 +543,30 @@ class DDLAnalyzer:
         return {
             'database': db_name,
             'total_tables': len(tables),
+            'total_indexes': len(schema['indexes']),
+            'total_constraints': len(schema['constraints']),
             'tables': tables,
+            'indexes': schema['indexes'],
+            'constraints': schema['constraints'],
+            'tablespaces': schema['tablespaces'],
             'categories': categorized_tables
         }
     
+    def parse_ddl_file_regex(self, file_path: str) -> Dict:
+        """原有的整文件正则解析，仅保留用于与流式解析对比"""
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+        
+        db_name = self._extract_db_name(file_path)
+        tables = self._parse_tables(content, db_name)
+        
+        return {
+            'database': db_name,
+            'total_tables': len(tables),
+            'tables': tables,
+            'categories': self._categorize_tables(tables)
+        }
+    
     def _extract_db_name(self, file_path: str) -> str:
         """从文件路径提取数据库名称"""
         filename = os.path.basename(file_path)
@@ -181,7 +705,8 @@ def create_directory_structure():
         'tables_by_module',
         'field_references',
         'analysis_reports',
-        'sql_templates'
+        'sql_templates',
+        'cache'
     ]
     
     for directory in directories:
@@ -190,33 +715,44 @@ def create_directory_structure():
     return base_dir
 
 
-def analyze_databases():
-    """分析数据库结构"""
+def analyze_databases(workers: int = None, use_cache: bool = True):
+    """分析数据库结构（多文件并行解析，内容未变化的文件使用缓存）"""
     analyzer = DDLAnalyzer()
     base_dir = create_directory_structure()
     
     # DDL文件列表
     ddl_files = ['bosnds3.ddl', 'boslportal4.ddl']
-    
-    all_analysis = {}
-    
+    existing_files = []
     for ddl_file in ddl_files:
         if os.path.exists(ddl_file):
-            print(f"\n开始分析 {ddl_file}...")
-            analysis = analyzer.parse_ddl_file(ddl_file)
-            all_analysis[analysis['database']] = analysis
-            
-            # 保存数据库架构概览
-            with open(base_dir / 'schemas' / f"{analysis['database']}_schema.json", 'w', encoding='utf-8') as f:
-                json.dump(analysis, f, ensure_ascii=False, indent=2)
-            
-            # 按模块保存表结构
-            save_tables_by_module(analysis, base_dir)
-            
-            print(f"✓ {analysis['database']} 分析完成，共发现 {analysis['total_tables']} 个表")
+            existing_files.append(ddl_file)
         else:
             print(f"⚠ 文件不存在: {ddl_file}")
     
+    schemas, cached = parse_ddl_files(existing_files, base_dir / 'cache' if use_cache else None, workers)
+    
+    all_analysis = {}
+    
+    for ddl_file in existing_files:
+        analysis = analyzer.build_analysis(ddl_file, schemas[ddl_file])
+        all_analysis[analysis['database']] = analysis
+        schema_file = base_dir / 'schemas' / f"{analysis['database']}_schema.json"
+        
+        if ddl_file in cached and schema_file.exists():
+            print(f"✓ {ddl_file} 未变化，使用缓存的解析结果")
+            continue
+        
+        # 保存数据库架构概览，及供快速浏览器按需读取的紧凑存储
+        with open(schema_file, 'w', encoding='utf-8') as f:
+            json.dump(analysis, f, ensure_ascii=False, indent=2)
+        write_store(store_path(schema_file), analysis)
+        
+        # 按模块保存表结构
+        save_tables_by_module(analysis, base_dir)
+        
+        print(f"✓ {analysis['database']} 分析完成，共发现 {analysis['total_tables']} 个表、"
+              f"{analysis['total_indexes']} 个索引、{analysis['total_constraints']} 个约束")
+    
     # 生成总体分析报告
     generate_analysis_report(all_analysis, base_dir)
     
@@ -255,6 +791,10 @@ def generate_analysis_report(all_analysis: Dict, base_dir: Path):
         for db_name, analysis in all_analysis.items():
             f.write(f"## {db_name} 数据库\n\n")
             f.write(f"- 总表数: {analysis['total_tables']}\n")
+            f.write(f"- 索引数: {analysis['total_indexes']}\n")
+            f.write(f"- 约束数: {analysis['total_constraints']}\n")
+            if analysis['tablespaces']:
+                f.write(f"- 表空间: {', '.join(analysis['tablespaces'])}\n")
             
             f.write("\n### 按模块分类:\n\n")
             for category, tables in analysis['categories'].items():
@@ -268,6 +808,11 @@ def generate_analysis_report(all_analysis: Dict, base_dir: Path):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据库结构分析器")
+    parser.add_argument('--workers', type=int, help="并行解析的进程数，默认为CPU核数")
+    parser.add_argument('--no-cache', action='store_true', help="忽略解析缓存，重新解析全部DDL文件")
+    args = parser.parse_args()
+    
     print("🔍 数据库结构分析器启动...")
-    analysis_result = analyze_databases()
+    analysis_result = analyze_databases(args.workers, not args.no_cache)
     print("\n✅ 分析完成！请查看 database_structure 目录中的结果文件。") 
\ No newline at end of file
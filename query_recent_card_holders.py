@@ -7,6 +7,8 @@
 - 按手机号码降序排列
 """
 
+import argparse
+import csv
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -15,6 +17,65 @@ from db_helper import DatabaseHelper
 import pandas as pd
 from datetime import datetime
 
+# 最近开卡的10个人，第10个人的开卡日期即为查询起始日期
+TOP10_QUERY_SQL = """
+    SELECT * FROM (
+        SELECT 
+            TO_DATE(TO_CHAR(ENTERDATE), 'YYYYMMDD') as CARD_DATE,
+            COALESCE(MOBIL, PHONE, '0') as SORT_PHONE,
+            ENTERDATE as ORIGINAL_ENTERDATE
+        FROM C_CLIENT_VIP 
+        WHERE ISACTIVE = 'Y'
+            AND ENTERDATE IS NOT NULL
+            AND ENTERDATE > 19700101
+        ORDER BY 
+            ENTERDATE DESC,
+            SORT_PHONE DESC
+    ) WHERE ROWNUM <= 10
+    """
+
+# 查询目标日期及之后的所有会员，按开卡日期、手机号码降序排列
+MAIN_QUERY_SQL = """
+    SELECT 
+        ID,
+        NAME,
+        VIPNAME,
+        PHONE,
+        MOBIL,
+        ADDRESS,
+        EMAIL,
+        ISACTIVE,
+        CREATEDATE,
+        MODIFIERID,
+        MODIFIEDDATE,
+        VIPNO,
+        CARDNO,
+        INTEGRAL,
+        VIPSTATE,
+        ENTERDATE,
+        BIRTHDAY,
+        SEX,
+        C_STORE_ID,
+        C_CUSTOMER_ID,
+        TO_DATE(TO_CHAR(ENTERDATE), 'YYYYMMDD') as CARD_DATE,
+        COALESCE(MOBIL, PHONE, '0') as SORT_PHONE
+    FROM C_CLIENT_VIP 
+    WHERE ISACTIVE = 'Y'
+        AND ENTERDATE IS NOT NULL
+        AND ENTERDATE >= :target_enterdate
+    ORDER BY 
+        ENTERDATE DESC,
+        SORT_PHONE DESC,
+        ID DESC
+    """
+
+# 导出文件的列顺序，方便查看
+OUTPUT_COLUMNS = ['CARD_DATE', 'ID', 'VIPNAME', 'NAME', 'MOBIL', 'PHONE', 'CARDNO',
+                  'INTEGRAL', 'VIPSTATE', 'CREATEDATE', 'MODIFIEDDATE', 'EMAIL', 'ADDRESS']
+
+# 流式导出每次从数据库取回的行数
+DEFAULT_ARRAYSIZE = 5000
+
 def query_recent_card_holders():
     """查询最近开卡的会员信息"""
     # 创建数据库连接
@@ -48,21 +109,7 @@ def query_recent_card_holders():
         # 第一步：找到最近开卡的第10个人的开卡日期
         # 查询最近开卡的10个人，按开卡时间和手机号排序
         # 注意：ENTERDATE是数字格式YYYYMMDD，需要转换为日期格式
-        top10_query_sql = """
-        SELECT * FROM (
-            SELECT 
-                TO_DATE(TO_CHAR(ENTERDATE), 'YYYYMMDD') as CARD_DATE,
-                COALESCE(MOBIL, PHONE, '0') as SORT_PHONE,
-                ENTERDATE as ORIGINAL_ENTERDATE
-            FROM C_CLIENT_VIP 
-            WHERE ISACTIVE = 'Y'
-                AND ENTERDATE IS NOT NULL
-                AND ENTERDATE > 19700101
-            ORDER BY 
-                ENTERDATE DESC,
-                SORT_PHONE DESC
-        ) WHERE ROWNUM <= 10
-        """
+        top10_query_sql = TOP10_QUERY_SQL
         
         # 执行查询获取前10个人
         top10_df = pd.read_sql(top10_query_sql, db.connection)
@@ -78,39 +125,7 @@ def query_recent_card_holders():
         print(f"📅 将显示该日期及之后的所有开卡会员")
         
         # 第二步：查询该日期及之后的所有会员，按手机号码降序排列
-        main_query_sql = """
-        SELECT 
-            ID,
-            NAME,
-            VIPNAME,
-            PHONE,
-            MOBIL,
-            ADDRESS,
-            EMAIL,
-            ISACTIVE,
-            CREATEDATE,
-            MODIFIERID,
-            MODIFIEDDATE,
-            VIPNO,
-            CARDNO,
-            INTEGRAL,
-            VIPSTATE,
-            ENTERDATE,
-            BIRTHDAY,
-            SEX,
-            C_STORE_ID,
-            C_CUSTOMER_ID,
-            TO_DATE(TO_CHAR(ENTERDATE), 'YYYYMMDD') as CARD_DATE,
-            COALESCE(MOBIL, PHONE, '0') as SORT_PHONE
-        FROM C_CLIENT_VIP 
-        WHERE ISACTIVE = 'Y'
-            AND ENTERDATE IS NOT NULL
-            AND ENTERDATE >= :target_enterdate
-        ORDER BY 
-            ENTERDATE DESC,
-            SORT_PHONE DESC,
-            ID DESC
-        """
+        main_query_sql = MAIN_QUERY_SQL
         
         # 执行主查询
         df = pd.read_sql(main_query_sql, db.connection, params={'target_enterdate': target_enterdate})
@@ -121,9 +136,10 @@ def query_recent_card_holders():
             print(f"📊 查询到 {len(df)} 条最近开卡记录：")
             print("=" * 80)
             
-            # 按日期分组显示
+            # 按日期分组显示（各日期人数一次分组算出，不再逐组重新过滤）
             current_date = None
             date_count = 0
+            date_sizes = df.groupby('CARD_DATE').size()
             
             for idx, row in df.iterrows():
                 card_date = row['CARD_DATE']
@@ -134,8 +150,7 @@ def query_recent_card_holders():
                         print(f"\n{'='*50}")
                     current_date = card_date
                     date_count += 1
-                    date_members = df[df['CARD_DATE'] == card_date]
-                    print(f"\n📅 {card_date.strftime('%Y年%m月%d日')} 开卡会员 ({len(date_members)}人):")
+                    print(f"\n📅 {card_date.strftime('%Y年%m月%d日')} 开卡会员 ({date_sizes[card_date]}人):")
                     print("-" * 50)
                 
                 # 确定显示的姓名
@@ -200,8 +215,9 @@ def query_recent_card_holders():
             
             # 手机号码排序验证
             print(f"\n📱 手机号码排序验证 (每个日期内前3个):")
+            top3 = df.groupby('CARD_DATE', sort=False).head(3).groupby('CARD_DATE')
             for date in date_stats.index:
-                date_data = df[df['CARD_DATE'] == date].head(3)
+                date_data = top3.get_group(date)
                 print(f"   {date.strftime('%Y-%m-%d')}:")
                 for _, member in date_data.iterrows():
                     mobile = member['MOBIL'] if pd.notna(member['MOBIL']) else \
@@ -214,9 +230,7 @@ def query_recent_card_holders():
         if not df.empty:
             output_file = f"recent_card_holders_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             # 重新排列列的顺序，方便查看
-            columns_order = ['CARD_DATE', 'ID', 'VIPNAME', 'NAME', 'MOBIL', 'PHONE', 'CARDNO', 
-                           'INTEGRAL', 'VIPSTATE', 'CREATEDATE', 'MODIFIEDDATE', 'EMAIL', 'ADDRESS']
-            df_output = df.reindex(columns=[col for col in columns_order if col in df.columns])
+            df_output = df.reindex(columns=[col for col in OUTPUT_COLUMNS if col in df.columns])
             df_output.to_csv(output_file, index=False, encoding='utf-8-sig')
             print(f"\n💾 查询结果已保存到: {output_file}")
         
@@ -229,6 +243,165 @@ def query_recent_card_holders():
         # 断开数据库连接
         db.disconnect()
 
+class CsvExportWriter:
+    """逐批写入CSV文件，格式与 DataFrame.to_csv 的输出一致"""
+
+    def __init__(self, output_file: str):
+        self.file = open(output_file, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(OUTPUT_COLUMNS)
+
+    def write(self, rows):
+        for row in rows:
+            card_date = row[0].strftime('%Y-%m-%d') if row[0] is not None else ''
+            self.writer.writerow([card_date] + ['' if value is None else value for value in row[1:]])
+
+    def close(self):
+        self.file.close()
+
+class ParquetExportWriter:
+    """逐批写入Parquet文件，每批一个行组，需要安装pyarrow"""
+
+    STRING_COLUMNS = {'VIPNAME', 'NAME', 'MOBIL', 'PHONE', 'CARDNO', 'VIPSTATE', 'EMAIL', 'ADDRESS'}
+
+    def __init__(self, output_file: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {'CARD_DATE': pa.timestamp('s'), 'ID': pa.int64(), 'INTEGRAL': pa.float64(),
+                 'CREATEDATE': pa.timestamp('s'), 'MODIFIEDDATE': pa.timestamp('s')}
+        self.pa = pa
+        self.schema = pa.schema([(column, types.get(column, pa.string())) for column in OUTPUT_COLUMNS])
+        self.writer = pq.ParquetWriter(output_file, self.schema)
+
+    def write(self, rows):
+        arrays = []
+        for field, values in zip(self.schema, zip(*rows)):
+            if field.name in self.STRING_COLUMNS:
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+EXPORT_WRITERS = {'csv': CsvExportWriter, 'parquet': ParquetExportWriter}
+
+def format_enterdate(enterdate) -> str:
+    """ENTERDATE是数字格式YYYYMMDD，转换为可读日期"""
+    enterdate_str = str(int(enterdate))
+    if len(enterdate_str) == 8:
+        return f"{enterdate_str[:4]}-{enterdate_str[4:6]}-{enterdate_str[6:8]}"
+    return enterdate_str
+
+def find_target_enterdate(cursor):
+    """最近开卡的第10个人的ENTERDATE（不足10人则取最后一个），没有开卡记录时返回None"""
+    cursor.execute(TOP10_QUERY_SQL)
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    return int(rows[-1][2])
+
+def stream_recent_card_holders(output_format: str = 'csv', arraysize: int = DEFAULT_ARRAYSIZE,
+                               output_file: str = None, since: int = None):
+    """流式导出最近开卡会员
+
+    按 arraysize 分批 fetchmany，利用 ORDER BY ENTERDATE DESC 边读边按开卡日期分组统计，
+    每批读完即写入CSV/Parquet文件，内存占用只与批大小有关，与导出的总行数无关。
+    返回是否成功；导出中途失败时删除已写入一部分的文件
+    """
+    if output_format not in EXPORT_WRITERS:
+        print(f"❌ 不支持的导出格式: {output_format}")
+        return False
+
+    db = DatabaseHelper()
+    if not db.connect():
+        print("❌ 数据库连接失败")
+        return False
+
+    writer = None
+    started = False
+    completed = False
+    try:
+        cursor = db.connection.cursor()
+
+        if since is None:
+            since = find_target_enterdate(cursor)
+            if since is None:
+                print("📭 没有找到开卡记录")
+                return True
+            print(f"📅 第10个人的开卡日期：{format_enterdate(since)} (ENTERDATE: {since})")
+        print(f"📅 导出 {format_enterdate(since)} 及之后的所有开卡会员")
+
+        output_file = output_file or \
+            f"recent_card_holders_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{output_format}"
+        try:
+            writer = EXPORT_WRITERS[output_format](output_file)
+            started = True
+        except ImportError:
+            print("❌ 导出Parquet需要安装pyarrow")
+            print("请运行: pip install pyarrow")
+            return False
+
+        cursor.arraysize = arraysize
+        cursor.execute(MAIN_QUERY_SQL, target_enterdate=since)
+        positions = {description[0]: index for index, description in enumerate(cursor.description)}
+        output_positions = [positions[column] for column in OUTPUT_COLUMNS]
+        enterdate_position = positions['ENTERDATE']
+
+        print(f"🔍 正在分批导出（每批 {arraysize} 行）...")
+        print(f"   • 各日期开卡人数:")
+        current_date = None
+        date_total = 0
+        date_count = 0
+        total = 0
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            writer.write([[row[position] for position in output_positions] for row in rows])
+
+            # 结果按ENTERDATE降序返回，日期变化即上一个日期的会员已全部读完
+            for row in rows:
+                if row[enterdate_position] != current_date:
+                    if current_date is not None:
+                        print(f"     {format_enterdate(current_date)}: {date_total}人")
+                    current_date = row[enterdate_position]
+                    date_total = 0
+                    date_count += 1
+                date_total += 1
+            total += len(rows)
+
+        if current_date is not None:
+            print(f"     {format_enterdate(current_date)}: {date_total}人")
+        cursor.close()
+
+        print(f"\n📊 统计信息:")
+        print(f"   • 查询到的日期数: {date_count}")
+        print(f"   • 总会员数: {total}")
+        writer.close()
+        writer = None
+        completed = True
+        print(f"\n💾 查询结果已保存到: {output_file}")
+        return True
+
+    except Exception as e:
+        print(f"❌ 导出失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    finally:
+        if writer is not None:
+            try:
+                writer.close()
+            except Exception:
+                pass
+        if started and not completed and os.path.exists(output_file):
+            os.remove(output_file)
+            print(f"🗑️ 已删除未完成的导出文件: {output_file}")
+        db.disconnect()
+
 def query_card_opening_trends():
     """查询开卡趋势统计"""
     db = DatabaseHelper()
@@ -276,6 +449,18 @@ def query_card_opening_trends():
         db.disconnect()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="最近开卡会员查询工具")
+    parser.add_argument('--stream', action='store_true', help="流式导出模式，分批读取并写入文件，不在内存中保留全部结果")
+    parser.add_argument('--format', choices=sorted(EXPORT_WRITERS), default='csv', help="流式导出的文件格式")
+    parser.add_argument('--arraysize', type=int, default=DEFAULT_ARRAYSIZE, help="每批从数据库读取的行数")
+    parser.add_argument('--output', help="导出文件路径，默认按当前时间生成")
+    parser.add_argument('--since', type=int, help="导出该ENTERDATE(YYYYMMDD)及之后的会员，默认取最近开卡的第10个人的日期")
+    args = parser.parse_args()
+
+    if args.stream:
+        ok = stream_recent_card_holders(args.format, args.arraysize, args.output, args.since)
+        sys.exit(0 if ok else 1)
+
     print("🎯 最近开卡会员查询工具")
     print("📋 查询规则：")
     print("   • 查询最近开卡的10个不同日期")
@@ -10,6 +10,9 @@ import os
 from pathlib import Path
 from typing import List, Dict
 
+from schema_search import SchemaSearchIndex
+from schema_store import open_store
+
 
 class QuickBrowser:
     """快速浏览器"""
@@ -19,8 +22,11 @@ class QuickBrowser:
         self.load_structure()
     
     def load_structure(self):
-        """加载数据库结构"""
+        """加载数据库结构（只读取各库紧凑存储的头部，表定义和字段在用到时才解码）"""
         self.databases = {}
+        self.stores = {}
+        self.index = SchemaSearchIndex()
+        self._columns_indexed = False
         
         # 加载数据库架构
         schemas_dir = self.structure_path / 'schemas'
@@ -28,10 +34,23 @@ class QuickBrowser:
             for schema_file in schemas_dir.glob('*.json'):
                 db_name = schema_file.stem.replace('_schema', '')
                 try:
-                    with open(schema_file, 'r', encoding='utf-8') as f:
-                        self.databases[db_name] = json.load(f)
+                    store = open_store(schema_file)
                 except Exception as e:
                     print(f"加载 {schema_file} 失败: {e}")
+                    continue
+                self.stores[db_name] = store
+                self.databases[db_name] = store.header
+                for table_name, (_, _, schema, column_count, comment) in store.header['tables'].items():
+                    self.index.add_table(db_name, table_name, schema, column_count, comment)
+    
+    def _index_columns(self):
+        """第一次搜索字段时才解码各库的字段搜索数据并建立索引"""
+        if self._columns_indexed:
+            return
+        for db_name, store in self.stores.items():
+            for table_name, columns in store.columns().items():
+                self.index.add_columns(db_name, table_name, columns)
+        self._columns_indexed = True
     
     def list_databases(self):
         """列出所有数据库"""
@@ -54,28 +73,17 @@ class QuickBrowser:
             if tables:
                 print(f"📂 {module}: {len(tables)} 个表")
     
-    def search_tables(self, keyword: str, database: str = None):
-        """搜索表名"""
+    def search_tables(self, keyword: str, database: str = None, limit: int = None):
+        """搜索表名（按匹配程度排序，也匹配表注释）"""
         print(f"\n🔍 搜索包含 '{keyword}' 的表:")
         print("=" * 60)
         
-        found_tables = []
-        
-        target_dbs = [database] if database else self.databases.keys()
-        
-        for db_name in target_dbs:
-            if db_name not in self.databases:
-                continue
-                
-            tables = self.databases[db_name]['tables']
-            for table_name, table_info in tables.items():
-                if keyword.lower() in table_name.lower():
-                    found_tables.append({
-                        'database': db_name,
-                        'table': table_name,
-                        'schema': table_info['schema'],
-                        'columns': table_info['column_count']
-                    })
+        found_tables = [{
+            'database': db_name,
+            'table': table_name,
+            'schema': schema,
+            'columns': column_count
+        } for db_name, table_name, schema, column_count in self.index.search_tables(keyword, database, limit)]
         
         if found_tables:
             for table in found_tables:
@@ -85,29 +93,18 @@ class QuickBrowser:
         
         return found_tables
     
-    def search_columns(self, keyword: str, database: str = None):
-        """搜索字段名"""
+    def search_columns(self, keyword: str, database: str = None, limit: int = None):
+        """搜索字段名（按匹配程度排序，也匹配字段注释）"""
         print(f"\n🔍 搜索包含 '{keyword}' 的字段:")
         print("=" * 60)
         
-        found_columns = []
-        
-        target_dbs = [database] if database else self.databases.keys()
-        
-        for db_name in target_dbs:
-            if db_name not in self.databases:
-                continue
-                
-            tables = self.databases[db_name]['tables']
-            for table_name, table_info in tables.items():
-                for column in table_info['columns']:
-                    if keyword.lower() in column['name'].lower():
-                        found_columns.append({
-                            'database': db_name,
-                            'table': table_name,
-                            'column': column['name'],
-                            'type': column['type']
-                        })
+        self._index_columns()
+        found_columns = [{
+            'database': db_name,
+            'table': table_name,
+            'column': column_name,
+            'type': column_type
+        } for db_name, table_name, column_name, column_type in self.index.search_columns(keyword, database, limit)]
         
         if found_columns:
             for col in found_columns:
@@ -117,41 +114,32 @@ class QuickBrowser:
         
         return found_columns
     
+    def get_table(self, db_name: str, table_name: str) -> Dict:
+        """读取单个表的完整定义"""
+        return self.stores[db_name].table(table_name)
+    
     def show_table_info(self, table_name: str, database: str = None):
         """显示表的详细信息"""
-        # 如果没有指定数据库，在所有数据库中搜索
-        target_dbs = [database] if database else self.databases.keys()
+        # 如果没有指定数据库，在所有数据库中查找（不区分大小写）
+        match = self.index.find_table(table_name, database)
+        if match is None:
+            print(f"❌ 未找到表 '{table_name}'")
+            return
         
-        found = False
-        for db_name in target_dbs:
-            if db_name not in self.databases:
-                continue
-                
-            tables = self.databases[db_name]['tables']
-            
-            # 不区分大小写搜索表名
-            matching_tables = {name: info for name, info in tables.items() 
-                             if name.lower() == table_name.lower()}
-            
-            if matching_tables:
-                found = True
-                table_name_actual, table_info = list(matching_tables.items())[0]
-                
-                print(f"\n🗂️  表名: {table_info['schema']}.{table_name_actual}")
-                print(f"📊 数据库: {db_name}")
-                print(f"📈 字段数: {table_info['column_count']}")
-                
-                print(f"\n📋 字段列表:")
-                print("-" * 70)
-                print(f"{'字段名':<25} {'类型':<20} {'定义':<25}")
-                print("-" * 70)
-                
-                for col in table_info['columns']:
-                    print(f"{col['name']:<25} {col['type']:<20} {col['definition'][:25]:<25}")
-                break
+        db_name, table_name_actual = match
+        table_info = self.get_table(db_name, table_name_actual)
         
-        if not found:
-            print(f"❌ 未找到表 '{table_name}'")
+        print(f"\n🗂️  表名: {table_info['schema']}.{table_name_actual}")
+        print(f"📊 数据库: {db_name}")
+        print(f"📈 字段数: {table_info['column_count']}")
+        
+        print(f"\n📋 字段列表:")
+        print("-" * 70)
+        print(f"{'字段名':<25} {'类型':<20} {'定义':<25}")
+        print("-" * 70)
+        
+        for col in table_info['columns']:
+            print(f"{col['name']:<25} {col['type']:<20} {col['definition'][:25]:<25}")
     
     def show_module_tables(self, database: str, module: str):
         """显示模块中的表"""
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+零售单本地列式快照
+把 m_retail 按 billdate 所在月份拉取到本地 Parquet 文件（每月一个分区目录），
+c_store_id / c_vip_id 使用字典编码并整体 zstd 压缩，临时的按月、按年分析直接查快照，不再用 pd.read_sql 压生产库
+
+- 同步时先按月汇总一次单据数、ID 之和与最后修改时间，与上次同步记录的签名比较，只重新拉取新增或有变化的月份
+- 查询时先按快照清单裁剪月份分区，再把 billdate 条件下推到 Parquet 行组统计信息，只读取用到的列
+
+需要安装pyarrow（见 requirements.txt 中的可选依赖）
+
+文件布局:
+    snapshots/m_retail/_manifest.json          各月签名、行数、billdate 范围
+    snapshots/m_retail/month=YYYYMM/part-0.parquet
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+# 快照默认目录
+SNAPSHOT_DIR = Path('snapshots') / 'm_retail'
+# 快照清单，以下划线开头的文件不会被当作数据文件
+MANIFEST_FILE = '_manifest.json'
+# 每个月份分区的数据文件
+PART_FILE = 'part-0.parquet'
+
+# 拉取明细时每次往返取回的行数
+DEFAULT_ARRAYSIZE = 5000
+# 每个行组的行数：行组是 billdate 条件下推时可以整体跳过的最小单位
+ROW_GROUP_ROWS = 100000
+# 使用字典编码的列（店铺、会员 ID 在一个月内大量重复）
+DICTIONARY_COLUMNS = ['c_store_id', 'c_vip_id']
+
+# 快照保留的列，依次为列名和 pyarrow 类型名
+SNAPSHOT_COLUMNS = [
+    ('id', 'int64'),
+    ('billdate', 'int32'),
+    ('c_store_id', 'int64'),
+    ('c_vip_id', 'int64'),
+    ('isactive', 'string'),
+    ('status', 'int8'),
+    ('avg_discount', 'float64'),
+    ('tot_lines', 'int64'),
+    ('tot_qty', 'int64'),
+    ('tot_amt_list', 'float64'),
+    ('tot_amt_actual', 'float64'),
+    ('modifieddate', 'timestamp'),
+]
+
+# 各月签名：单据数、ID 之和（同数量的删除加新增也能发现）、最后修改时间
+MONTH_SIGNATURE_SQL = """
+    SELECT TRUNC(billdate / 100) AS month, COUNT(*), SUM(id), MAX(modifieddate)
+    FROM m_retail
+    WHERE billdate >= :start_date AND billdate <= :end_date
+    GROUP BY TRUNC(billdate / 100)
+    """
+
+# 一个月的明细，按 billdate 索引范围读取，排序在本地完成
+MONTH_ROWS_SQL = f"""
+    SELECT {', '.join(name for name, _ in SNAPSHOT_COLUMNS)}
+    FROM m_retail
+    WHERE billdate >= :start_date AND billdate <= :end_date
+    """
+
+# 聚合查询的分组方式与对应的列
+GROUP_COLUMNS = {'month': 'month', 'day': 'billdate', 'store': 'c_store_id', 'vip': 'c_vip_id'}
+
+
+def month_range(month: int):
+    """YYYYMM 对应的 billdate 范围（日号取 01 ~ 31 即可覆盖整月）"""
+    return month * 100 + 1, month * 100 + 31
+
+
+class RetailSnapshot:
+    """m_retail 的本地列式快照，需要安装pyarrow"""
+
+    def __init__(self, root: Path = SNAPSHOT_DIR):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        self.pa, self.pc, self.ds, self.pq = pa, pc, ds, pq
+        self.root = Path(root)
+        self.schema = pa.schema([(name, pa.timestamp('s') if kind == 'timestamp' else pa.type_for_alias(kind))
+                                 for name, kind in SNAPSHOT_COLUMNS])
+        self.partitioning = ds.partitioning(pa.schema([('month', pa.int32())]), flavor='hive')
+        self.manifest = self._load_manifest()
+
+    # ---------- 清单 ----------
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        path = self.root / MANIFEST_FILE
+        if not path.exists():
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / MANIFEST_FILE
+        temp = path.with_name('.' + MANIFEST_FILE + '.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(temp, path)
+
+    def _part_path(self, month: int) -> Path:
+        return self.root / f'month={month}' / PART_FILE
+
+    def months(self) -> List[int]:
+        """快照中已有的月份（YYYYMM）"""
+        return sorted(int(month) for month in self.manifest)
+
+    # ---------- 同步 ----------
+
+    def month_signatures(self, cursor, start_month: int = None, end_month: int = None) -> Dict[int, List]:
+        """在数据库中按月汇总签名 {YYYYMM: [单据数, ID 之和, 最后修改时间]}"""
+        start_date = month_range(start_month)[0] if start_month else 0
+        end_date = month_range(end_month)[1] if end_month else 99999999
+        cursor.execute(MONTH_SIGNATURE_SQL, {'start_date': start_date, 'end_date': end_date})
+        return {int(month): [int(count), int(id_sum or 0), None if modified is None else str(modified)]
+                for month, count, id_sum, modified in cursor.fetchall()}
+
+    def sync(self, cursor, start_month: int = None, end_month: int = None, force: bool = False) -> Dict[str, List[int]]:
+        """把 [start_month, end_month] 内新增或有变化的月份拉取到快照，数据库中已没有单据的月份从快照删除
+
+        每写完一个月立即更新清单，中途中断后再次运行只会重拉未完成的月份
+        """
+        signatures = self.month_signatures(cursor, start_month, end_month)
+        changed = [month for month, signature in sorted(signatures.items())
+                   if force or self.manifest.get(str(month), {}).get('signature') != signature]
+        removed = [month for month in self.months()
+                   if month not in signatures
+                   and (start_month is None or month >= start_month)
+                   and (end_month is None or month <= end_month)]
+
+        print(f"📋 数据库中共 {len(signatures)} 个月份，需要拉取 {len(changed)} 个，"
+              f"跳过 {len(signatures) - len(changed)} 个未变化的月份")
+        for month in changed:
+            rows = self._write_month(cursor, month)
+            start_date, end_date = self._billdate_bounds(month)
+            self.manifest[str(month)] = {
+                'signature': signatures[month],
+                'rows': rows,
+                'min_billdate': start_date,
+                'max_billdate': end_date,
+                'synced_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._save_manifest()
+            print(f"   ✅ {month}: {rows} 条单据")
+
+        for month in removed:
+            shutil.rmtree(self._part_path(month).parent, ignore_errors=True)
+            del self.manifest[str(month)]
+            self._save_manifest()
+            print(f"   🗑️ {month}: 数据库中已没有单据，已从快照删除")
+
+        return {'fetched': changed, 'removed': removed}
+
+    def _write_month(self, cursor, month: int) -> int:
+        """拉取一个月的明细，按 (billdate, id) 排序后写入该月分区，先写临时文件再替换"""
+        pa = self.pa
+        start_date, end_date = month_range(month)
+        cursor.execute(MONTH_ROWS_SQL, {'start_date': start_date, 'end_date': end_date})
+
+        batches = []
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            arrays = [pa.array(values, type=field.type) for field, values in zip(self.schema, zip(*rows))]
+            batches.append(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+        table = pa.Table.from_batches(batches, schema=self.schema)
+        table = table.sort_by([('billdate', 'ascending'), ('id', 'ascending')])
+
+        path = self._part_path(month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name('.' + PART_FILE + '.tmp')
+        self.pq.write_table(table, temp, row_group_size=ROW_GROUP_ROWS, compression='zstd',
+                            use_dictionary=DICTIONARY_COLUMNS)
+        os.replace(temp, path)
+        return table.num_rows
+
+    def _billdate_bounds(self, month: int):
+        """由分区文件各行组的统计信息得到该月实际的 billdate 范围，空月份返回 (None, None)"""
+        metadata = self.pq.ParquetFile(self._part_path(month)).metadata
+        index = self.schema.get_field_index('billdate')
+        bounds = [(group.column(index).statistics.min, group.column(index).statistics.max)
+                  for group in (metadata.row_group(i) for i in range(metadata.num_row_groups))
+                  if group.num_rows and group.column(index).statistics is not None]
+        if not bounds:
+            return None, None
+        return min(low for low, _ in bounds), max(high for _, high in bounds)
+
+    # ---------- 查询 ----------
+
+    def _dataset(self, start_date: int, end_date: int):
+        """按清单中的 billdate 范围裁剪月份，只打开与 [start_date, end_date] 有交集的分区"""
+        files = [str(self._part_path(int(month))) for month, entry in sorted(self.manifest.items())
+                 if entry['rows'] and entry['min_billdate'] <= end_date and entry['max_billdate'] >= start_date]
+        return self.ds.dataset(files, schema=self.schema.append(self.pa.field('month', self.pa.int32())),
+                               format='parquet', partitioning=self.partitioning,
+                               partition_base_dir=str(self.root))
+
+    def _filter(self, start_date: int, end_date: int, stores: Optional[Iterable[int]],
+                vips: Optional[Iterable[int]], valid_only: bool):
+        field = self.ds.field
+        expression = (field('billdate') >= start_date) & (field('billdate') <= end_date)
+        if stores is not None:
+            expression &= field('c_store_id').isin(list(stores))
+        if vips is not None:
+            expression &= field('c_vip_id').isin(list(vips))
+        if valid_only:
+            expression &= (field('isactive') == 'Y') & (field('status') == 1)
+        return expression
+
+    def read(self, start_date: int, end_date: int, columns: List[str] = None,
+             stores: Iterable[int] = None, vips: Iterable[int] = None, valid_only: bool = True) -> pd.DataFrame:
+        """读取 [start_date, end_date]（YYYYMMDD）内的单据明细，只取 columns 指定的列"""
+        dataset = self._dataset(start_date, end_date)
+        table = dataset.to_table(columns=columns,
+                                 filter=self._filter(start_date, end_date, stores, vips, valid_only))
+        return table.to_pandas()
+
+    def aggregate(self, start_date: int, end_date: int, by: str = None,
+                  stores: Iterable[int] = None, vips: Iterable[int] = None, valid_only: bool = True) -> pd.DataFrame:
+        """按 by（month / day / store / vip，None 为不分组）汇总 [start_date, end_date] 内的单据
+
+        返回销售额 sales、单数 orders、件数 qty、吊牌金额 list_amt、会员数 vips（去重）各列，默认只统计有效单据
+        """
+        measures = ['tot_amt_actual', 'tot_qty', 'tot_amt_list', 'c_vip_id']
+        key = GROUP_COLUMNS[by] if by else None
+        columns = measures + ([key] if key and key not in measures else [])
+        table = self._dataset(start_date, end_date).to_table(
+            columns=columns, filter=self._filter(start_date, end_date, stores, vips, valid_only))
+
+        if key is None:
+            pc = self.pc
+            return pd.DataFrame([{
+                'sales': pc.sum(table['tot_amt_actual']).as_py() or 0,
+                'orders': table.num_rows,
+                'qty': pc.sum(table['tot_qty']).as_py() or 0,
+                'list_amt': pc.sum(table['tot_amt_list']).as_py() or 0,
+                'vips': pc.count_distinct(table['c_vip_id']).as_py(),
+            }])
+
+        result = table.group_by(key).aggregate([
+            ('tot_amt_actual', 'sum'), ('tot_amt_actual', 'count', self.pc.CountOptions(mode='all')), ('tot_qty', 'sum'),
+            ('tot_amt_list', 'sum'), ('c_vip_id', 'count_distinct'),
+        ]).to_pandas()
+        result = result.rename(columns={
+            'tot_amt_actual_sum': 'sales', 'tot_amt_actual_count': 'orders', 'tot_qty_sum': 'qty',
+            'tot_amt_list_sum': 'list_amt', 'c_vip_id_count_distinct': 'vips',
+        })
+        result[['sales', 'qty', 'list_amt']] = result[['sales', 'qty', 'list_amt']].fillna(0)
+        return result[[key, 'sales', 'orders', 'qty', 'list_amt', 'vips']].sort_values(key).reset_index(drop=True)
+
+    def status(self) -> pd.DataFrame:
+        """各月份的行数、billdate 范围、文件大小和同步时间"""
+        rows = []
+        for month in self.months():
+            entry = self.manifest[str(month)]
+            path = self._part_path(month)
+            rows.append({'month': month, 'rows': entry['rows'], 'min_billdate': entry['min_billdate'],
+                         'max_billdate': entry['max_billdate'],
+                         'size_kb': round(path.stat().st_size / 1024, 1) if path.exists() else None,
+                         'synced_at': entry['synced_at']})
+        return pd.DataFrame(rows)
+
+
+def sync_snapshot(root: Path, start_month: int = None, end_month: int = None, force: bool = False,
+                  arraysize: int = DEFAULT_ARRAYSIZE, username: str = None):
+    """连接数据库，把新增或有变化的月份同步到本地快照"""
+    snapshot = RetailSnapshot(root)
+    from db_helper import DatabaseHelper
+
+    db = DatabaseHelper()
+    if not db.connect(username):
+        print("❌ 数据库连接失败")
+        return
+
+    try:
+        cursor = db.connection.cursor()
+        cursor.arraysize = arraysize
+        print(f"🔍 正在比较各月份签名（快照目录: {root}）...")
+        result = snapshot.sync(cursor, start_month, end_month, force)
+        cursor.close()
+        print(f"\n💾 同步完成：拉取 {len(result['fetched'])} 个月份，删除 {len(result['removed'])} 个月份")
+
+    except Exception as e:
+        print(f"❌ 同步失败: {e}")
+        import traceback
+        traceback.print_exc()
+
+    finally:
+        db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="m_retail 本地列式快照工具")
+    parser.add_argument('--dir', type=Path, default=SNAPSHOT_DIR, help="快照目录")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sync_parser = commands.add_parser('sync', help="拉取新增或有变化的月份")
+    sync_parser.add_argument('--from', dest='start_month', type=int, help="起始月份 YYYYMM，默认不限")
+    sync_parser.add_argument('--to', dest='end_month', type=int, help="结束月份 YYYYMM，默认不限")
+    sync_parser.add_argument('--force', action='store_true', help="忽略签名，重新拉取范围内的所有月份")
+    sync_parser.add_argument('--arraysize', type=int, default=DEFAULT_ARRAYSIZE, help="每批从数据库读取的行数")
+    sync_parser.add_argument('--user', help="数据库用户名，默认 bosnds3")
+
+    query_parser = commands.add_parser('query', help="在快照上做汇总查询")
+    query_parser.add_argument('--start', type=int, required=True, help="起始日期 YYYYMMDD")
+    query_parser.add_argument('--end', type=int, required=True, help="结束日期 YYYYMMDD")
+    query_parser.add_argument('--by', choices=sorted(GROUP_COLUMNS), help="分组方式，默认不分组")
+    query_parser.add_argument('--store', type=int, action='append', help="只统计该店铺，可重复指定")
+    query_parser.add_argument('--all-status', action='store_true', help="包含作废、未提交的单据")
+
+    commands.add_parser('status', help="查看快照中的月份")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'sync':
+            sync_snapshot(args.dir, args.start_month, args.end_month, args.force, args.arraysize, args.user)
+        elif args.command == 'query':
+            df = RetailSnapshot(args.dir).aggregate(args.start, args.end, args.by, args.store,
+                                                    valid_only=not args.all_status)
+            print(df.to_string(index=False))
+        else:
+            df = RetailSnapshot(args.dir).status()
+            print("📭 快照为空，请先运行 sync" if df.empty else df.to_string(index=False))
+    except ImportError as e:
+        if not (e.name or '').startswith('pyarrow'):
+            raise
+        print("❌ 本地快照需要安装pyarrow")
+        print("请运行: pip install pyarrow")
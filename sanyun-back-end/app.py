@@ -1,7 +1,12 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
+from flask.helpers import get_debug_flag
 from flask_cors import CORS
 from config import Config
 from database import db_manager
+from db_pool import all_pool_stats
+from services.change_feed import ChangeFeedPoller, create_change_feed
+from services.dashboard import DashboardService
+from services.rollup import RollupSyncer
 from services.sales_service import SalesService
 import cx_Oracle
 import os
@@ -24,13 +29,43 @@ except Exception as e:
 
 # 数据库配置
 DB_CONFIG = {
-    'user': 'bosnds3',
-    'password': 'abc123',
-    'dsn': '49.235.20.50:8853/orcl'
+    'user': Config.DB_USERNAME,
+    'password': Config.DB_PASSWORD,
+    'dsn': Config.DB_DSN
 }
 
+def is_serving_process() -> bool:
+    """debug 模式下 Werkzeug 重载器的监视进程也会执行本模块，后台线程只在实际处理请求的进程中启动"""
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        return True
+    if __name__ == '__main__':
+        # python app.py：app.run(debug=Config.DEBUG) 开启重载器
+        return not Config.DEBUG
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        # flask run --debug
+        return not get_debug_flag()
+    return True
+
 # 创建销售服务实例
 sales_service = SalesService(DB_CONFIG)
+dashboard_service = DashboardService(sales_service, Config.DASHBOARD_WORKERS)
+
+# 变更捕获：日汇总表、当月店铺排行按单据变更增量更新（须在汇总表同步线程启动前注册），
+# 二者更新后再清除覆盖变更日期的查询结果缓存
+change_feed = create_change_feed()
+if change_feed is not None:
+    for consumer in (sales_service.rollup, sales_service.ranking, sales_service.cache):
+        if consumer is not None:
+            change_feed.register(consumer)
+    if is_serving_process():
+        change_feed_poller = ChangeFeedPoller(change_feed, sales_service.pool, Config.CHANGE_FEED_INTERVAL)
+        change_feed_poller.start()
+
+# 后台增量同步日汇总表
+if sales_service.rollup is not None and is_serving_process():
+    rollup_syncer = RollupSyncer(sales_service.rollup, sales_service.pool,
+                                 Config.ROLLUP_SYNC_INTERVAL, Config.ROLLUP_BACKFILL_DAYS)
+    rollup_syncer.start()
 
 @app.route('/')
 def hello():
@@ -82,7 +117,9 @@ def sales_metrics():
         selected_date = request.args.get('date')
         analysis_type = request.args.get('type', 'month')
         
-        data = sales_service.get_sales_metrics(selected_date, analysis_type)
+        approx = request.args.get('approx', 'false').lower() == 'true'
+        
+        data = sales_service.get_sales_metrics(selected_date, analysis_type, approx)
         return jsonify({
             'success': True,
             'data': data
@@ -93,6 +130,27 @@ def sales_metrics():
             'message': f'获取销售指标失败: {str(e)}'
         }), 500
 
+@app.route('/api/dashboard')
+def dashboard():
+    """仪表盘批量接口，一次返回全部部件数据"""
+    try:
+        selected_date = request.args.get('date')
+        analysis_type = request.args.get('type', 'month')
+        limit = request.args.get('limit', 10, type=int)
+        period = request.args.get('period')
+        approx = request.args.get('approx', 'false').lower() == 'true'
+        
+        data = dashboard_service.get_dashboard(selected_date, analysis_type, limit, period, approx)
+        return jsonify({
+            'success': True,
+            'data': data
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取仪表盘数据失败: {str(e)}'
+        }), 500
+
 @app.route('/api/test/db')
 def test_db():
     """测试数据库连接"""
@@ -115,6 +173,91 @@ def test_db():
             'message': f'数据库连接失败: {str(e)}'
         }), 500
 
+@app.route('/api/db/pool', methods=['GET'])
+def db_pool_stats():
+    """数据库连接池状态"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'pools': all_pool_stats(),
+            'db_manager': db_manager.stats()
+        }
+    })
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """查询结果缓存统计，single_flight 为并发相同查询的合并统计"""
+    flights = sales_service.flights.stats() if sales_service.flights is not None else None
+    if sales_service.cache is None:
+        return jsonify({'success': True, 'data': {'enabled': False, 'single_flight': flights}})
+    return jsonify({
+        'success': True,
+        'data': dict(sales_service.cache.stats(), enabled=True, single_flight=flights)
+    })
+
+@app.route('/api/cache/purge', methods=['POST'])
+def cache_purge():
+    """清除查询结果缓存，可通过 name 参数只清除某一类（overview、top_stores、metrics、trend、trend_series、member_analysis、detailed_metrics）"""
+    if sales_service.cache is None:
+        return jsonify({'success': True, 'data': {'removed': 0}})
+    name = request.args.get('name')
+    removed = sales_service.cache.purge(name)
+    return jsonify({
+        'success': True,
+        'data': {'removed': removed, 'name': name}
+    })
+
+@app.route('/api/_metrics', methods=['GET'])
+def query_metrics():
+    """按接口、SQL 指纹统计的查询耗时百分位数、行数、往返次数（Prometheus 文本格式）"""
+    text = sales_service.tracer.prometheus() if sales_service.tracer is not None else ''
+    return Response(text, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/_metrics/slow', methods=['GET'])
+def slow_queries():
+    """最近的慢查询和出错查询，按接口汇总的耗时百分位数"""
+    if sales_service.tracer is None:
+        return jsonify({'success': True, 'data': {'enabled': False}})
+    return jsonify({
+        'success': True,
+        'data': {
+            'enabled': True,
+            'slow_ms': sales_service.tracer.slow_ms,
+            'endpoints': sales_service.tracer.stats(),
+            'recent': sales_service.tracer.recent_slow()
+        }
+    })
+
+@app.route('/api/rollup/status', methods=['GET'])
+def rollup_status():
+    """日汇总表覆盖范围与同步状态"""
+    if sales_service.rollup is None:
+        return jsonify({'success': True, 'data': {'enabled': False}})
+    return jsonify({
+        'success': True,
+        'data': dict(sales_service.rollup.status(), enabled=True)
+    })
+
+@app.route('/api/ranking/status', methods=['GET'])
+def ranking_status():
+    """当月店铺排行的维护状态"""
+    if sales_service.ranking is None:
+        return jsonify({'success': True, 'data': {'enabled': False}})
+    return jsonify({
+        'success': True,
+        'data': dict(sales_service.ranking.status(), enabled=True)
+    })
+
+@app.route('/api/changes/status', methods=['GET'])
+def change_feed_status():
+    """m_retail 变更捕获的高水位与分发统计"""
+    if change_feed is None:
+        return jsonify({'success': True, 'data': {'enabled': False}})
+    return jsonify({
+        'success': True,
+        'data': dict(change_feed.status(), enabled=True)
+    })
+
 @app.route('/api/sales/trend', methods=['GET'])
 def get_sales_trend():
     """获取销售趋势数据"""
@@ -135,6 +278,31 @@ def get_sales_trend():
             'message': f'获取销售趋势失败: {str(e)}'
         }), 500
 
+@app.route('/api/sales/trend/series', methods=['GET'])
+def get_sales_trend_series():
+    """获取销售趋势时间序列"""
+    try:
+        start_date = request.args.get('start')
+        end_date = request.args.get('end')
+        granularity = request.args.get('granularity', 'day')
+        
+        series = sales_service.get_sales_trend_series(start_date, end_date, granularity)
+        return jsonify({
+            'success': True,
+            'data': series
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'参数错误: {str(e)}'
+        }), 400
+    except Exception as e:
+        print(f"获取销售趋势序列失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'获取销售趋势序列失败: {str(e)}'
+        }), 500
+
 @app.route('/api/members/analysis', methods=['GET'])
 def get_member_analysis():
     """获取会员分析数据"""
@@ -143,7 +311,9 @@ def get_member_analysis():
         selected_date = request.args.get('date')
         analysis_type = request.args.get('type', 'month')
         
-        member_data = sales_service.get_member_analysis(selected_date, analysis_type)
+        approx = request.args.get('approx', 'false').lower() == 'true'
+        
+        member_data = sales_service.get_member_analysis(selected_date, analysis_type, approx)
         return jsonify({
             'success': True,
             'data': member_data
@@ -161,8 +331,9 @@ def get_detailed_metrics():
     try:
         date = request.args.get('date')
         period = request.args.get('period', 'month')
+        approx = request.args.get('approx', 'false').lower() == 'true'
         
-        detailed_metrics = sales_service.get_detailed_metrics(date, period)
+        detailed_metrics = sales_service.get_detailed_metrics(date, period, approx)
         return jsonify({
             'success': True,
             'data': detailed_metrics
@@ -175,4 +346,4 @@ def get_detailed_metrics():
         }), 500
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=Config.DEBUG) 
\ No newline at end of file
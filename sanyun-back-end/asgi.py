@@ -0,0 +1,15 @@
+"""
+ASGI 入口，与 app.py 共用同一组服务实例（连接池、结果缓存、汇总表同步）:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+销售接口由 async_api 在事件循环中处理，其余接口仍由 Flask 应用处理
+"""
+
+from app import app as flask_app, dashboard_service, sales_service
+from async_api import create_asgi_app
+from config import Config
+from services.async_sales import AsyncSalesService
+
+async_sales_service = AsyncSalesService(sales_service, Config.ASYNC_WORKERS, dashboard_service)
+app = create_asgi_app(async_sales_service, flask_app)
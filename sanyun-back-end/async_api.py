@@ -0,0 +1,141 @@
+"""
+销售接口的 ASGI 实现
+与 app.py 中的同名接口参数、返回格式一致，查询通过 AsyncSalesService 在事件循环中并发执行；
+其余路径交给 Flask 应用处理（需要 asgiref 把 WSGI 应用转换为 ASGI）
+"""
+
+import json
+from urllib.parse import parse_qs
+
+from config import Config
+
+
+def _arg(query, name, default=None):
+    values = query.get(name)
+    return values[0] if values else default
+
+
+def _int_arg(query, name, default):
+    """与 Flask request.args.get(name, default, type=int) 相同，无法转换时取默认值"""
+    try:
+        return int(_arg(query, name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _flag(query, name):
+    return _arg(query, name, 'false').lower() == 'true'
+
+
+# 路径 -> (AsyncSalesService 方法名, 由查询参数生成调用参数, 失败时的提示)
+ROUTES = {
+    '/api/sales/overview': (
+        'get_sales_overview',
+        lambda q: (_arg(q, 'date'), _arg(q, 'type', 'month')),
+        '获取销售概览失败'),
+    '/api/sales/stores': (
+        'get_top_stores',
+        lambda q: (_int_arg(q, 'limit', 10), _arg(q, 'date'), _arg(q, 'type', 'month')),
+        '获取店铺排行失败'),
+    '/api/sales/metrics': (
+        'get_sales_metrics',
+        lambda q: (_arg(q, 'date'), _arg(q, 'type', 'month'), _flag(q, 'approx')),
+        '获取销售指标失败'),
+    '/api/sales/trend': (
+        'get_sales_trend',
+        lambda q: (_arg(q, 'date'), _arg(q, 'type', 'month')),
+        '获取销售趋势失败'),
+    '/api/sales/trend/series': (
+        'get_sales_trend_series',
+        lambda q: (_arg(q, 'start'), _arg(q, 'end'), _arg(q, 'granularity', 'day')),
+        '获取销售趋势序列失败'),
+    '/api/members/analysis': (
+        'get_member_analysis',
+        lambda q: (_arg(q, 'date'), _arg(q, 'type', 'month'), _flag(q, 'approx')),
+        '获取会员分析失败'),
+    '/api/sales/detailed-metrics': (
+        'get_detailed_metrics',
+        lambda q: (_arg(q, 'date'), _arg(q, 'period', 'month'), _flag(q, 'approx')),
+        '获取详细指标失败'),
+    '/api/dashboard': (
+        'get_dashboard',
+        lambda q: (_arg(q, 'date'), _arg(q, 'type', 'month'), _int_arg(q, 'limit', 10),
+                   _arg(q, 'period'), _flag(q, 'approx')),
+        '获取仪表盘数据失败'),
+}
+
+# 参数校验失败时返回 400 的接口（与 app.py 一致）
+VALIDATED_ROUTES = {'/api/sales/trend/series'}
+
+
+class AsyncSalesApp:
+    """ASGI 应用：销售接口在事件循环中处理，其余请求交给 fallback（ASGI 应用）"""
+
+    def __init__(self, async_service, fallback=None):
+        self.service = async_service
+        self.fallback = fallback
+        self.allow_origin = ','.join(Config.CORS_ORIGINS).encode('latin-1')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        route = ROUTES.get(scope['path']) if scope['type'] == 'http' else None
+        if route is None or scope['method'] != 'GET':
+            if self.fallback is not None:
+                await self.fallback(scope, receive, send)
+            elif scope['type'] == 'http':
+                await self._respond(send, 404, {'success': False, 'message': f"接口不存在: {scope['path']}"})
+            return
+
+        method_name, parse_args, failure = route
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        try:
+            data = await getattr(self.service, method_name)(*parse_args(query))
+            status, body = 200, {'success': True, 'data': data}
+        except ValueError as e:
+            if scope['path'] in VALIDATED_ROUTES:
+                status, body = 400, {'success': False, 'message': f'参数错误: {str(e)}'}
+            else:
+                print(f"{failure}: {e}")
+                status, body = 500, {'success': False, 'message': f'{failure}: {str(e)}'}
+        except Exception as e:
+            print(f"{failure}: {e}")
+            status, body = 500, {'success': False, 'message': f'{failure}: {str(e)}'}
+        await self._respond(send, status, body)
+
+    async def _respond(self, send, status, body):
+        payload = json.dumps(body, default=str, sort_keys=True).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(payload)).encode('latin-1')),
+                (b'access-control-allow-origin', self.allow_origin),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.service.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(async_service, flask_app=None) -> AsyncSalesApp:
+    """创建 ASGI 应用，flask_app 用于处理销售接口以外的路径"""
+    fallback = None
+    if flask_app is not None:
+        try:
+            from asgiref.wsgi import WsgiToAsgi
+            fallback = WsgiToAsgi(flask_app)
+        except ImportError:
+            print("⚠️  未安装 asgiref，ASGI 模式下只提供销售接口，请运行: pip install asgiref")
+    return AsyncSalesApp(async_service, fallback)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同步与异步（ASGI）服务方式的吞吐量对比
+在 SQLite 替身数据库上运行，每次 execute 前额外等待 --latency 秒模拟 Oracle 网络往返:
+
+    python benchmarks/bench_async.py [--requests 400] [--clients 32] [--threads 8] [--latency 0.02]
+
+同步方式: --threads 个请求线程（相当于多线程 WSGI 服务器），每个请求像 app.py 的视图一样直接调用 SalesService
+异步方式: 一个事件循环运行 async_api，最多 --clients 个请求同时处理，阻塞查询在 --threads 个线程中执行
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlencode
+
+from standin import StandinConnection, StandinDriver, build_database
+
+from async_api import ROUTES, create_asgi_app
+from db_pool import SessionPool
+from services.async_sales import AsyncSalesService
+from services.dashboard import DashboardService
+from services.result_cache import ResultCache
+from services.sales_service import SalesService
+
+
+class LatencyCursor:
+    """每次 execute 前等待固定时间的游标"""
+
+    def __init__(self, cursor, latency: float):
+        self._cursor = cursor
+        self._latency = latency
+
+    def execute(self, sql, *args, **kwargs):
+        time.sleep(self._latency)
+        self._cursor.execute(sql, *args, **kwargs)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class LatencyConnection(StandinConnection):
+    def __init__(self, path: str, latency: float):
+        super().__init__(path)
+        self.latency = latency
+
+    def cursor(self):
+        return LatencyCursor(super().cursor(), self.latency)
+
+
+class LatencyDriver(StandinDriver):
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    def connect(self, user=None, password=None, dsn=None, **kwargs):
+        self.connects += 1
+        return LatencyConnection(dsn, self.latency)
+
+
+def create_service(path: str, latency: float, pool_max: int, cached: bool) -> SalesService:
+    pool = SessionPool('standin', '', path, min=1, max=pool_max, driver=LatencyDriver(latency))
+    service = SalesService({'user': 'standin', 'password': '', 'dsn': path}, pool=pool, cache=ResultCache())
+    if not cached:
+        service.cache = None
+    return service
+
+
+def make_requests(count: int, today: date, seed: int = 11):
+    """(路径, 查询串) 列表：各接口随机取最近 30 天中的日期"""
+    rng = random.Random(seed)
+    days = [(today - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(30)]
+    requests = []
+    for _ in range(count):
+        path = rng.choice(list(ROUTES))
+        day = rng.choice(days)
+        analysis_type = rng.choice(['day', 'month'])
+        if path == '/api/sales/trend/series':
+            params = {'end': day, 'granularity': rng.choice(['day', 'week'])}
+        elif path == '/api/sales/detailed-metrics':
+            params = {'date': day, 'period': rng.choice(['today', 'week', 'month'])}
+        else:
+            params = {'date': day, 'type': analysis_type}
+        requests.append((path, urlencode(params)))
+    return requests
+
+
+def sync_handler(sales_service: SalesService, dashboard_service: DashboardService):
+    """与 app.py 视图相同：解析参数、调用同步服务、序列化 JSON"""
+    def handle(request):
+        path, query_string = request
+        method_name, parse_args, failure = ROUTES[path]
+        target = dashboard_service if method_name == 'get_dashboard' else sales_service
+        try:
+            body = {'success': True, 'data': getattr(target, method_name)(*parse_args(parse_qs(query_string)))}
+        except Exception as e:
+            body = {'success': False, 'message': f'{failure}: {str(e)}'}
+        return json.dumps(body, default=str, sort_keys=True).encode('utf-8')
+    return handle
+
+
+async def call_asgi(app, request) -> bytes:
+    path, query_string = request
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query_string.encode('latin-1')}
+    chunks = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            chunks.append(message['body'])
+
+    await app(scope, receive, send)
+    return b''.join(chunks)
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_sync(service: SalesService, requests, threads: int):
+    """返回 (响应列表, 总耗时, 各请求从开始到返回的耗时)"""
+    dashboard_service = DashboardService(service, threads)
+    handle = sync_handler(service, dashboard_service)
+    finished = []
+
+    def timed(request):
+        response = handle(request)
+        finished.append(time.perf_counter() - started)
+        return response
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as server:
+        responses = list(server.map(timed, requests))
+    elapsed = time.perf_counter() - started
+    dashboard_service.shutdown()
+    return responses, elapsed, finished
+
+
+def run_async(service: SalesService, requests, threads: int, clients: int):
+    async_service = AsyncSalesService(service, threads)
+    app = create_asgi_app(async_service)
+    finished = []
+
+    async def main():
+        limit = asyncio.Semaphore(clients)
+
+        async def client(request):
+            async with limit:
+                response = await call_asgi(app, request)
+            finished.append(time.perf_counter() - started)
+            return response
+
+        return await asyncio.gather(*(client(request) for request in requests))
+
+    started = time.perf_counter()
+    responses = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    async_service.shutdown()
+    async_service.dashboard.shutdown()
+    return responses, elapsed, finished
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='同步与异步服务方式的吞吐量对比')
+    parser.add_argument('--requests', type=int, default=400, help='请求数')
+    parser.add_argument('--clients', type=int, default=32, help='异步方式同时处理的请求数')
+    parser.add_argument('--threads', type=int, default=8, help='请求线程数 / 查询线程数（也是连接池上限）')
+    parser.add_argument('--latency', type=float, default=0.02, help='每次 execute 的模拟网络延迟（秒）')
+    args = parser.parse_args()
+
+    today = date.today()
+    path = os.path.join(tempfile.gettempdir(), 'sanyun_standin_async.db')
+    print("🔧 生成替身数据库...")
+    build_database(path, today - timedelta(days=400), today)
+    requests = make_requests(args.requests, today)
+
+    failures = 0
+    for cached in (False, True):
+        print(f"\n📊 {args.requests} 个请求，结果缓存{'开启' if cached else '关闭'}，"
+              f"execute 延迟 {args.latency * 1000:.0f} ms")
+        # 服务内部的调试输出不计入结果
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync_responses, sync_seconds, sync_finished = run_sync(
+                create_service(path, args.latency, args.threads, cached), requests, args.threads)
+            async_responses, async_seconds, async_finished = run_async(
+                create_service(path, args.latency, args.threads, cached), requests, args.threads, args.clients)
+
+        for label, seconds, finished in (('同步', sync_seconds, sync_finished),
+                                         ('异步', async_seconds, async_finished)):
+            print(f"{label}: {args.requests / seconds:7.1f} 请求/秒 ({seconds:.2f} s), "
+                  f"返回时间 p50 {percentile(finished, 0.5) * 1000:.0f} ms / "
+                  f"p95 {percentile(finished, 0.95) * 1000:.0f} ms")
+
+        mismatched = sum(1 for expected, actual in zip(sync_responses, async_responses) if expected != actual)
+        failures += mismatched
+        print("✅ 响应一致" if not mismatched else f"❌ {mismatched} 个响应不一致")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相同查询合并（single-flight）效果
+模拟开会时大量客户端同时打开同一天的销售指标：缓存为空，--clients 个相同请求同时到达，
+比较关闭/开启合并时实际执行的查询次数和全部返回的耗时:
+
+    python benchmarks/bench_single_flight.py [--clients 48] [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from bench_async import create_service
+from standin import build_database
+
+from services.async_sales import AsyncSalesService
+from services.single_flight import SingleFlight
+
+
+def burst_threads(service, clients: int, selected_date: str):
+    """clients 个线程同时调用 get_sales_metrics，返回 (结果列表, 耗时)"""
+    barrier = threading.Barrier(clients)
+    results = [None] * clients
+
+    def client(index):
+        barrier.wait()
+        results[index] = service.get_sales_metrics(selected_date, 'month')
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def burst_async(service, clients: int, selected_date: str):
+    """clients 个协程同时调用 AsyncSalesService.get_sales_metrics"""
+    async_service = AsyncSalesService(service)
+
+    async def main():
+        return await asyncio.gather(*(async_service.get_sales_metrics(selected_date, 'month')
+                                      for _ in range(clients)))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    async_service.shutdown()
+    return results, elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='相同查询合并效果')
+    parser.add_argument('--clients', type=int, default=48, help='同时到达的相同请求数')
+    parser.add_argument('--latency', type=float, default=0.02, help='每次 execute 的模拟网络延迟（秒）')
+    args = parser.parse_args()
+
+    today = date.today()
+    path = os.path.join(tempfile.gettempdir(), 'sanyun_standin_single_flight.db')
+    print("🔧 生成替身数据库...")
+    build_database(path, today - timedelta(days=400), today)
+    selected_date = today.strftime('%Y-%m-%d')
+
+    failures = 0
+    expected = None
+    for label, burst in (('线程', burst_threads), ('协程', burst_async)):
+        for coalesce in (False, True):
+            service = create_service(path, args.latency, 8, cached=True)
+            service.flights = SingleFlight() if coalesce else None
+            with contextlib.redirect_stdout(io.StringIO()):
+                results, seconds = burst(service, args.clients, selected_date)
+
+            expected = expected or results[0]
+            same = all(result == expected for result in results)
+            failures += not same
+            executions = service.cache.stats()['by_name']['metrics']['misses']
+            if coalesce:
+                executions = service.flights.stats()['executions']
+            print(f"{'✅' if same else '❌'} {label} {'合并' if coalesce else '不合并'}: "
+                  f"{args.clients} 个请求执行查询 {executions} 次, 全部返回 {seconds * 1000:.0f} ms")
+            if coalesce:
+                stats = service.flights.stats()
+                print(f"   合并 {stats['coalesced']} 次, 合并率 {stats['coalesce_rate']}%")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
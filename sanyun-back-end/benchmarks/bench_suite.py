@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线基准测试
+在按 bosnds3.ddl 建表的模拟数据集（默认 200 万条 m_retail、2000 家店铺、30 万会员）上，
+逐个调用 SalesService 的查询方法和 HTTP 接口（缓存清空后调用，测的是查询路径），再用混合请求测吞吐量，
+输出各用例的 p50/p95/p99 与每秒请求数，并与 JSON 基线比较:
+
+    python benchmarks/bench_suite.py                      # 与 benchmarks/baseline.json 比较
+    python benchmarks/bench_suite.py --update-baseline    # 把本次结果写为基线
+    python benchmarks/bench_suite.py --mode rollup        # 开启日汇总表和当月店铺排行
+    python benchmarks/bench_suite.py --bills 200000 --rounds 3
+
+p50 比基线慢超过 --tolerance（默认 30%）且超过 1 ms 的用例记为退化，退出码为 1。
+数据集文件参数不变时复用，首次生成 200 万条单据需要几分钟
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+
+from bench_async import call_asgi, make_requests, sync_handler
+from dataset import build_dataset
+from standin import StandinDriver
+
+from async_api import create_asgi_app
+from db_pool import SessionPool
+from services.async_sales import AsyncSalesService
+from services.dashboard import DashboardService
+from services.result_cache import ResultCache
+from services.rollup import RollupStore
+from services.sales_service import SalesService
+from services.store_ranking import StoreRanking
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# 退化判定忽略 1 ms 以内的差异
+NOISE_MS = 1.0
+
+
+def create_service(path: str, threads: int, mode: str, backfill_days: int) -> SalesService:
+    pool = SessionPool('standin', '', path, min=1, max=threads, driver=StandinDriver())
+    rollup = ranking = None
+    if mode == 'rollup':
+        rollup_path = path + '.rollup'
+        for file in (rollup_path, rollup_path + '-wal', rollup_path + '-shm'):
+            if os.path.exists(file):
+                os.remove(file)
+        rollup = RollupStore(rollup_path)
+        connection = pool.acquire()
+        try:
+            started = time.perf_counter()
+            rollup.sync(connection, backfill_days)
+            print(f"📦 汇总表回填 {backfill_days} 天: {time.perf_counter() - started:.1f} s")
+        finally:
+            connection.close()
+        ranking = StoreRanking(poll_interval=30)
+    service = SalesService({'user': 'standin', 'password': '', 'dsn': path}, pool=pool,
+                           cache=ResultCache(), rollup=rollup, ranking=ranking)
+    # 基准测试不统计 SQL 追踪本身的开销
+    service.tracer = None
+    return service
+
+
+def selected_dates(today: date):
+    """今天、一周前、上月 15 日"""
+    last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=15)
+    return [day.strftime('%Y-%m-%d') for day in (today, today - timedelta(days=7), last_month)]
+
+
+def method_cases(service: SalesService, dashboard: DashboardService, today: date):
+    """(用例名, 无参调用) 覆盖 SalesService 的全部查询方法和仪表盘"""
+    cases = []
+    for selected in selected_dates(today):
+        for analysis_type in ('day', 'month'):
+            suffix = f"{selected}:{analysis_type}"
+            cases += [
+                (f"overview {suffix}", lambda s=selected, t=analysis_type: service.get_sales_overview(s, t)),
+                (f"top_stores {suffix}", lambda s=selected, t=analysis_type: service.get_top_stores(10, s, t)),
+                (f"metrics {suffix}", lambda s=selected, t=analysis_type: service.get_sales_metrics(s, t)),
+                (f"trend {suffix}", lambda s=selected, t=analysis_type: service.get_sales_trend(s, t)),
+                (f"member {suffix}", lambda s=selected, t=analysis_type: service.get_member_analysis(s, t)),
+            ]
+    selected = today.strftime('%Y-%m-%d')
+    for granularity in ('day', 'week', 'month'):
+        cases.append((f"trend_series {granularity}",
+                      lambda g=granularity: service.get_sales_trend_series(None, selected, g)))
+    for period in ('today', 'week', 'month', 'quarter', 'year'):
+        cases.append((f"detailed {period}", lambda p=period: service.get_detailed_metrics(selected, p)))
+        cases.append((f"detailed {period} approx",
+                      lambda p=period: service.get_detailed_metrics(selected, p, approx=True)))
+    cases.append(("dashboard", lambda: dashboard.get_dashboard(selected, 'month', 10, 'month')))
+    return cases
+
+
+def route_requests(today: date):
+    """(路径, 查询串) 覆盖全部销售、会员、仪表盘接口"""
+    selected = today.strftime('%Y-%m-%d')
+    requests = []
+    for analysis_type in ('day', 'month'):
+        params = urlencode({'date': selected, 'type': analysis_type})
+        requests += [(path, params) for path in ('/api/sales/overview', '/api/sales/stores', '/api/sales/metrics',
+                                                 '/api/sales/trend', '/api/members/analysis')]
+    requests += [
+        ('/api/sales/trend/series', urlencode({'end': selected, 'granularity': 'week'})),
+        ('/api/sales/detailed-metrics', urlencode({'date': selected, 'period': 'month'})),
+        ('/api/dashboard', urlencode({'date': selected, 'type': 'month', 'period': 'month'})),
+        ('/api/cache/stats', ''),
+        ('/api/_metrics', ''),
+        ('/api/rollup/status', ''),
+        ('/api/ranking/status', ''),
+    ]
+    return requests
+
+
+def route_cases(service: SalesService, dashboard: DashboardService, threads: int, today: date):
+    """HTTP 接口用例：能导入 app.py（需要 cx_Oracle）时经 Flask test client 调用，否则经 async_api 的 ASGI 应用调用"""
+    try:
+        import app as flask_module
+    except ImportError as e:
+        flask_module = None
+        sys.stderr.write(f"⚠️  无法导入 Flask 应用（{e}），HTTP 接口经 ASGI 应用测试，仅覆盖 async_api 中的销售接口\n")
+
+    requests = route_requests(today)
+    if flask_module is not None:
+        flask_module.sales_service = service
+        flask_module.dashboard_service = dashboard
+        client = flask_module.app.test_client()
+
+        def call(path, query_string):
+            response = client.get(path, query_string=query_string)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} 返回 {response.status_code}")
+        return 'flask', [(f"GET {path}?{query}".rstrip('?'), lambda p=path, q=query: call(p, q))
+                         for path, query in requests], None
+
+    from async_api import ROUTES
+    async_service = AsyncSalesService(service, threads)
+    app = create_asgi_app(async_service)
+    loop = asyncio.new_event_loop()
+
+    def call(path, query_string):
+        body = json.loads(loop.run_until_complete(call_asgi(app, (path, query_string))))
+        if not body.get('success'):
+            raise RuntimeError(f"{path}: {body.get('message')}")
+
+    def close():
+        async_service.shutdown()
+        async_service.dashboard.shutdown()
+        loop.close()
+
+    return 'asgi', [(f"GET {path}?{query}", lambda p=path, q=query: call(p, q))
+                    for path, query in requests if path in ROUTES], close
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+    return {'p50_ms': round(at(0.5), 3), 'p95_ms': round(at(0.95), 3), 'p99_ms': round(at(0.99), 3),
+            'mean_ms': round(statistics.fmean(ordered) * 1000, 3), 'calls': len(ordered)}
+
+
+def measure(service: SalesService, cases, rounds: int):
+    """每个用例调用 1 次预热 + rounds 次，每次调用前清空结果缓存"""
+    results = {}
+    for name, call in cases:
+        latencies = []
+        for index in range(rounds + 1):
+            service.cache.purge()
+            started = time.perf_counter()
+            call()
+            if index:
+                latencies.append(time.perf_counter() - started)
+        results[name] = summarize(latencies)
+    return results
+
+
+def throughput(service: SalesService, threads: int, count: int, today: date):
+    """--threads 个请求线程处理 count 个随机混合请求（关闭结果缓存），返回每秒请求数和延迟分布"""
+    cache, service.cache = service.cache, None
+    dashboard = DashboardService(service, threads)
+    handle = sync_handler(service, dashboard)
+    latencies = []
+
+    def timed(request):
+        started = time.perf_counter()
+        response = handle(request)
+        latencies.append(time.perf_counter() - started)
+        return response
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as server:
+            responses = list(server.map(timed, make_requests(count, today)))
+        elapsed = time.perf_counter() - started
+    finally:
+        dashboard.shutdown()
+        service.cache = cache
+    failed = sum(1 for response in responses if b'"success": false' in response)
+    return dict(summarize(latencies), requests_per_second=round(count / elapsed, 2), threads=threads,
+                failed=failed)
+
+
+def compare(current, baseline, tolerance: float):
+    """返回退化的用例 [(用例名, 基线 p50, 本次 p50)]"""
+    regressions = []
+    for section in ('methods', 'routes'):
+        for name, result in current[section].items():
+            base = baseline.get(section, {}).get(name)
+            if base is None:
+                continue
+            if result['p50_ms'] > base['p50_ms'] * (1 + tolerance) and result['p50_ms'] - base['p50_ms'] > NOISE_MS:
+                regressions.append((name, base['p50_ms'], result['p50_ms']))
+    base = baseline.get('throughput')
+    if base and current['throughput']['requests_per_second'] < base['requests_per_second'] / (1 + tolerance):
+        regressions.append(('throughput req/s', base['requests_per_second'],
+                            current['throughput']['requests_per_second']))
+    return regressions
+
+
+def print_table(title: str, results, baseline):
+    width = max([44] + [len(name) for name in results])
+    print(f"\n📊 {title}")
+    print(f"{'用例':<{width - 2}} {'p50':>9} {'p95':>9} {'p99':>9} {'基线p50':>9}")
+    for name, result in results.items():
+        base = baseline.get(name, {}).get('p50_ms')
+        print(f"{name:<{width}} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} {result['p99_ms']:9.2f} "
+              f"{base if base is not None else '-':>9}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='SalesService 离线基准测试')
+    parser.add_argument('--bills', type=int, default=2_000_000, help='m_retail 单据数')
+    parser.add_argument('--stores', type=int, default=2000, help='c_store 店铺数')
+    parser.add_argument('--vips', type=int, default=300_000, help='c_vips 会员数')
+    parser.add_argument('--days', type=int, default=730, help='单据日期覆盖截至今天的天数')
+    parser.add_argument('--db', help='数据集文件路径，默认在临时目录中按单据数命名')
+    parser.add_argument('--mode', choices=('oracle', 'rollup'), default='oracle',
+                        help='oracle: 全部直接查询 m_retail；rollup: 开启日汇总表和当月店铺排行')
+    parser.add_argument('--rounds', type=int, default=5, help='每个用例的测量次数')
+    parser.add_argument('--threads', type=int, default=8, help='吞吐量测试的请求线程数（也是连接池上限）')
+    parser.add_argument('--requests', type=int, default=200, help='吞吐量测试的请求数')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='基线文件路径')
+    parser.add_argument('--update-baseline', action='store_true', help='把本次结果写入基线文件')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='p50 允许比基线慢的比例')
+    parser.add_argument('--output', help='本次结果另存为 JSON 文件')
+    args = parser.parse_args()
+
+    today = date.today()
+    path = args.db or os.path.join(tempfile.gettempdir(), f"sanyun_bench_{args.bills}.db")
+    print(f"🔧 准备数据集 {path} ...")
+    started = time.perf_counter()
+    dataset = build_dataset(path, today - timedelta(days=args.days - 1), today,
+                            args.bills, args.stores, args.vips)
+    print(f"   {dataset['rows']} ({time.perf_counter() - started:.1f} s)")
+
+    service = create_service(path, args.threads, args.mode, args.days)
+    dashboard = DashboardService(service, min(4, args.threads))
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baselines = json.load(f)
+    baseline = baselines.get(args.mode, {})
+    comparable = baseline.get('dataset', {}).get('rows') == dataset['rows']
+    if baseline and not comparable:
+        print("⚠️  基线的数据集规模与本次不同，不做比较")
+        baseline = {}
+
+    # 服务内部的调试输出不计入结果
+    with contextlib.redirect_stdout(io.StringIO()):
+        methods = measure(service, method_cases(service, dashboard, today), args.rounds)
+    print_table(f"SalesService 方法（{args.mode}，每用例 {args.rounds} 次，单位 ms）",
+                methods, baseline.get('methods', {}))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        layer, cases, close = route_cases(service, dashboard, args.threads, today)
+        try:
+            routes = measure(service, cases, args.rounds)
+        finally:
+            if close is not None:
+                close()
+    print_table(f"HTTP 接口（{layer}，单位 ms）", routes, baseline.get('routes', {}))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mixed = throughput(service, args.threads, args.requests, today)
+    base_rps = baseline.get('throughput', {}).get('requests_per_second')
+    print(f"\n🚀 混合请求吞吐量: {mixed['requests_per_second']} 请求/秒（基线 {base_rps or '-'}），"
+          f"p50 {mixed['p50_ms']:.1f} ms / p95 {mixed['p95_ms']:.1f} ms / p99 {mixed['p99_ms']:.1f} ms，"
+          f"失败 {mixed['failed']}")
+
+    result = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'dataset': dataset,
+        'rounds': args.rounds,
+        'route_layer': layer,
+        'methods': methods,
+        'routes': routes,
+        'throughput': mixed,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({args.mode: result}, f, ensure_ascii=False, indent=2)
+
+    failures = mixed['failed']
+    if args.update_baseline:
+        baselines[args.mode] = result
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n💾 基线已写入 {args.baseline}")
+    elif baseline:
+        regressions = compare(result, baseline, args.tolerance)
+        for name, base, current in regressions:
+            print(f"❌ 退化: {name} 基线 {base} → 本次 {current}")
+        if not regressions:
+            print(f"\n✅ 没有超过 {args.tolerance:.0%} 的退化")
+        failures += len(regressions)
+    else:
+        print("\nℹ️  没有可比较的基线，使用 --update-baseline 生成")
+
+    dashboard.shutdown()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
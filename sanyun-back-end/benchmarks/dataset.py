@@ -0,0 +1,244 @@
+"""
+基准测试用的模拟数据集
+按 bosnds3.ddl 中 m_retail / c_store / c_vips 的完整列定义和索引在 SQLite 中建表（约束和存储参数除外），
+生成数百万条零售单据：门店规模长尾分布、周末和季节波动、约 6% 的仓库/库房店铺、会员重复消费、少量退货和未提交单据。
+生成参数记录在 _dataset 表中，参数相同时直接复用已有文件
+"""
+
+import json
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from standin import ymd
+
+DDL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                        'bosnds3.ddl')
+TABLES = ('c_store', 'c_vips', 'm_retail')
+
+# 12 个月的季节系数、周一至周日的系数
+SEASON = (1.25, 0.8, 0.9, 0.95, 1.0, 0.95, 0.9, 0.9, 1.0, 1.1, 1.15, 1.3)
+WEEKDAY = (0.85, 0.85, 0.9, 0.95, 1.1, 1.4, 1.35)
+# 营业时段（9~22 点）的权重
+HOURS = np.array([2, 4, 6, 7, 6, 5, 5, 6, 7, 9, 10, 9, 6, 3], dtype=float)
+DISCOUNTS = np.array([1.0, 0.9, 0.85, 0.8, 0.7, 0.5])
+DISCOUNT_WEIGHTS = np.array([0.35, 0.2, 0.15, 0.15, 0.1, 0.05])
+
+_TABLE_RE = r"CREATE TABLE bosnds3\.{table} \((.*?)\n\)"
+_INDEX_RE = re.compile(r"CREATE (?:UNIQUE )?INDEX bosnds3\.(\w+) ON\s+bosnds3\.(\w+) \((.*?)\)\s+TABLESPACE", re.S)
+_COLUMN_RE = re.compile(r"^\s*(\w+)\s+(\w+)(?:\s*\(([^)]*)\))?(.*?),?\s*$")
+_DEFAULT_RE = re.compile(r"DEFAULT\s+('[^']*'|-?\d+(?:\.\d+)?)(?:\s|$)")
+
+
+def _sqlite_type(oracle_type: str, size: Optional[str]) -> str:
+    if oracle_type == 'NUMBER':
+        if size is None:
+            return 'NUMERIC'
+        parts = [part.strip() for part in size.split(',')]
+        return 'REAL' if len(parts) > 1 and parts[1] != '0' else 'INTEGER'
+    # DATE 与替身库一致存为 'YYYY-MM-DD HH:MM:SS' 文本
+    return 'TEXT'
+
+
+def ddl_columns(table: str, ddl_path: str = DDL_PATH) -> List[Tuple[str, str, Optional[str]]]:
+    """bosnds3.ddl 中 table 的 [(列名, SQLite 类型, 默认值)]，只保留字面量默认值"""
+    with open(ddl_path, encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    match = re.search(_TABLE_RE.format(table=table), text, re.S)
+    if match is None:
+        raise ValueError(f"{ddl_path} 中没有表 {table}")
+    columns = []
+    for line in match.group(1).splitlines():
+        column = _COLUMN_RE.match(line)
+        if column is None:
+            continue
+        name, oracle_type, size, rest = column.groups()
+        default = _DEFAULT_RE.search(rest)
+        columns.append((name.lower(), _sqlite_type(oracle_type, size), default.group(1) if default else None))
+    return columns
+
+
+def ddl_indexes(table: str, ddl_path: str = DDL_PATH) -> List[Tuple[str, List[str]]]:
+    """table 上的普通列索引 [(索引名, [列名])]，跳过函数索引"""
+    with open(ddl_path, encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    indexes = []
+    for name, index_table, body in _INDEX_RE.findall(text):
+        if index_table.lower() != table or '"' in body or '(' in body:
+            continue
+        columns = [re.sub(r"\s+(ASC|DESC)$", '', part.strip()).lower() for part in body.split(',')]
+        if columns != ['id']:
+            indexes.append((name.lower(), columns))
+    return indexes
+
+
+def schema_sql(ddl_path: str = DDL_PATH) -> str:
+    """三张表的建表和建索引语句；id 为 INTEGER PRIMARY KEY，不保留 NOT NULL 和唯一约束，避免限制模拟数据"""
+    statements = []
+    for table in TABLES:
+        definitions = []
+        for name, sqlite_type, default in ddl_columns(table, ddl_path):
+            if name == 'id':
+                definitions.append('id INTEGER PRIMARY KEY')
+            else:
+                definitions.append(f"{name} {sqlite_type}" + (f" DEFAULT {default}" if default else ''))
+        statements.append(f"CREATE TABLE {table} (\n    " + ',\n    '.join(definitions) + "\n);")
+        for index_name, columns in ddl_indexes(table, ddl_path):
+            statements.append(f"CREATE INDEX {index_name} ON {table} ({', '.join(columns)});")
+    return '\n'.join(statements)
+
+
+def _store_rows(count: int, start: date, rng) -> Tuple[List[tuple], np.ndarray, np.ndarray]:
+    """返回 (c_store 行, 零售店 ID, 各零售店的客流权重)"""
+    rows = []
+    retail_ids, warehouse_ids = [], []
+    cities = ('杭州', '宁波', '温州', '上海', '苏州', '南京', '合肥', '福州')
+    for store_id in range(1, count + 1):
+        city = cities[store_id % len(cities)]
+        kind = rng.random()
+        if kind < 0.03:
+            name = f"{city}{store_id}号仓库"
+        elif kind < 0.06:
+            name = f"{city}中心库房{store_id}"
+        else:
+            name = f"{city}{store_id}店"
+        isactive = 'N' if rng.random() < 0.08 else 'Y'
+        opened = start - timedelta(days=int(rng.integers(0, 3000)))
+        modified = opened + timedelta(days=int(rng.integers(0, 60)))
+        rows.append((store_id, 37, 27, isactive, 893, f"{opened} 10:00:00", f"{modified} 10:00:00", 893,
+                     name, f"S{store_id:05d}", 'N' if isactive == 'Y' else 'Y', 'Y' if kind >= 0.06 else 'N'))
+        (retail_ids if kind >= 0.06 else warehouse_ids).append(store_id)
+    # 门店规模长尾分布：少数大店贡献大部分销售
+    weights = rng.lognormal(0, 0.9, len(retail_ids))
+    ids = np.array(retail_ids + warehouse_ids)
+    # 仓库/库房也有少量零售单据（内购、批发），查询必须把它们排除
+    weights = np.concatenate([weights / weights.sum() * 0.99,
+                              np.full(len(warehouse_ids), 0.01 / max(len(warehouse_ids), 1))])
+    return rows, ids, weights / weights.sum()
+
+
+def _vip_rows(count: int, start: date, end: date, rng) -> Tuple[List[tuple], np.ndarray]:
+    """返回 (c_vips 行, 按入会日期排序的入会日期 YYYYMMDD)"""
+    # 约三成会员在数据区间之前入会，其余在区间内逐步入会
+    span = (end - start).days + 1
+    offsets = np.where(rng.random(count) < 0.3,
+                       -rng.integers(1, 1500, count),
+                       rng.integers(0, span, count))
+    offsets.sort()
+    enterdates = np.array([ymd(start + timedelta(days=int(offset))) for offset in offsets])
+    rows = []
+    for vip_id, (offset, enterdate) in enumerate(zip(offsets, enterdates), start=1):
+        entered = start + timedelta(days=int(offset))
+        rows.append((vip_id, 37, 27, 'Y', f"{entered} 12:00:00", f"{entered} 12:00:00",
+                     f"V{vip_id:09d}", 1, 'W' if vip_id % 3 else 'M', int(enterdate),
+                     int(ymd(date(1970 + vip_id % 35, vip_id % 12 + 1, vip_id % 28 + 1)))))
+    return rows, enterdates
+
+
+def build_dataset(path: str, start: date, end: date, bills: int = 2_000_000, stores: int = 2000,
+                  vips: int = 300_000, seed: int = 7, ddl_path: str = DDL_PATH) -> Dict:
+    """在 path 生成数据集，参数与已有文件相同时直接复用；返回数据集参数（含实际行数）"""
+    params = {'start': start.isoformat(), 'end': end.isoformat(), 'bills': bills, 'stores': stores,
+              'vips': vips, 'seed': seed}
+    existing = dataset_info(path)
+    if existing is not None and all(existing.get(key) == value for key, value in params.items()):
+        return existing
+    if os.path.exists(path):
+        os.remove(path)
+
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;")
+    conn.executescript(schema_sql(ddl_path))
+
+    store_rows, store_ids, store_weights = _store_rows(stores, start, rng)
+    conn.executemany("INSERT INTO c_store (id, ad_client_id, ad_org_id, isactive, ownerid, creationdate, "
+                     "modifieddate, modifierid, name, code, isstop, isretail) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", store_rows)
+    vip_rows, enterdates = _vip_rows(vips, start, end, rng)
+    conn.executemany("INSERT INTO c_vips (id, ad_client_id, ad_org_id, isactive, creationdate, modifieddate, "
+                     "cardno, c_viptype_id, sex, enterdate, birthday) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", vip_rows)
+
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    factors = np.array([SEASON[day.month - 1] * WEEKDAY[day.weekday()] * (1 + 0.15 * index / len(days))
+                        for index, day in enumerate(days)])
+    expected = factors / factors.sum() * bills
+    hours = HOURS / HOURS.sum()
+
+    insert = ("INSERT INTO m_retail (id, ad_client_id, ad_org_id, ownerid, modifierid, creationdate, modifieddate, "
+              "isactive, docno, billdate, c_store_id, status, avg_discount, tot_lines, tot_qty, tot_amt_list, "
+              "tot_amt_actual, c_vip_id, vipno, statuserid, statustime, verno, pay_status, tot_payed) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    bill_id = 0
+    for day, mean in zip(days, expected):
+        count = int(rng.poisson(mean))
+        if count == 0:
+            continue
+        billdate = ymd(day)
+        ids = np.arange(bill_id + 1, bill_id + count + 1)
+        bill_id += count
+
+        store = rng.choice(store_ids, count, p=store_weights)
+        # 会员单据约占 55%，老会员更常回购
+        available = int(np.searchsorted(enterdates, billdate, side='right'))
+        member = (rng.random(count) < 0.55) & (available > 0)
+        vip = np.where(member, (available * rng.random(count) ** 1.5).astype(np.int64) + 1, 0)
+
+        qty = 1 + rng.poisson(1.2, count)
+        lines = 1 + rng.binomial(qty - 1, 0.6)
+        amount_list = np.round(qty * rng.lognormal(5.2, 0.45, count), 2)
+        discount = rng.choice(DISCOUNTS, count, p=DISCOUNT_WEIGHTS)
+        amount_actual = np.round(amount_list * discount, 2)
+        # 约 2% 为退货单，数量和金额为负
+        sign = np.where(rng.random(count) < 0.02, -1, 1)
+        # 约 5% 未提交（status = 2），3% 已作废（isactive = 'N'）
+        status = np.where(rng.random(count) < 0.05, 2, 1)
+        isactive = np.where(rng.random(count) < 0.03, 'N', 'Y')
+        minutes = (9 + rng.choice(len(hours), count, p=hours)) * 60 + rng.integers(0, 60, count)
+        # 约 1% 的单据事后修改过（版本号递增，修改时间晚一到三天）
+        edited = rng.random(count) < 0.01
+        delay = np.where(edited, rng.integers(1440, 4320, count), rng.integers(1, 30, count))
+
+        created = datetime(day.year, day.month, day.day)
+        rows = []
+        for index in range(count):
+            creation = created + timedelta(minutes=int(minutes[index]))
+            modified = (creation + timedelta(minutes=int(delay[index]))).isoformat(sep=' ')
+            vip_id = int(vip[index]) or None
+            actual = float(amount_actual[index]) * int(sign[index])
+            rows.append((
+                int(ids[index]), 37, 27, 893, 893, creation.isoformat(sep=' '), modified,
+                str(isactive[index]), f"RE{billdate}{index:05d}", billdate, int(store[index]), int(status[index]),
+                float(discount[index]), int(lines[index]), int(qty[index]) * int(sign[index]),
+                float(amount_list[index]) * int(sign[index]), actual,
+                vip_id, f"V{vip_id:09d}" if vip_id else None, 893,
+                modified if status[index] == 1 else None, int(edited[index]), 2, actual,
+            ))
+        conn.executemany(insert, rows)
+
+    conn.execute("CREATE TABLE _dataset (key TEXT PRIMARY KEY, value TEXT)")
+    info = dict(params, rows={table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                              for table in TABLES})
+    conn.executemany("INSERT INTO _dataset VALUES (?, ?)", [(key, json.dumps(value)) for key, value in info.items()])
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return info
+
+
+def dataset_info(path: str) -> Optional[Dict]:
+    """已有数据集文件的生成参数，文件不存在或未生成完成时返回 None"""
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    try:
+        return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM _dataset")}
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
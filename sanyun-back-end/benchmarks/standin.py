@@ -0,0 +1,178 @@
+"""
+SQLite 替身数据库
+在本地 SQLite 中建立 m_retail / c_store / c_vips 的精简表结构并生成模拟数据，
+提供与 cx_Oracle 相同的 connect(user, password, dsn) 接口，可直接交给 SessionPool 使用
+"""
+
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta
+
+# 使 benchmarks 下的脚本可以直接 import 后端模块
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# 替身服务默认不使用 config 中的汇总表文件，需要时显式传入 RollupStore
+os.environ.setdefault('ROLLUP_ENABLED', 'False')
+os.environ.setdefault('RANKING_ENABLED', 'False')
+os.environ.setdefault('CHANGE_FEED_ENABLED', 'False')
+# 慢查询只保留在内存中，不写入 data/slow_query.log
+os.environ.setdefault('SLOW_QUERY_LOG', '')
+
+# 与 cx_Oracle 一样可以直接绑定 datetime
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' '))
+
+SCHEMA_SQL = """
+CREATE TABLE c_store (
+    id            INTEGER PRIMARY KEY,
+    name          TEXT,
+    isactive      TEXT DEFAULT 'Y',
+    modifieddate  TEXT
+);
+CREATE TABLE c_vips (
+    id         INTEGER PRIMARY KEY,
+    enterdate  INTEGER
+);
+CREATE TABLE m_retail (
+    id              INTEGER PRIMARY KEY,
+    billdate        INTEGER,
+    c_store_id      INTEGER,
+    c_vip_id        INTEGER,
+    isactive        TEXT DEFAULT 'Y',
+    status          INTEGER DEFAULT 1,
+    avg_discount    REAL,
+    tot_lines       INTEGER,
+    tot_qty         INTEGER,
+    tot_amt_list    REAL,
+    tot_amt_actual  REAL,
+    modifieddate    TEXT,
+    creationdate    TEXT,
+    statustime      TEXT,
+    verno           INTEGER DEFAULT 0
+);
+CREATE INDEX idx_m_retail_billdate ON m_retail (billdate);
+CREATE INDEX idx_m_retail_vipid ON m_retail (c_vip_id);
+CREATE INDEX idx_m_retail_modifieddate ON m_retail (modifieddate);
+CREATE INDEX idx_m_retail_statustime ON m_retail (statustime);
+"""
+
+
+def _nvl(value, default):
+    return default if value is None else value
+
+
+class StandinConnection:
+    """包装 sqlite3 连接，补齐 cx_Oracle 连接上被用到的方法"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.create_function('NVL', 2, _nvl)
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def ping(self):
+        self._conn.execute('SELECT 1')
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class StandinDriver:
+    """替代 cx_Oracle 的驱动，dsn 为 SQLite 文件路径，并统计建立连接的次数"""
+
+    def __init__(self):
+        self.connects = 0
+
+    def connect(self, user=None, password=None, dsn=None, **kwargs):
+        self.connects += 1
+        return StandinConnection(dsn)
+
+
+def ymd(day: date) -> int:
+    return int(day.strftime('%Y%m%d'))
+
+
+def build_database(path: str, start: date, end: date, stores: int = 40,
+                   vips: int = 2000, bills_per_day: int = 60, seed: int = 7) -> str:
+    """在 path 生成模拟数据库，bill 日期覆盖 [start, end]"""
+    if os.path.exists(path):
+        os.remove(path)
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_SQL)
+
+    store_rows = []
+    for store_id in range(1, stores + 1):
+        if store_id % 10 == 0:
+            name = f"{store_id}号仓库"
+        elif store_id % 13 == 0:
+            name = f"中心库房{store_id}"
+        else:
+            name = f"零售店{store_id}"
+        store_rows.append((store_id, name, 'N' if store_id % 17 == 0 else 'Y', start.isoformat()))
+    conn.executemany("INSERT INTO c_store VALUES (?, ?, ?, ?)", store_rows)
+
+    span = (end - start).days + 1
+    vip_rows = [(vip_id, ymd(start + timedelta(days=rng.randrange(span))))
+                for vip_id in range(1, vips + 1)]
+    conn.executemany("INSERT INTO c_vips VALUES (?, ?)", vip_rows)
+
+    bill_rows = []
+    bill_id = 0
+    day = start
+    while day <= end:
+        for _ in range(rng.randint(bills_per_day // 2, bills_per_day * 3 // 2)):
+            bill_id += 1
+            qty = rng.randint(1, 6)
+            lines = rng.randint(1, qty)
+            list_amount = round(qty * rng.uniform(60, 400), 2)
+            discount = rng.choice([0, 0.7, 0.8, 0.85, 0.9, 1.0])
+            actual = round(list_amount * (discount or 1.0), 2)
+            modified = f"{day.isoformat()} {rng.randint(9, 21):02d}:{rng.randint(0, 59):02d}:00"
+            bill_rows.append((
+                bill_id,
+                ymd(day),
+                rng.randint(1, stores),
+                rng.randint(1, vips) if rng.random() < 0.6 else None,
+                'Y' if rng.random() < 0.97 else 'N',
+                1 if rng.random() < 0.95 else 2,
+                discount,
+                lines,
+                qty,
+                list_amount,
+                actual,
+                modified,
+                modified,
+                modified,
+            ))
+        day += timedelta(days=1)
+    conn.executemany("INSERT INTO m_retail (id, billdate, c_store_id, c_vip_id, isactive, status, avg_discount, "
+                     "tot_lines, tot_qty, tot_amt_list, tot_amt_actual, modifieddate, creationdate, statustime) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", bill_rows)
+
+    conn.commit()
+    conn.close()
+    return path
+
+
+def create_service(path: str, rollup=None, ranking=None):
+    """创建连接到替身数据库的 SalesService 及其驱动，rollup、ranking 为可选的 RollupStore、StoreRanking"""
+    from db_pool import SessionPool
+    from services.sales_service import SalesService
+
+    driver = StandinDriver()
+    db_config = {'user': 'standin', 'password': '', 'dsn': path}
+    pool = SessionPool(db_config['user'], db_config['password'], db_config['dsn'],
+                       min=1, max=4, driver=driver)
+    return SalesService(db_config, pool=pool, rollup=rollup, ranking=ranking), driver
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+核对变更捕获驱动的日汇总表、当月店铺排行与直接查询 m_retail 的结果是否一致
+模拟改金额（递增 verno）、只改 statustime 的作废、补录新单、改单据日期，检查事件分类、去重和增量更新；
+再让日汇总表、店铺排行各失败一次，检查批次重新投递后结果仍然一致；
+模拟两个进程共用同一个汇总表文件，检查同一批次的差值只写入一次；
+并检查已结束周期的缓存结果在单据变更后被清除。
+在 SQLite 替身数据库上运行，无需连接 Oracle:
+
+    python benchmarks/verify_change_feed.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from standin import build_database, create_service, ymd
+from verify_rollup import BACKFILL_DAYS, same
+from verify_rollup import compare as compare_rollup
+from verify_ranking import compare as compare_ranking
+
+from services.change_feed import ChangeFeed, DispatchError
+from services.rollup import RollupStore
+from services.store_ranking import StoreRanking
+
+
+def change_bills(path: str, today: date, round_no: int) -> dict:
+    """修改单据，返回期望的事件数 {'insert', 'update', 'void'}"""
+    conn = sqlite3.connect(path)
+    latest = max(datetime.fromisoformat(value) for value in conn.execute(
+        "SELECT MAX(modifieddate), MAX(statustime) FROM m_retail").fetchone() if value)
+    now = (max(latest, datetime.now()) + timedelta(minutes=1)).isoformat(sep=' ', timespec='seconds')
+    since = ymd(today - timedelta(days=40))
+
+    # 改金额并递增 verno
+    updated = conn.execute("UPDATE m_retail SET tot_amt_actual = tot_amt_actual * 1.5, verno = verno + 1, "
+                           "modifieddate = ? WHERE id % 97 = ? AND billdate >= ?", (now, round_no, since)).rowcount
+    # 作废只改 statustime，不改 modifieddate、verno
+    voided = conn.execute("UPDATE m_retail SET isactive = 'N', statustime = ? "
+                          "WHERE id % 89 = ? AND isactive = 'Y' AND status = 1 AND id % 97 != ? AND billdate >= ?",
+                          (now, round_no, round_no, since)).rowcount
+    # 改单据日期（从今天所在月份的 1 号改到今天）
+    moved = conn.execute("UPDATE m_retail SET billdate = ?, verno = verno + 1, modifieddate = ? "
+                         "WHERE id IN (SELECT id FROM m_retail WHERE billdate = ? AND id % 89 != ? AND id % 97 != ? "
+                         "LIMIT 3)", (ymd(today), now, ymd(today.replace(day=1)), round_no, round_no)).rowcount
+    # 补录新单
+    max_id = conn.execute("SELECT MAX(id) FROM m_retail").fetchone()[0]
+    inserted = 5
+    for offset in range(1, inserted + 1):
+        conn.execute("INSERT INTO m_retail (id, billdate, c_store_id, c_vip_id, isactive, status, avg_discount, "
+                     "tot_lines, tot_qty, tot_amt_list, tot_amt_actual, modifieddate, creationdate, statustime) "
+                     "VALUES (?, ?, ?, ?, 'Y', 1, 0.8, 1, 2, 100, 80, ?, ?, NULL)",
+                     (max_id + offset, ymd(today - timedelta(days=offset % 3)), offset, offset * 7 or None, now, now))
+    conn.commit()
+    conn.close()
+    return {'insert': inserted, 'void': voided, 'update': updated + moved}
+
+
+def poll(feed, connection, expected=None) -> int:
+    started = time.perf_counter()
+    result = feed.poll(connection)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"📥 轮询: {result} ({elapsed:.0f} ms)")
+    if expected is None:
+        return 0
+    actual = {kind: result[kind] for kind in expected}
+    ok = actual == expected
+    print(f"{'✅' if ok else '❌'} 事件数 {actual}（期望 {expected}）")
+    return 0 if ok else 1
+
+
+def fail_once(consumer):
+    """下一次 apply_changes 抛出异常，模拟回源时 Oracle 报错或本地 SQLite 文件被锁"""
+    def failing(cursor, batch):
+        del consumer.apply_changes
+        raise sqlite3.OperationalError('database is locked')
+    consumer.apply_changes = failing
+
+
+def poll_failing(feed, connection, consumer) -> int:
+    """consumer 失败的一次轮询：应抛出 DispatchError 且不推进批次号"""
+    batch = feed.status()['batch']
+    fail_once(consumer)
+    try:
+        feed.poll(connection)
+        print("❌ 消费者失败时轮询没有报错")
+        return 1
+    except DispatchError as e:
+        print(f"📥 轮询: {e}")
+    ok = feed.status()['batch'] == batch
+    print(f"{'✅' if ok else '❌'} 检查点未推进（批次 {feed.status()['batch']}）")
+    return 0 if ok else 1
+
+
+def race_with(rollup: RollupStore, twin: RollupStore):
+    """下一次 apply_changes 中，rollup 算好差值、提交之前，另一个进程（同一文件上的 twin）抢先应用同一批次"""
+    commit = rollup._commit_batch
+
+    def apply_changes(cursor, batch):
+        del rollup.apply_changes
+
+        def racing_commit(*args):
+            del rollup._commit_batch
+            twin.apply_changes(cursor, batch)
+            return commit(*args)
+        rollup._commit_batch = racing_commit
+        return rollup.apply_changes(cursor, batch)
+    rollup.apply_changes = apply_changes
+
+
+def closed_calls(today: date):
+    """上月（已结束，按 RESULT_CACHE_CLOSED_TTL 缓存）的若干查询 (方法名, 参数)"""
+    day = (today.replace(day=1) - timedelta(days=1)).strftime('%Y-%m-%d')
+    return [('get_sales_overview', (day, 'month')), ('get_top_stores', (10, day, 'month')),
+            ('get_sales_metrics', (day, 'month')), ('get_sales_trend', (day, 'month')),
+            ('get_member_analysis', (day, 'month'))]
+
+
+def check_cache(oracle_service, rollup_service, today: date, before: dict) -> int:
+    """单据变更后再次查询：rollup_service 不清缓存，结果应与直接查询一致且与变更前不同"""
+    failures = 0
+    changed = 0
+    oracle_service.cache.purge()
+    for name, args in closed_calls(today):
+        actual = getattr(rollup_service, name)(*args)
+        ok = same(getattr(oracle_service, name)(*args), actual)
+        changed += not same(before[name], actual)
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} 缓存 {name}{args}")
+    print(f"{'✅' if changed else '❌'} 已结束周期的缓存结果已按变更清除（{changed} 个结果变化，"
+          f"清除 {rollup_service.cache.stats()['invalidations']} 条）")
+    return failures + (not changed)
+
+
+def main() -> int:
+    today = date.today()
+    path = os.path.join(tempfile.gettempdir(), 'sanyun_standin_feed.db')
+    files = [path + '.rollup', path + '.feed']
+    for file in files + [name + suffix for name in files for suffix in ('-wal', '-shm')]:
+        if os.path.exists(file):
+            os.remove(file)
+
+    print("🔧 生成替身数据库...")
+    build_database(path, today - timedelta(days=BACKFILL_DAYS + 30), today)
+
+    feed = ChangeFeed(path + '.feed', overlap=600)
+    rollup = RollupStore(path + '.rollup')
+    ranking = StoreRanking(poll_interval=0, overlap=600)
+    oracle_service, _ = create_service(path)
+    rollup_service, _ = create_service(path, rollup=rollup)
+    ranked_service, _ = create_service(path, ranking=ranking)
+    feed.register(rollup)
+    feed.register(ranking)
+    feed.register(rollup_service.cache)
+
+    connection = rollup_service.get_connection()
+    failures = 0
+    try:
+        print(f"📦 回填: {rollup.sync(connection, BACKFILL_DAYS)}")
+        failures += poll(feed, connection)
+        failures += compare_rollup(oracle_service, rollup_service, today)
+        failures += compare_ranking(oracle_service, ranked_service, today)
+        # 首次启动时回看范围内的单据没有载入内容，第一次轮询时作为 before 未知的修改事件回源所在日期
+        print("\n📥 首次轮询")
+        failures += poll(feed, connection)
+
+        for round_no in (1, 2):
+            before = {name: getattr(rollup_service, name)(*args) for name, args in closed_calls(today)}
+            expected = change_bills(path, today, round_no)
+            print(f"\n🔄 第 {round_no} 轮修改单据")
+            failures += poll(feed, connection, expected)
+            failures += check_cache(oracle_service, rollup_service, today, before)
+            failures += compare_rollup(oracle_service, rollup_service, today)
+            failures += compare_ranking(oracle_service, ranked_service, today)
+
+        for round_no, consumer in ((3, rollup), (4, ranking)):
+            expected = change_bills(path, today, round_no)
+            print(f"\n💥 第 {round_no} 轮修改单据，{type(consumer).__name__} 应用失败一次")
+            failures += poll_failing(feed, connection, consumer)
+            print("🔁 重新投递")
+            failures += poll(feed, connection, expected)
+            failures += compare_rollup(oracle_service, rollup_service, today)
+            failures += compare_ranking(oracle_service, ranked_service, today)
+
+        # 两个进程共用汇总表文件：后提交的一方应发现批次已应用，放弃差值改为回源
+        twin = RollupStore(path + '.rollup')
+        applied = rollup.status()['deltas_applied']
+        expected = change_bills(path, today, 5)
+        print("\n👯 第 5 轮修改单据，另一进程抢先应用同一批次")
+        race_with(rollup, twin)
+        failures += poll(feed, connection, expected)
+        ok = twin.status()['deltas_applied'] > 0 and rollup.status()['deltas_applied'] == applied
+        print(f"{'✅' if ok else '❌'} 差值只写入一次（另一进程 {twin.status()['deltas_applied']} 行，"
+              f"本进程 {rollup.status()['deltas_applied'] - applied} 行）")
+        failures += not ok
+        failures += compare_rollup(oracle_service, rollup_service, today)
+
+        print("\n🔁 无新变更时再次轮询（回看范围内的单据应全部去重）")
+        failures += poll(feed, connection, {'insert': 0, 'update': 0, 'void': 0})
+        failures += compare_rollup(oracle_service, rollup_service, today)
+    finally:
+        connection.close()
+
+    rollup_status = rollup.status()
+    ranking_status = ranking.status()
+    feed_status = feed.status()
+    print(f"\n变更捕获: 批次 {feed_status['batch']}, 去重 {feed_status['duplicates']} 条, "
+          f"检查点 {feed_status['images']} 条单据")
+    print(f"汇总表: 增量更新 {rollup_status['deltas_applied']} 行, 回源重算 {rollup_status['days_refreshed']} 天")
+    print(f"店铺排行: 增量更新 {ranking_status['deltas_applied']} 项, 回源重算 {ranking_status['days_refreshed']} 天")
+    print("\n✅ 结果一致" if not failures else f"\n❌ {failures} 个检查不一致")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用计数的假驱动核对会话池的扩容、超时等待、借出前健康检查、discard 和统计计数
+无需连接 Oracle，也不需要替身数据库:
+
+    python benchmarks/verify_pool.py
+"""
+
+import sys
+import threading
+import time
+
+import standin  # noqa: F401  使 benchmarks 下可以 import 后端模块
+
+from db_pool import PoolTimeoutError, SessionPool
+from services.query_trace import QueryTracer
+
+
+class FakeConnection:
+    """假连接：alive=False 模拟被服务端或防火墙断开，之后 ping / 查询都会失败"""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.alive = True
+        self.closed = False
+        self.pings = 0
+
+    def ping(self):
+        self.pings += 1
+        if not self.alive:
+            raise ConnectionError(f"连接 {self.number} 已断开")
+
+    def query(self):
+        if not self.alive:
+            raise ConnectionError(f"连接 {self.number} 已断开")
+        return self.number
+
+    def close(self):
+        self.closed = True
+
+
+class CountingDriver:
+    """提供 connect(**kwargs)，记录建立的连接；fail_next 次 connect 抛出异常"""
+
+    def __init__(self):
+        self.connections = []
+        self.fail_next = 0
+
+    @property
+    def connects(self) -> int:
+        return len(self.connections)
+
+    def connect(self, **kwargs):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise ConnectionError("监听程序拒绝连接")
+        connection = FakeConnection(len(self.connections) + 1)
+        self.connections.append(connection)
+        return connection
+
+
+def make_pool(**options):
+    driver = CountingDriver()
+    settings = dict(min=1, max=4, increment=1, timeout=1.0, ping_interval=0)
+    settings.update(options)
+    return SessionPool('bosnds3', 'secret', 'standin', driver=driver, **settings), driver
+
+
+class Checker:
+    def __init__(self):
+        self.failures = 0
+
+    def __call__(self, name: str, ok: bool, detail: str = ''):
+        print(f"  {'✅' if ok else '❌'} {name}" + (f" ({detail})" if detail else ''))
+        self.failures += not ok
+
+
+def check_growth(check: Checker):
+    print("\n📈 按 min / increment 扩容到 max")
+    pool, driver = make_pool(min=2, max=5, increment=2)
+    held = [pool.acquire()]
+    check("首次借出补足到 min", driver.connects == 2 and pool.stats()['idle'] == 1, f"connects={driver.connects}")
+    held.append(pool.acquire())
+    check("空闲连接优先复用", driver.connects == 2)
+    held.append(pool.acquire())
+    check("用尽后按 increment 扩容", driver.connects == 4, f"connects={driver.connects}")
+    held.append(pool.acquire())
+    held.append(pool.acquire())
+    stats = pool.stats()
+    check("扩容不超过 max", driver.connects == 5 and stats['opened'] == 5 and stats['busy'] == 5,
+          f"connects={driver.connects}, opened={stats['opened']}")
+    for connection in held:
+        connection.close()
+    stats = pool.stats()
+    check("归还后全部空闲", stats['busy'] == 0 and stats['idle'] == 5 and stats['releases'] == 5)
+
+
+def check_timeout(check: Checker):
+    print("\n⏳ 连接池已满时等待与超时")
+    pool, driver = make_pool(max=2, timeout=0.2)
+    first, second = pool.acquire(), pool.acquire()
+
+    started = time.monotonic()
+    try:
+        pool.acquire()
+        timed_out = False
+    except PoolTimeoutError:
+        timed_out = True
+    elapsed = time.monotonic() - started
+    check("超时抛出 PoolTimeoutError", timed_out and 0.15 <= elapsed < 1.0, f"{elapsed * 1000:.0f} ms")
+    check("timeouts 计数", pool.stats()['timeouts'] == 1)
+
+    releaser = threading.Timer(0.05, second.close)
+    releaser.start()
+    third = pool.acquire()
+    releaser.join()
+    check("等待其他线程归还后借出", third.waited and pool.stats()['waits'] == 1)
+    check("等待期间不新建连接", driver.connects == 2)
+    first.close()
+    third.close()
+
+
+def check_health(check: Checker):
+    print("\n🩺 借出前健康检查")
+    pool, driver = make_pool(ping_interval=0)
+    connection = pool.acquire()
+    raw = driver.connections[0]
+    connection.close()
+    raw.alive = False
+
+    connection = pool.acquire()
+    stats = pool.stats()
+    check("断开的连接被替换", connection.query() == 2 and raw.closed, f"connects={driver.connects}")
+    check("health_checks / health_failures / reconnects 计数",
+          stats['health_checks'] == 1 and stats['health_failures'] == 1 and stats['reconnects'] == 1,
+          f"{stats['health_checks']}/{stats['health_failures']}/{stats['reconnects']}")
+    check("替换后容量不变", stats['opened'] == 1 and stats['busy'] == 1)
+    connection.close()
+
+    pool, driver = make_pool(ping_on_borrow=False)
+    pool.acquire().close()
+    pool.acquire().close()
+    check("ping_on_borrow=False 时不检查", pool.stats()['health_checks'] == 0 and driver.connections[0].pings == 0)
+
+
+def check_discard(check: Checker):
+    print("\n🗑️ discard 与建立连接失败")
+    pool, driver = make_pool(max=1, timeout=0.1)
+    connection = pool.acquire()
+    connection.discard()
+    connection.close()
+    stats = pool.stats()
+    check("discard 关闭连接并释放容量", driver.connections[0].closed and stats['opened'] == 0 and stats['idle'] == 0)
+    check("重复 close 不重复归还", stats['releases'] == 1 and stats['busy'] == 0)
+    pool.acquire().close()
+    check("之后按需重新建立连接", driver.connects == 2 and pool.stats()['reconnects'] == 1)
+
+    pool.drain()
+    driver.fail_next = 1
+    try:
+        pool.acquire()
+        raised = False
+    except ConnectionError:
+        raised = True
+    stats = pool.stats()
+    check("建立连接失败时抛出原异常并归还容量", raised and stats['opened'] == 0 and stats['busy'] == 0)
+    check("connect_errors 计数", stats['connect_errors'] == 1)
+    pool.acquire().close()
+    check("失败后可以再次借出", pool.stats()['opened'] == 1)
+
+
+def borrow_and_query(pool: SessionPool) -> bool:
+    """模拟 SalesService：查询出错时 mark_failed，finally 中 close 归还"""
+    connection = pool.acquire()
+    try:
+        connection.query()
+        return True
+    except ConnectionError:
+        connection.mark_failed()
+        return False
+    finally:
+        connection.close()
+
+
+def check_dead_connection(check: Checker):
+    print("\n💀 ping_interval 限频时连接被服务端断开")
+    pool, driver = make_pool(ping_interval=60)
+    for _ in range(5):
+        borrow_and_query(pool)
+    check("间隔内持续复用不 ping", pool.stats()['health_checks'] == 0 and driver.connects == 1)
+
+    driver.connections[0].alive = False
+    failed = sum(not borrow_and_query(pool) for _ in range(50))
+    stats = pool.stats()
+    check("只有第一次查询失败，之后借出前 ping 并替换", failed == 1 and driver.connects == 2,
+          f"失败 {failed}/50, health_checks={stats['health_checks']}")
+
+    # 距上次 ping 成功超过间隔就检查，不因期间频繁借还而推迟
+    pool, driver = make_pool(ping_interval=0.1)
+    started = time.monotonic()
+    while time.monotonic() - started < 0.35:
+        borrow_and_query(pool)
+        time.sleep(0.01)
+    checks = pool.stats()['health_checks']
+    check("频繁借还时仍按间隔 ping", 2 <= checks <= 4, f"health_checks={checks}")
+
+    # with 块和查询追踪代理在异常退出时同样标记
+    for name, wrap in (('with 块', lambda connection: connection), ('查询追踪代理', QueryTracer().wrap)):
+        pool, driver = make_pool(ping_interval=60)
+        pool.acquire().close()
+        driver.connections[0].alive = False
+        try:
+            with wrap(pool.acquire()) as connection:
+                connection.query()
+        except ConnectionError:
+            pass
+        borrow_and_query(pool)
+        check(f"{name}异常退出后下次借出前 ping", driver.connects == 2 and pool.stats()['health_failures'] == 1,
+              f"connects={driver.connects}")
+
+
+def check_stats(check: Checker):
+    print("\n📊 并发借还后的统计")
+    pool, driver = make_pool(max=3, timeout=5.0)
+
+    def worker():
+        for _ in range(50):
+            with pool.acquire():
+                time.sleep(0.001)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = pool.stats()
+    check("borrows == releases == 400", stats['borrows'] == stats['releases'] == 400)
+    check("连接数不超过 max", driver.connects == stats['opened'] == 3 and stats['busy'] == 0)
+    check("有等待、无超时", stats['waits'] > 0 and stats['timeouts'] == 0, f"waits={stats['waits']}")
+
+
+def main() -> int:
+    check = Checker()
+    check_growth(check)
+    check_timeout(check)
+    check_health(check)
+    check_discard(check)
+    check_dead_connection(check)
+    check_stats(check)
+    print("\n✅ 全部检查通过" if not check.failures else f"\n❌ {check.failures} 项检查失败")
+    return 1 if check.failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+核对当月店铺排行（内存增量维护）与直接查询 m_retail 的结果是否一致，并比较耗时
+在 SQLite 替身数据库上运行，无需连接 Oracle:
+
+    python benchmarks/verify_ranking.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from standin import build_database, create_service
+from verify_rollup import modify_bills, same
+
+from services.store_ranking import StoreRanking
+
+LIMITS = (1, 5, 10, 50, 1000)
+
+
+def calls(today: date):
+    """(名称, 参数) 覆盖当月的若干天、整月，以及不由排行提供的上月"""
+    last_month = today.replace(day=1) - timedelta(days=1)
+    days = sorted({today, today.replace(day=1), today - timedelta(days=min(today.day - 1, 3))})
+    result = []
+    for day in days + [last_month]:
+        selected_date = day.strftime('%Y-%m-%d')
+        for analysis_type in ('day', 'month'):
+            for limit in LIMITS:
+                result.append((f"{selected_date} {analysis_type} {limit}", (limit, selected_date, analysis_type)))
+    return result
+
+
+def compare(oracle_service, ranked_service, today: date) -> int:
+    failures = 0
+    oracle_ms = ranked_ms = 0.0
+    for name, args in calls(today):
+        oracle_service.cache.purge()
+        ranked_service.cache.purge()
+
+        started = time.perf_counter()
+        expected = oracle_service.get_top_stores(*args)
+        oracle_ms += (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        actual = ranked_service.get_top_stores(*args)
+        ranked_ms += (time.perf_counter() - started) * 1000
+
+        if not same(expected, actual):
+            failures += 1
+            print(f"❌ top_stores {name}\n   期望: {expected}\n   实际: {actual}")
+    total = len(calls(today))
+    print(f"{'✅' if not failures else '❌'} {total - failures}/{total} 个用例一致 | "
+          f"m_retail {oracle_ms:7.1f} ms | 内存排行 {ranked_ms:7.1f} ms")
+    return failures
+
+
+def bench(service, today: date, rounds: int) -> float:
+    """当月各天/整月、不同 limit 轮流查询 rounds 次（每次清空结果缓存），返回平均毫秒"""
+    requests = [args for _, args in calls(today) if args[1] >= today.replace(day=1).strftime('%Y-%m-%d')]
+    started = time.perf_counter()
+    for index in range(rounds):
+        service.cache.purge()
+        service.get_top_stores(*requests[index % len(requests)])
+    return (time.perf_counter() - started) * 1000 / rounds
+
+
+def main() -> int:
+    today = date.today()
+    path = os.path.join(tempfile.gettempdir(), 'sanyun_standin_ranking.db')
+    print("🔧 生成替身数据库...")
+    build_database(path, today - timedelta(days=70), today)
+
+    ranking = StoreRanking(poll_interval=0, overlap=600)
+    oracle_service, _ = create_service(path)
+    ranked_service, _ = create_service(path, ranking=ranking)
+
+    failures = compare(oracle_service, ranked_service, today)
+
+    modify_bills(path, today)
+    print("\n🔄 修改单据后增量刷新")
+    failures += compare(oracle_service, ranked_service, today)
+
+    # 按默认轮询间隔测量稳态耗时：排行只在轮询到变更后重新排序
+    ranking.poll_interval = 30
+    oracle_avg = bench(oracle_service, today, 200)
+    ranked_avg = bench(ranked_service, today, 200)
+    print(f"\n⏱️  当月排行平均耗时: m_retail {oracle_avg:.2f} ms | 内存排行 {ranked_avg:.2f} ms "
+          f"({oracle_avg / ranked_avg:.1f}x)")
+
+    status = ranking.status()
+    print(f"\n排行: 命中 {status['served']} 次, 重新排序 {status['rebuilds']} 次, "
+          f"轮询 {status['polls']} 次, 重算 {status['days_refreshed']} 天")
+    print("\n✅ 结果一致" if not failures else f"\n❌ {failures} 个用例结果不一致")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
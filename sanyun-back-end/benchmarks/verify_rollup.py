@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+核对日汇总表与直接查询 m_retail 的结果是否一致，并比较耗时
+在 SQLite 替身数据库上运行，无需连接 Oracle:
+
+    python benchmarks/verify_rollup.py
+"""
+
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from standin import build_database, create_service, ymd
+
+from services import hll
+from services.rollup import RollupStore
+
+BACKFILL_DAYS = 400
+
+
+def calls(today: date):
+    """(名称, 方法名, 参数) 覆盖 SalesService 中所有走汇总表的查询"""
+    selected = today.strftime('%Y-%m-%d')
+    last_month = (today.replace(day=1) - timedelta(days=1)).strftime('%Y-%m-%d')
+    result = []
+    for selected_date in (selected, last_month):
+        for analysis_type in ('day', 'month'):
+            suffix = f"{selected_date} {analysis_type}"
+            result += [
+                (f"overview {suffix}", 'get_sales_overview', (selected_date, analysis_type)),
+                (f"top_stores {suffix}", 'get_top_stores', (10, selected_date, analysis_type)),
+                (f"metrics {suffix}", 'get_sales_metrics', (selected_date, analysis_type)),
+                (f"trend {suffix}", 'get_sales_trend', (selected_date, analysis_type)),
+                (f"member {suffix}", 'get_member_analysis', (selected_date, analysis_type)),
+            ]
+    for granularity in ('day', 'week', 'month'):
+        result.append((f"trend_series {granularity}", 'get_sales_trend_series', (None, selected, granularity)))
+    for period in ('today', 'week', 'month', 'quarter', 'year'):
+        result.append((f"detailed {period}", 'get_detailed_metrics', (selected, period)))
+    return result
+
+
+def same(expected, actual) -> bool:
+    if isinstance(expected, dict):
+        return expected.keys() == actual.keys() and all(same(expected[k], actual[k]) for k in expected)
+    if isinstance(expected, (list, tuple)):
+        return len(expected) == len(actual) and all(same(e, a) for e, a in zip(expected, actual))
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return math.isclose(float(expected), float(actual), rel_tol=1e-9, abs_tol=1e-6)
+    return expected == actual
+
+
+def compare(oracle_service, rollup_service, today: date) -> int:
+    failures = 0
+    for name, method, args in calls(today):
+        oracle_service.cache.purge()
+        rollup_service.cache.purge()
+
+        started = time.perf_counter()
+        expected = getattr(oracle_service, method)(*args)
+        oracle_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        actual = getattr(rollup_service, method)(*args)
+        rollup_ms = (time.perf_counter() - started) * 1000
+
+        ok = same(expected, actual)
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name:<32} m_retail {oracle_ms:7.1f} ms | 汇总表 {rollup_ms:7.1f} ms")
+        if not ok:
+            print(f"   期望: {expected}\n   实际: {actual}")
+    return failures
+
+
+def compare_approx(rollup_service, today: date) -> int:
+    """approx=True 时去重会员数应在 4 倍相对标准误差以内"""
+    failures = 0
+    selected = today.strftime('%Y-%m-%d')
+    for period in ('week', 'month', 'year'):
+        rollup_service.cache.purge()
+        exact = rollup_service.get_detailed_metrics(selected, period)['unique_customers']
+        started = time.perf_counter()
+        approx = rollup_service.get_detailed_metrics(selected, period, approx=True)
+        approx_ms = (time.perf_counter() - started) * 1000
+
+        error = abs(approx['unique_customers'] - exact) / exact if exact else 0
+        ok = error <= 4 * hll.RELATIVE_ERROR and approx['approx_error'] == hll.RELATIVE_ERROR
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} approx {period:<25} 精确 {exact} | 估算 {approx['unique_customers']} "
+              f"(误差 {error:.2%}, {approx_ms:.1f} ms)")
+    return failures
+
+
+def modify_bills(path: str, today: date):
+    """模拟业务变更：改金额、作废单据、补录新单"""
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    # 修改时间晚于库中已有的全部单据（模拟数据中当天单据的修改时间可能晚于当前时刻）
+    latest = datetime.fromisoformat(conn.execute("SELECT MAX(modifieddate) FROM m_retail").fetchone()[0])
+    now = (max(latest, datetime.now()) + timedelta(minutes=1)).isoformat(sep=' ', timespec='seconds')
+    conn.execute("UPDATE m_retail SET tot_amt_actual = tot_amt_actual * 2, modifieddate = ? "
+                 "WHERE id % 97 = 0 AND billdate >= ?", (now, ymd(today - timedelta(days=40))))
+    conn.execute("UPDATE m_retail SET status = 2, modifieddate = ? WHERE id % 89 = 0", (now,))
+    max_id = conn.execute("SELECT MAX(id) FROM m_retail").fetchone()[0]
+    conn.execute("INSERT INTO m_retail (id, billdate, c_store_id, c_vip_id, isactive, status, avg_discount, "
+                 "tot_lines, tot_qty, tot_amt_list, tot_amt_actual, modifieddate, creationdate, statustime) "
+                 "VALUES (?, ?, 1, 5, 'Y', 1, 0.8, 1, 1, 100, 80, ?, ?, ?)",
+                 (max_id + 1, ymd(today), now, now, now))
+    conn.commit()
+    conn.close()
+
+
+def main() -> int:
+    today = date.today()
+    path = os.path.join(tempfile.gettempdir(), 'sanyun_standin_rollup.db')
+    rollup_path = path + '.rollup'
+    for file in (rollup_path, rollup_path + '-wal', rollup_path + '-shm'):
+        if os.path.exists(file):
+            os.remove(file)
+
+    print("🔧 生成替身数据库...")
+    build_database(path, today - timedelta(days=BACKFILL_DAYS + 30), today)
+
+    rollup = RollupStore(rollup_path)
+    oracle_service, _ = create_service(path)
+    rollup_service, _ = create_service(path, rollup=rollup)
+
+    connection = rollup_service.get_connection()
+    try:
+        started = time.perf_counter()
+        print(f"📦 回填: {rollup.sync(connection, BACKFILL_DAYS)} "
+              f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+        failures = compare(oracle_service, rollup_service, today)
+
+        modify_bills(path, today)
+        started = time.perf_counter()
+        print(f"\n🔄 增量同步: {rollup.sync(connection, BACKFILL_DAYS)} "
+              f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+        failures += compare(oracle_service, rollup_service, today)
+        failures += compare_approx(rollup_service, today)
+    finally:
+        connection.close()
+
+    status = rollup.status()
+    print(f"\n汇总表: {status['rows']} 行, 命中 {status['served']} 次, 回退 {status['fallbacks']} 次")
+    print("\n✅ 结果一致" if not failures else f"\n❌ {failures} 个用例结果不一致")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
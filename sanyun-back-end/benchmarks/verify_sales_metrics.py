@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+核对 get_sales_metrics 单次扫描实现与原多次查询实现的结果是否一致，
+并用随机聚合值核对向量化指标计算（metrics_engine）与原逐项标量公式是否一致
+在 SQLite 替身数据库上运行，无需连接 Oracle:
+
+    python benchmarks/verify_sales_metrics.py
+"""
+
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from calendar import monthrange
+from datetime import date, timedelta
+
+from standin import build_database, create_service, ymd
+
+from services.sales_service import SalesService
+
+# 原实现中排除仓库店铺的子查询
+WAREHOUSE_FILTER = """c_store_id NOT IN (
+        SELECT id FROM c_store WHERE name LIKE '%仓库%' OR name LIKE '%库房%'
+    )"""
+
+# 原实现中每个周期单独执行的聚合查询
+LEGACY_PERIOD_SQL = f"""
+    SELECT
+        NVL(SUM(tot_amt_actual), 0) as total_sales,
+        NVL(SUM(tot_amt_list), 0) as total_list_price,
+        NVL(AVG(CASE WHEN avg_discount > 0 THEN avg_discount END), 0) as avg_discount_rate,
+        COUNT(*) as total_orders,
+        NVL(SUM(tot_qty), 0) as total_quantity,
+        NVL(SUM(tot_lines), 0) as total_lines,
+        COUNT(DISTINCT c_store_id) as active_stores,
+        COUNT(DISTINCT c_vip_id) as unique_customers,
+        COUNT(DISTINCT CASE WHEN c_vip_id IS NOT NULL THEN id END) as member_orders
+    FROM m_retail
+    WHERE billdate >= :start_date AND billdate <= :end_date
+    AND {WAREHOUSE_FILTER}
+"""
+
+LEGACY_NEW_CUSTOMERS_SQL = """
+    SELECT COUNT(DISTINCT v.id) as new_customers
+    FROM c_vips v
+    WHERE v.enterdate >= :current_start AND v.enterdate <= :current_end
+    AND EXISTS (
+        SELECT 1 FROM m_retail r
+        WHERE r.c_vip_id = v.id
+        AND r.billdate >= :current_start AND r.billdate <= :current_end
+    )
+"""
+
+LEGACY_REPEAT_CUSTOMERS_SQL = """
+    SELECT COUNT(DISTINCT c_vip_id) as repeat_customers
+    FROM (
+        SELECT c_vip_id, COUNT(*) as visit_count
+        FROM m_retail
+        WHERE billdate >= :current_start AND billdate <= :current_end
+        AND c_vip_id IS NOT NULL
+        GROUP BY c_vip_id
+        HAVING COUNT(*) > 1
+    )
+"""
+
+FIELDS = ('total_sales', 'total_list_price', 'avg_discount_rate', 'total_orders', 'total_quantity',
+          'total_lines', 'active_stores', 'unique_customers', 'member_orders')
+
+CASES = [
+    ('2024-03-15', 'month'),
+    ('2024-03-15', 'day'),
+    ('2024-01-31', 'month'),
+    ('2024-01-01', 'day'),
+    ('2024-06-30', 'month'),
+]
+
+
+def legacy_periods(selected_date: str, analysis_type: str):
+    """原实现的日期区间推算（仅用于测试数据范围内的日期）"""
+    year, month, day = (int(part) for part in selected_date.split('-'))
+
+    current = date(year, month, day)
+    if analysis_type == 'day':
+        days = {
+            'current': current,
+            'prev': current - timedelta(days=1),
+            'lastyear': current.replace(year=year - 1),
+        }
+        return {name: (ymd(value), ymd(value)) for name, value in days.items()}
+
+    prev_year, prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return {
+        'current': (int(f"{year}{month:02d}01"), int(f"{year}{month:02d}{monthrange(year, month)[1]}")),
+        'prev': (int(f"{prev_year}{prev_month:02d}01"),
+                 int(f"{prev_year}{prev_month:02d}{monthrange(prev_year, prev_month)[1]}")),
+        'lastyear': (int(f"{year - 1}{month:02d}01"),
+                     int(f"{year - 1}{month:02d}{monthrange(year - 1, month)[1]}")),
+    }
+
+
+def scalar_sales_metrics(current_data, prev_data, lastyear_data, new_customers, repeat_customers):
+    """原 _build_sales_metrics 的逐项标量公式（含对比基准中销售附加、新客占比、会员回店的原有口径）"""
+    def safe_divide(a, b):
+        return (a / b) if b > 0 else 0
+
+    def safe_percentage(current, previous):
+        return ((current - previous) / previous * 100) if previous > 0 else 0
+
+    current_sales = float(current_data['total_sales'])
+    current_list_price = float(current_data['total_list_price'])
+    current_discount_rate = float(current_data['avg_discount_rate'])
+    current_orders = current_data['total_orders']
+    current_lines = current_data['total_lines']
+    current_stores = current_data['active_stores']
+    current_customers = current_data['unique_customers']
+
+    prev_sales = float(prev_data['total_sales'])
+    prev_discount = float(prev_data['avg_discount_rate'])
+    prev_orders = prev_data['total_orders']
+    prev_stores = prev_data['active_stores']
+    prev_customers = prev_data['unique_customers']
+    prev_lines = prev_data['total_lines']
+
+    lastyear_sales = float(lastyear_data['total_sales'])
+    lastyear_discount = float(lastyear_data['avg_discount_rate'])
+    lastyear_orders = lastyear_data['total_orders']
+    lastyear_stores = lastyear_data['active_stores']
+    lastyear_customers = lastyear_data['unique_customers']
+    lastyear_lines = lastyear_data['total_lines']
+
+    avg_order_value = safe_divide(current_sales, current_orders)
+    attachment_rate = safe_divide(current_lines, current_orders)
+    new_customer_ratio = safe_divide(new_customers, current_customers) * 100
+    repeat_customer_ratio = safe_divide(repeat_customers, current_customers) * 100
+    if current_list_price > 0:
+        sales_attachment = ((current_list_price - current_sales) / current_list_price) * 100
+    else:
+        sales_attachment = 0
+
+    return [
+        {'name': '销售额', 'value': current_sales,
+         'mom_change': safe_percentage(current_sales, prev_sales),
+         'yoy_change': safe_percentage(current_sales, lastyear_sales)},
+        {'name': '折扣率', 'value': current_discount_rate,
+         'mom_change': safe_percentage(current_discount_rate, prev_discount),
+         'yoy_change': safe_percentage(current_discount_rate, lastyear_discount)},
+        {'name': '客单价', 'value': avg_order_value,
+         'mom_change': safe_percentage(avg_order_value, safe_divide(prev_sales, prev_orders)),
+         'yoy_change': safe_percentage(avg_order_value, safe_divide(lastyear_sales, lastyear_orders))},
+        # 对比基准沿用 (连带率 - 客单价) / 客单价，而不是当期的 (吊牌额 - 实收) / 吊牌额
+        {'name': '销售附加', 'value': sales_attachment,
+         'mom_change': safe_percentage(sales_attachment, safe_divide(
+             (safe_divide(prev_lines, prev_orders) - prev_sales / prev_orders) * 100,
+             prev_sales / prev_orders) if prev_orders > 0 else 0),
+         'yoy_change': safe_percentage(sales_attachment, safe_divide(
+             (safe_divide(lastyear_lines, lastyear_orders) - lastyear_sales / lastyear_orders) * 100,
+             lastyear_sales / lastyear_orders) if lastyear_orders > 0 else 0)},
+        {'name': '活跃店铺', 'value': current_stores,
+         'mom_change': safe_percentage(current_stores, prev_stores),
+         'yoy_change': safe_percentage(current_stores, lastyear_stores)},
+        {'name': '新客占比', 'value': new_customer_ratio,
+         'mom_change': safe_percentage(new_customer_ratio,
+                                       safe_divide(new_customers, prev_customers) * 100 if prev_customers > 0 else 0),
+         'yoy_change': safe_percentage(new_customer_ratio,
+                                       safe_divide(new_customers, lastyear_customers) * 100
+                                       if lastyear_customers > 0 else 0)},
+        {'name': '会员回店', 'value': repeat_customer_ratio,
+         'mom_change': safe_percentage(repeat_customer_ratio,
+                                       safe_divide(repeat_customers, prev_customers) * 100
+                                       if prev_customers > 0 else 0),
+         'yoy_change': safe_percentage(repeat_customer_ratio,
+                                       safe_divide(repeat_customers, lastyear_customers) * 100
+                                       if lastyear_customers > 0 else 0)},
+        {'name': '连带率', 'value': attachment_rate,
+         'mom_change': safe_percentage(attachment_rate, safe_divide(prev_lines, prev_orders)),
+         'yoy_change': safe_percentage(attachment_rate, safe_divide(lastyear_lines, lastyear_orders))},
+    ]
+
+
+def random_aggregates(rng: random.Random) -> dict:
+    """随机周期聚合值，约三分之一的字段取 0（无单据、无吊牌额、无会员等边界）"""
+    def pick(value):
+        return 0 if rng.random() < 0.3 else value
+
+    orders = pick(rng.randint(1, 5000))
+    return {
+        'total_sales': pick(round(rng.uniform(0, 2e6), 2)),
+        'total_list_price': pick(round(rng.uniform(0, 3e6), 2)),
+        'avg_discount_rate': pick(round(rng.uniform(0.3, 1.0), 4)),
+        'total_orders': orders,
+        'total_quantity': pick(rng.randint(1, 20000)),
+        'total_lines': pick(rng.randint(1, 15000)),
+        'active_stores': pick(rng.randint(1, 400)),
+        'unique_customers': pick(rng.randint(1, 3000)),
+        'member_orders': pick(rng.randint(0, orders)),
+    }
+
+
+def check_random(rounds: int = 5000, seed: int = 20240315) -> int:
+    """随机聚合值下，向量化实现与原标量公式逐项比较，返回不一致的组数"""
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(rounds):
+        periods = [random_aggregates(rng) for _ in range(3)]
+        customers = (rng.choice((0, rng.randint(1, 500))), rng.choice((0, rng.randint(1, 500))))
+        expected = scalar_sales_metrics(*periods, *customers)
+        actual = SalesService._build_sales_metrics(*periods, *customers)
+        if not same_metrics(expected, actual):
+            failures += 1
+    print(f"{'✅' if not failures else '❌'} 随机聚合值 {rounds} 组：向量化实现与原标量公式"
+          f"{'一致' if not failures else f'有 {failures} 组不一致'}")
+    return failures
+
+
+def legacy_sales_metrics(service: SalesService, selected_date: str, analysis_type: str):
+    """按原实现逐个周期查询，再按原标量公式计算指标"""
+    periods = legacy_periods(selected_date, analysis_type)
+    connection = service.get_connection()
+    cursor = connection.cursor()
+    try:
+        aggregates = {}
+        for name, (start, end) in periods.items():
+            cursor.execute(LEGACY_PERIOD_SQL, {'start_date': start, 'end_date': end})
+            aggregates[name] = dict(zip(FIELDS, cursor.fetchone()))
+
+        binds = {'current_start': periods['current'][0], 'current_end': periods['current'][1]}
+        cursor.execute(LEGACY_NEW_CUSTOMERS_SQL, binds)
+        new_customers = cursor.fetchone()[0] or 0
+        cursor.execute(LEGACY_REPEAT_CUSTOMERS_SQL, binds)
+        repeat_customers = cursor.fetchone()[0] or 0
+    finally:
+        cursor.close()
+        connection.close()
+
+    return scalar_sales_metrics(
+        aggregates['current'], aggregates['prev'], aggregates['lastyear'],
+        new_customers, repeat_customers
+    )
+
+
+def same_metrics(expected, actual) -> bool:
+    if len(expected) != len(actual):
+        return False
+    for left, right in zip(expected, actual):
+        if left['name'] != right['name']:
+            return False
+        for key in ('value', 'mom_change', 'yoy_change'):
+            if not math.isclose(float(left[key]), float(right[key]), rel_tol=1e-9, abs_tol=1e-9):
+                print(f"  ✗ {left['name']}.{key}: {left[key]} != {right[key]}")
+                return False
+    return True
+
+
+def main() -> int:
+    path = os.path.join(tempfile.gettempdir(), 'sanyun_standin_metrics.db')
+    print("🔧 生成替身数据库...")
+    build_database(path, date(2022, 12, 1), date(2024, 7, 31))
+    service, _ = create_service(path)
+
+    failures = check_random()
+    for selected_date, analysis_type in CASES:
+        started = time.perf_counter()
+        expected = legacy_sales_metrics(service, selected_date, analysis_type)
+        legacy_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        actual = service.get_sales_metrics(selected_date, analysis_type)
+        single_ms = (time.perf_counter() - started) * 1000
+
+        ok = same_metrics(expected, actual)
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {selected_date} {analysis_type:<5} "
+              f"原实现 {legacy_ms:7.1f} ms | 单次扫描 {single_ms:7.1f} ms")
+
+    print("\n✅ 结果一致" if not failures else f"\n❌ {failures} 个用例结果不一致")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
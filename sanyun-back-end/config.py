@@ -11,6 +11,66 @@ class Config:
     DB_HOSTNAME = os.getenv('DB_HOSTNAME', '49.235.20.50')
     DB_PORT = int(os.getenv('DB_PORT', 8853))
     DB_SERVICE_NAME = os.getenv('DB_SERVICE_NAME', 'orcl')
+    DB_DSN = f"{DB_HOSTNAME}:{DB_PORT}/{DB_SERVICE_NAME}"
+    
+    # 连接池配置
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 8))
+    DB_POOL_INCREMENT = int(os.getenv('DB_POOL_INCREMENT', 1))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_PING_ON_BORROW = os.getenv('DB_POOL_PING_ON_BORROW', 'True').lower() == 'true'
+    DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', 60))
+    # 连接分配方式: pooled（每次查询从池中借还）或 thread（每个工作线程固定持有一个连接）
+    DB_CONNECTION_MODE = os.getenv('DB_CONNECTION_MODE', 'pooled')
+    
+    # 店铺维度缓存：TTL 秒数、变更检测间隔秒数
+    STORE_CACHE_TTL = float(os.getenv('STORE_CACHE_TTL', 3600))
+    STORE_CACHE_CHECK_INTERVAL = float(os.getenv('STORE_CACHE_CHECK_INTERVAL', 60))
+    
+    # 查询结果缓存：最大条目数；包含今天的周期、已结束周期的缓存秒数
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True').lower() == 'true'
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 1024))
+    RESULT_CACHE_OPEN_TTL = float(os.getenv('RESULT_CACHE_OPEN_TTL', 60))
+    RESULT_CACHE_CLOSED_TTL = float(os.getenv('RESULT_CACHE_CLOSED_TTL', 43200))
+    
+    # 相同参数的并发查询合并为一次执行（single-flight）
+    SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+    
+    # 本地日汇总表：SQLite 文件路径、首次回填天数、后台同步间隔秒数、
+    # 允许的最大同步滞后秒数（超过则回退 Oracle）、增量同步高水位回看秒数
+    ROLLUP_ENABLED = os.getenv('ROLLUP_ENABLED', 'True').lower() == 'true'
+    ROLLUP_PATH = os.getenv('ROLLUP_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                        'data', 'm_retail_rollup.sqlite3'))
+    ROLLUP_BACKFILL_DAYS = int(os.getenv('ROLLUP_BACKFILL_DAYS', 800))
+    ROLLUP_SYNC_INTERVAL = float(os.getenv('ROLLUP_SYNC_INTERVAL', 300))
+    ROLLUP_MAX_LAG = float(os.getenv('ROLLUP_MAX_LAG', 900))
+    ROLLUP_OVERLAP = float(os.getenv('ROLLUP_OVERLAP', 600))
+    
+    # 当月店铺排行：内存中按日 × 店铺维护，距上次轮询超过该秒数时按 modifieddate 增量刷新
+    RANKING_ENABLED = os.getenv('RANKING_ENABLED', 'True').lower() == 'true'
+    RANKING_POLL_INTERVAL = float(os.getenv('RANKING_POLL_INTERVAL', 30))
+    
+    # m_retail 变更捕获：按 modifieddate / statustime 高水位轮询，检查点 SQLite 文件路径、轮询间隔秒数、
+    # 高水位回看秒数、检查点中保留单据内容的天数；开启后日汇总表、当月店铺排行按变更事件增量更新，不再各自轮询
+    CHANGE_FEED_ENABLED = os.getenv('CHANGE_FEED_ENABLED', 'True').lower() == 'true'
+    CHANGE_FEED_PATH = os.getenv('CHANGE_FEED_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                  'data', 'm_retail_changes.sqlite3'))
+    CHANGE_FEED_INTERVAL = float(os.getenv('CHANGE_FEED_INTERVAL', 30))
+    CHANGE_FEED_OVERLAP = float(os.getenv('CHANGE_FEED_OVERLAP', 600))
+    CHANGE_FEED_RETENTION_DAYS = int(os.getenv('CHANGE_FEED_RETENTION_DAYS', 62))
+    
+    # 查询追踪：执行加取数超过 SLOW_QUERY_MS 毫秒的 SQL 写入慢查询日志，百分位数按最近 QUERY_TRACE_WINDOW 次计算
+    QUERY_TRACE_ENABLED = os.getenv('QUERY_TRACE_ENABLED', 'True').lower() == 'true'
+    QUERY_TRACE_WINDOW = int(os.getenv('QUERY_TRACE_WINDOW', 1000))
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 500))
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              'data', 'slow_query.log'))
+    
+    # 仪表盘批量接口并发查询的线程数（所有请求共用，应不超过 DB_POOL_MAX）
+    DASHBOARD_WORKERS = int(os.getenv('DASHBOARD_WORKERS', 4))
+    
+    # ASGI 模式（uvicorn asgi:app）执行阻塞查询的线程数，默认等于连接池上限
+    ASYNC_WORKERS = int(os.getenv('ASYNC_WORKERS', DB_POOL_MAX))
     
     # Flask配置
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
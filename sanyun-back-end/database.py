@@ -1,77 +1,177 @@
-import cx_Oracle
+import threading
+import time
+from contextlib import contextmanager
 from typing import Optional, List, Dict, Any
 from config import Config
+from db_pool import PooledConnection, get_session_pool
+
+class _ThreadConnection:
+    """工作线程固定持有的连接，线程结束、本对象被回收时归还连接池"""
+
+    def __init__(self, connection: PooledConnection):
+        self.connection = connection
+        self.checked_at = time.monotonic()
+
+    def __del__(self):
+        self.connection.close()
 
 class DatabaseManager:
-    """数据库管理类"""
-    
-    def __init__(self):
+    """数据库管理类
+
+    线程安全：pooled 模式下每次查询从会话池借出、用完归还；
+    thread 模式下每个工作线程固定持有一个池化连接，适合线程数固定的 gunicorn/Flask 部署。
+    """
+
+    MODES = ('pooled', 'thread')
+
+    def __init__(self, mode: str = None):
         self.config = Config()
-        self._connection = None
-    
-    def get_connection(self) -> Optional[cx_Oracle.Connection]:
-        """获取数据库连接"""
+        self.mode = mode or self.config.DB_CONNECTION_MODE
+        if self.mode not in self.MODES:
+            raise ValueError(f"不支持的连接模式: {self.mode}")
+
+        self._pool = get_session_pool(
+            self.config.DB_USERNAME,
+            self.config.DB_PASSWORD,
+            self.config.DB_DSN,
+            encoding="UTF-8"
+        )
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {'borrows': 0, 'waits': 0, 'reconnects': 0}
+
+    def get_connection(self) -> Optional[PooledConnection]:
+        """获取数据库连接，使用完毕后调用 release_connection() 归还"""
         try:
-            if self._connection is None or not self._connection.ping():
-                dsn = cx_Oracle.makedsn(
-                    self.config.DB_HOSTNAME,
-                    self.config.DB_PORT,
-                    service_name=self.config.DB_SERVICE_NAME
-                )
-                self._connection = cx_Oracle.connect(
-                    self.config.DB_USERNAME,
-                    self.config.DB_PASSWORD,
-                    dsn,
-                    encoding="UTF-8"
-                )
-            return self._connection
+            if self.mode == 'thread':
+                return self._get_thread_connection()
+
+            connection = self._pool.acquire()
+            self._count(borrows=1, waits=int(connection.waited))
+            return connection
         except Exception as e:
             print(f"数据库连接失败: {e}")
             return None
-    
-    def execute_query(self, query: str, params: Dict[str, Any] = None) -> List[tuple]:
-        """执行查询并返回结果"""
+
+    def release_connection(self, connection: PooledConnection, failed: bool = False):
+        """归还连接；查询失败时确认连接是否仍然可用，不可用则丢弃"""
+        broken = failed and not self._is_alive(connection)
+
+        if self.mode == 'thread':
+            if broken:
+                self._local.holder = None
+                connection.discard()
+            return
+
+        if broken:
+            connection.discard()
+        else:
+            connection.close()
+
+    @contextmanager
+    def connection(self):
+        """借出连接的上下文管理器"""
         connection = self.get_connection()
         if not connection:
             raise Exception("无法连接到数据库")
-        
+
+        failed = False
         try:
-            cursor = connection.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            results = cursor.fetchall()
-            cursor.close()
-            return results
-        except Exception as e:
-            raise Exception(f"查询执行失败: {str(e)}")
-    
+            yield connection
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release_connection(connection, failed)
+
+    def execute_query(self, query: str, params: Dict[str, Any] = None) -> List[tuple]:
+        """执行查询并返回结果"""
+        with self.connection() as connection:
+            try:
+                cursor = connection.cursor()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+
+                results = cursor.fetchall()
+                cursor.close()
+                return results
+            except Exception as e:
+                raise Exception(f"查询执行失败: {str(e)}")
+
     def execute_single_query(self, query: str, params: Dict[str, Any] = None) -> Optional[tuple]:
         """执行查询并返回单个结果"""
-        connection = self.get_connection()
-        if not connection:
-            raise Exception("无法连接到数据库")
-        
-        try:
-            cursor = connection.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            result = cursor.fetchone()
-            cursor.close()
-            return result
-        except Exception as e:
-            raise Exception(f"查询执行失败: {str(e)}")
-    
+        with self.connection() as connection:
+            try:
+                cursor = connection.cursor()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+
+                result = cursor.fetchone()
+                cursor.close()
+                return result
+            except Exception as e:
+                raise Exception(f"查询执行失败: {str(e)}")
+
     def close_connection(self):
-        """关闭数据库连接"""
-        if self._connection:
-            self._connection.close()
-            self._connection = None
+        """归还当前线程持有的连接，并关闭连接池中的空闲连接"""
+        holder = getattr(self._local, 'holder', None)
+        if holder is not None:
+            self._local.holder = None
+            holder.connection.close()
+        self._pool.drain()
+
+    def stats(self) -> Dict[str, Any]:
+        """借出次数、等待次数、重连次数及连接池统计"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['mode'] = self.mode
+        stats['pool'] = self._pool.stats()
+        return stats
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """连接池统计信息"""
+        return self._pool.stats()
+
+    def _get_thread_connection(self) -> PooledConnection:
+        """返回当前线程持有的连接，按 ping 间隔限频检查存活"""
+        holder = getattr(self._local, 'holder', None)
+
+        if holder is not None and self._pool.ping_on_borrow:
+            now = time.monotonic()
+            if now - holder.checked_at >= self._pool.ping_interval:
+                if self._is_alive(holder.connection):
+                    holder.checked_at = now
+                else:
+                    self._local.holder = None
+                    holder.connection.discard()
+                    holder = None
+                    self._count(reconnects=1)
+
+        if holder is None:
+            connection = self._pool.acquire()
+            self._count(waits=int(connection.waited))
+            holder = _ThreadConnection(connection)
+            self._local.holder = holder
+
+        self._count(borrows=1)
+        return holder.connection
+
+    @staticmethod
+    def _is_alive(connection: PooledConnection) -> bool:
+        try:
+            connection.ping()
+            return True
+        except Exception:
+            return False
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, value in deltas.items():
+                self._stats[name] += value
 
 # 全局数据库管理器实例
-db_manager = DatabaseManager() 
\ No newline at end of file
+db_manager = DatabaseManager()
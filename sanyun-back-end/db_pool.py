@@ -0,0 +1,281 @@
+"""
+Oracle会话池
+SalesService 与 DatabaseManager 共享同一个连接池，避免每次请求都重新建立TCP连接和认证
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from config import Config
+
+
+class PoolTimeoutError(Exception):
+    """在超时时间内未能从连接池获取到连接"""
+
+
+class PooledConnection:
+    """池化连接代理，close() 时将连接归还连接池而不是真正断开"""
+
+    def __init__(self, pool: 'SessionPool', raw, waited: bool = False, checked_at: float = 0.0):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+        # 借出时是否因连接池已满而等待过
+        self.waited = waited
+        # 最近一次建立连接或 ping 成功的时间，归还时原样带回空闲队列
+        self.checked_at = checked_at
+        self.failed = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def mark_failed(self):
+        """查询出错时调用，连接照常归还，但下次借出前必须 ping"""
+        self.failed = True
+
+    def close(self):
+        """归还连接（可重复调用）"""
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw, checked_at=0.0 if self.failed else self.checked_at)
+
+    def discard(self):
+        """连接已损坏时调用，关闭连接并从池中移除"""
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.mark_failed()
+        self.close()
+
+
+class SessionPool:
+    """线程安全的会话池
+
+    - min/max/increment: 最少连接数、最多连接数、每次扩容的连接数
+    - timeout: 连接全部被占用时，acquire() 最长等待秒数
+    - ping_on_borrow: 借出前执行 ping() 检查连接是否可用
+    - ping_interval: 距上次建立连接或 ping 成功超过该秒数才在借出时 ping，0 表示每次借出都检查
+    - driver: 提供 connect(**kwargs) 的数据库驱动，默认 cx_Oracle，可替换为计数用的假驱动
+    """
+
+    def __init__(self, user: str, password: str, dsn: str,
+                 min: int = 1, max: int = 8, increment: int = 1,
+                 timeout: float = 10.0, ping_on_borrow: bool = True,
+                 ping_interval: float = 0, driver=None, **connect_kwargs):
+        if max < 1 or min < 0 or min > max:
+            raise ValueError(f"连接池参数无效: min={min}, max={max}")
+        # 驱动延迟到第一次建立连接时才导入，离线替身环境无需安装 cx_Oracle
+        self.driver = driver
+        self.connect_kwargs = dict(connect_kwargs, user=user, password=password, dsn=dsn)
+        self.min = min
+        self.max = max
+        self.increment = increment if increment > 0 else 1
+        self.timeout = timeout
+        self.ping_on_borrow = ping_on_borrow
+        self.ping_interval = ping_interval
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()    # (连接, 最近一次确认可用的时间)
+        self._size = 0      # 已打开（含借出）的连接数
+        self._busy = 0      # 已借出的连接数
+        self._stats = {
+            'connects': 0,
+            'connect_errors': 0,
+            'borrows': 0,
+            'releases': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'health_checks': 0,
+            'health_failures': 0,
+            'reconnects': 0,
+        }
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """借出一个连接，使用完毕后调用 close() 归还"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        waited = False
+        while True:
+            raw, last_ok, grow, blocked = self._reserve(deadline)
+            waited = waited or blocked
+            if grow:
+                raw = self._grow(grow)
+                last_ok = time.monotonic()
+            elif self._needs_check(last_ok):
+                if not self._is_healthy(raw):
+                    continue
+                last_ok = time.monotonic()
+
+            with self._lock:
+                self._stats['borrows'] += 1
+                if waited:
+                    self._stats['waits'] += 1
+            return PooledConnection(self, raw, waited, last_ok)
+
+    def release(self, raw, discard: bool = False, checked_at: float = 0.0):
+        """归还连接；discard=True 时关闭连接并释放容量
+
+        checked_at 为该连接最近一次确认可用的时间（不是归还时间），传 0 表示下次借出前必须 ping
+        """
+        with self._lock:
+            self._busy -= 1
+            self._stats['releases'] += 1
+            if discard:
+                self._size -= 1
+                self._stats['reconnects'] += 1
+            else:
+                self._idle.append((raw, checked_at))
+            self._available.notify()
+        if discard:
+            self._close_quietly(raw)
+
+    def drain(self):
+        """关闭所有空闲连接，之后的 acquire() 会按需重新建立连接"""
+        with self._lock:
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        for raw in idle:
+            self._close_quietly(raw)
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池统计信息"""
+        with self._lock:
+            return dict(self._stats,
+                        min=self.min,
+                        max=self.max,
+                        increment=self.increment,
+                        opened=self._size,
+                        busy=self._busy,
+                        idle=len(self._idle))
+
+    def _reserve(self, deadline: float) -> Tuple[Any, float, int, bool]:
+        """在锁内取得一个空闲连接，或预留需要新建的连接数"""
+        blocked = False
+        with self._lock:
+            while True:
+                if self._idle:
+                    self._busy += 1
+                    # 后进先出：优先复用最近用过的连接，它们最可能仍然可用且无需再 ping
+                    raw, last_ok = self._idle.pop()
+                    return raw, last_ok, 0, blocked
+
+                if self._size < self.max:
+                    # 首次使用时直接补足到 min，之后按 increment 扩容
+                    target = max(self.min, self._size + self.increment)
+                    grow = min(target, self.max) - self._size
+                    self._size += grow
+                    self._busy += 1
+                    return None, 0.0, grow, blocked
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"获取数据库连接超时({self.timeout}s)，连接池已满: {self.max}")
+                blocked = True
+                self._available.wait(remaining)
+
+    def _grow(self, count: int):
+        """在锁外新建 count 个连接，返回其中一个，其余放入空闲队列"""
+        if self.driver is None:
+            import cx_Oracle
+            self.driver = cx_Oracle
+
+        created = []
+        try:
+            for _ in range(count):
+                created.append(self.driver.connect(**self.connect_kwargs))
+        except Exception:
+            with self._lock:
+                self._stats['connects'] += len(created)
+                self._stats['connect_errors'] += 1
+                self._size -= count - len(created)
+                if not created:
+                    self._busy -= 1
+                self._idle.extend((raw, time.monotonic()) for raw in created[1:])
+                self._available.notify_all()
+            if not created:
+                raise
+            return created[0]
+
+        with self._lock:
+            self._stats['connects'] += count
+            self._idle.extend((raw, time.monotonic()) for raw in created[1:])
+            if count > 1:
+                self._available.notify_all()
+        return created[0]
+
+    def _needs_check(self, last_ok: float) -> bool:
+        """按 ping_interval 限制健康检查频率，避免每次借出都多一次往返"""
+        if not self.ping_on_borrow:
+            return False
+        return self.ping_interval <= 0 or time.monotonic() - last_ok >= self.ping_interval
+
+    def _is_healthy(self, raw) -> bool:
+        """检查借出的连接是否可用，不可用则关闭并释放容量"""
+        try:
+            raw.ping()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._lock:
+            self._stats['health_checks'] += 1
+            if not healthy:
+                self._stats['health_failures'] += 1
+                self._stats['reconnects'] += 1
+                self._busy -= 1
+                self._size -= 1
+                self._available.notify()
+        if not healthy:
+            self._close_quietly(raw)
+        return healthy
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+_pools: Dict[Tuple[str, str], SessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_session_pool(user: str, password: str, dsn: str, **options) -> SessionPool:
+    """获取（必要时创建）按 用户+DSN 共享的会话池"""
+    key = (user.lower(), dsn)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            settings = {
+                'min': Config.DB_POOL_MIN,
+                'max': Config.DB_POOL_MAX,
+                'increment': Config.DB_POOL_INCREMENT,
+                'timeout': Config.DB_POOL_TIMEOUT,
+                'ping_on_borrow': Config.DB_POOL_PING_ON_BORROW,
+                'ping_interval': Config.DB_POOL_PING_INTERVAL,
+            }
+            settings.update(options)
+            pool = SessionPool(user, password, dsn, **settings)
+            _pools[key] = pool
+        return pool
+
+
+def all_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """所有共享会话池的统计信息"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {f"{user}@{dsn}": pool.stats() for (user, dsn), pool in pools.items()}
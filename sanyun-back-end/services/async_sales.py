@@ -0,0 +1,74 @@
+"""
+销售服务的可等待版本
+SalesService 的每个查询方法都有对应的协程，阻塞的数据库调用在有界线程池中执行，
+事件循环不被单个慢查询阻塞，同一接口内互不依赖的查询可以用 asyncio.gather 并发执行
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from services.dashboard import DashboardService
+from services.sales_service import SalesService
+
+
+class AsyncSalesService:
+    """SalesService 的异步包装，结果与同步方法完全相同（包括结果缓存和汇总表）"""
+
+    def __init__(self, sales_service, max_workers: int = None, dashboard_service: DashboardService = None):
+        self.sales_service = sales_service
+        # 线程数默认等于连接池上限，多出的线程只会在 acquire() 上等待
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or sales_service.pool.max,
+                                           thread_name_prefix='async-sales')
+        self.dashboard = dashboard_service or DashboardService(sales_service)
+
+    async def run(self, method, *args, **kwargs):
+        """在线程池中执行一个阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(method, *args, **kwargs))
+
+    async def query(self, method, *args):
+        """执行 SalesService 的缓存查询方法：结果缓存命中时直接在事件循环中返回，不排队等待线程池；
+        相同参数的并发调用共享一次执行，等待者不占用线程"""
+        key, hit, value = method.lookup(self.sales_service, *args)
+        if hit:
+            return value
+        flights = self.sales_service.flights
+        if key is None or flights is None:
+            return await self.run(method, self.sales_service, *args)
+        return await flights.do_async(key, lambda: self.run(method, self.sales_service, *args))
+
+    async def get_sales_overview(self, selected_date=None, analysis_type='month'):
+        return await self.query(SalesService.get_sales_overview, selected_date, analysis_type)
+
+    async def get_top_stores(self, limit=10, selected_date=None, analysis_type='month'):
+        return await self.query(SalesService.get_top_stores, limit, selected_date, analysis_type)
+
+    async def get_sales_metrics(self, selected_date=None, analysis_type='month', approx=False):
+        return await self.query(SalesService.get_sales_metrics, selected_date, analysis_type, approx)
+
+    async def get_sales_trend(self, selected_date=None, analysis_type='month'):
+        return await self.query(SalesService.get_sales_trend, selected_date, analysis_type)
+
+    async def get_sales_trend_series(self, start_date=None, end_date=None, granularity='day'):
+        return await self.query(SalesService.get_sales_trend_series, start_date, end_date, granularity)
+
+    async def get_member_analysis(self, selected_date=None, analysis_type='month', approx=False):
+        return await self.query(SalesService.get_member_analysis, selected_date, analysis_type, approx)
+
+    async def get_detailed_metrics(self, date=None, period='month', approx=False):
+        return await self.query(SalesService.get_detailed_metrics, date, period, approx)
+
+    async def get_dashboard(self, selected_date=None, analysis_type='month', limit=10, period=None,
+                            approx=False) -> Dict[str, Any]:
+        """与 DashboardService.get_dashboard 相同，各部件作为协程并发执行"""
+        summary, calls = self.dashboard.plan(selected_date, analysis_type, limit, period, approx)
+        await self.run(self.dashboard.refresh_stores)
+        names = list(calls)
+        results = await asyncio.gather(*(self.query(method.__func__, *args) for method, args in calls.values()),
+                                       return_exceptions=True)
+        return self.dashboard.collect(summary, dict(zip(names, results)))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
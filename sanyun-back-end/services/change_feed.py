@@ -0,0 +1,470 @@
+"""
+m_retail 变更捕获
+按 modifieddate、statustime 两条高水位轮询 m_retail，以 id + verno 去重后把新增、修改、作废的单据作为变更事件
+分发给注册的消费者（日汇总表、当月店铺排行），消费者按事件前后的单据内容增量更新，不再各自扫描 m_retail 重算整天。
+高水位、批次号和各单据最近一次分发的内容保存在本地 SQLite 检查点中，重启后从断点继续
+
+单独执行一次轮询:
+
+    python -m services.change_feed
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from config import Config
+from services.fetch import BULK, fetch_rows, tuned
+from services.periods import ymd
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS feed_images (
+    id              INTEGER PRIMARY KEY,
+    verno           INTEGER,
+    modifieddate    TEXT,
+    statustime      TEXT,
+    billdate        INTEGER,
+    c_store_id      INTEGER,
+    c_vip_id        INTEGER,
+    isactive        TEXT,
+    status          INTEGER,
+    tot_amt_actual  REAL,
+    tot_amt_list    REAL,
+    tot_qty         NUMERIC,
+    tot_lines       NUMERIC,
+    avg_discount    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_feed_images_billdate ON feed_images (billdate);
+CREATE TABLE IF NOT EXISTS feed_meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+# 事件类型
+INSERT = 'insert'
+UPDATE = 'update'
+VOID = 'void'
+
+# 单据内容中下游汇总用到的列
+IMAGE_COLUMNS = ('billdate', 'c_store_id', 'c_vip_id', 'isactive', 'status',
+                 'tot_amt_actual', 'tot_amt_list', 'tot_qty', 'tot_lines', 'avg_discount')
+
+_SELECT_COLUMNS = ('id', 'verno', 'creationdate', 'modifieddate', 'statustime') + IMAGE_COLUMNS
+
+# 两条高水位分别走各自的条件，UNION 合并同时满足两者的单据；作废、审核只更新 statustime 时也能捕获
+CHANGES_SQL = f"""
+    SELECT {', '.join(_SELECT_COLUMNS)}
+    FROM m_retail
+    WHERE modifieddate >= :modified_since
+    UNION
+    SELECT {', '.join(_SELECT_COLUMNS)}
+    FROM m_retail
+    WHERE statustime >= :status_since
+"""
+
+# 首次启动时载入保留天数内单据的内容，之后对这些单据的修改、作废都带有 before
+SEED_SQL = f"""
+    SELECT {', '.join(_SELECT_COLUMNS)}
+    FROM m_retail
+    WHERE billdate >= :start_date
+"""
+
+HIGH_WATER_SQL = "SELECT MAX(modifieddate), MAX(statustime) FROM m_retail"
+
+# CHANGES_SQL 的列类型（日期列保持驱动默认）
+_CHANGE_TYPES = (int, int, None, None, None, int, int, int, None, int, float, float, int, int, float)
+
+# 按 id 读取检查点中单据内容时每批的 id 数
+_LOOKUP_CHUNK = 500
+
+_SAVE_IMAGE_SQL = f"""
+    INSERT OR REPLACE INTO feed_images (id, verno, modifieddate, statustime, {', '.join(IMAGE_COLUMNS)})
+    VALUES ({', '.join('?' * (len(IMAGE_COLUMNS) + 4))})
+"""
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _text(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat(sep=' ') if value is not None else None
+
+
+class BillImage(NamedTuple):
+    """单据在某个版本时的内容"""
+    billdate: Optional[int]
+    c_store_id: Optional[int]
+    c_vip_id: Optional[int]
+    isactive: Optional[str]
+    status: Optional[int]
+    tot_amt_actual: Optional[float]
+    tot_amt_list: Optional[float]
+    tot_qty: Optional[int]
+    tot_lines: Optional[int]
+    avg_discount: Optional[float]
+
+    @property
+    def valid(self) -> bool:
+        """有效单据（isactive = 'Y' AND status = 1）"""
+        return self.isactive == 'Y' and self.status == 1
+
+
+class ChangeEvent(NamedTuple):
+    """一条单据的变更
+
+    - before: 上一次分发（或首次启动时载入）的内容；新增单据，或检查点中没有该单据（超过保留天数）时为 None。
+      before 为 None 的修改事件无法得知原来的单据日期，改了 billdate 时原日期不会被重算
+    - changed_at: modifieddate、statustime 中较晚者（数据库时间）
+    """
+    kind: str
+    id: int
+    verno: Optional[int]
+    changed_at: Optional[datetime]
+    before: Optional[BillImage]
+    after: BillImage
+
+    @property
+    def billdates(self) -> List[int]:
+        """受影响的单据日期（改了 billdate 时前后两天都受影响）"""
+        days = {self.after.billdate}
+        if self.before is not None:
+            days.add(self.before.billdate)
+        return [day for day in days if day is not None]
+
+
+class ChangeBatch(NamedTuple):
+    """一次轮询得到的变更
+
+    - number: 批次号，崩溃或有消费者失败后重新投递的批次沿用原来的批次号
+    - low_water: 之后的批次中事件 changed_at 的下界
+    """
+    number: int
+    events: List[ChangeEvent]
+    low_water: datetime
+
+
+class DispatchError(Exception):
+    """有消费者未能应用变更批次；检查点未推进，下一次轮询重新投递该批次"""
+
+
+def settled_mark(cursor) -> datetime:
+    """当前库中最晚的 modifieddate / statustime
+
+    在一次回源查询之后取得：该查询读到的单据 changed_at 都不晚于此时刻，之后的事件只有晚于它的才一定没被读到
+    """
+    cursor.execute(HIGH_WATER_SQL)
+    marks = [_to_datetime(value) for value in cursor.fetchone() if value is not None]
+    return max(marks) if marks else datetime(1970, 1, 1)
+
+
+class Settled:
+    """消费者回源加载（整体或按天）时刻的记录，用于判断事件是否可能已包含在加载结果中
+
+    changed_at 不晚于相关加载时刻的事件可能已经反映在数据里，不能再按前后差值累加，只能重新回源该日期
+    """
+
+    def __init__(self, mark: Optional[datetime] = None, days: Optional[Dict[int, datetime]] = None):
+        self.mark = mark
+        self.days = dict(days or {})
+
+    def reset(self, mark: datetime):
+        self.mark = mark
+        self.days.clear()
+
+    def mark_days(self, days: Iterable[int], mark: datetime):
+        for day in days:
+            self.days[day] = mark
+
+    def ambiguous(self, event: ChangeEvent) -> bool:
+        if event.changed_at is None:
+            return True
+        marks = [self.mark] + [self.days.get(day) for day in event.billdates]
+        return any(mark is not None and event.changed_at <= mark for mark in marks)
+
+    def prune(self, low_water: datetime):
+        """之后的事件都晚于 low_water，早于它的加载时刻不会再造成歧义"""
+        if self.mark is not None and self.mark < low_water:
+            self.mark = None
+        self.days = {day: mark for day, mark in self.days.items() if mark >= low_water}
+
+    def dumps(self) -> str:
+        return json.dumps({'mark': _text(self.mark),
+                           'days': {str(day): _text(mark) for day, mark in self.days.items()}})
+
+    @classmethod
+    def loads(cls, text: str) -> 'Settled':
+        data = json.loads(text)
+        return cls(_to_datetime(data['mark']),
+                   {int(day): _to_datetime(mark) for day, mark in data['days'].items()})
+
+
+class ChangeFeed:
+    """m_retail 变更捕获
+
+    - path: 检查点 SQLite 文件路径
+    - overlap: 高水位向前回看的秒数，覆盖提交晚于修改时间的单据；回看范围内重复读到的同一版本按 id + verno 去重
+    - retention_days: 检查点中保留最近多少天单据的内容（首次启动时载入），更早单据的修改事件 before 为 None
+    """
+
+    def __init__(self, path: str, overlap: float = 600, retention_days: int = 62):
+        self.path = path
+        self.overlap = overlap
+        self.retention_days = retention_days
+        self._consumers = []
+        self._local = threading.local()
+        self._poll_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'polls': 0, 'poll_errors': 0, 'rows': 0, 'duplicates': 0,
+                       INSERT: 0, UPDATE: 0, VOID: 0, 'consumer_errors': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA_SQL)
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程复用一个 SQLite 连接；with 语句块结束时提交事务"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _get_meta(self, conn, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM feed_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key: str, value):
+        conn.execute("INSERT OR REPLACE INTO feed_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def register(self, consumer):
+        """注册消费者：consumer.apply_changes(cursor, batch) 在每次轮询后按注册顺序调用（没有变更时 events 为空）
+
+        注册后消费者不再自行按 modifieddate 轮询（feed_driven = True）。任一消费者抛出异常时整批重新投递，
+        已应用过的消费者需按 batch.number 识别重复投递的批次
+        """
+        consumer.feed_driven = True
+        self._consumers.append(consumer)
+
+    # ---------- 轮询 ----------
+
+    def poll(self, connection) -> Dict:
+        """轮询一次：首次只记录当前高水位，之后读取高水位以来的变更，分发给消费者后保存检查点"""
+        with self._poll_lock:
+            try:
+                cursor = connection.cursor()
+                try:
+                    with self._connect() as conn:
+                        modified_water = _to_datetime(self._get_meta(conn, 'modified_water'))
+                        status_water = _to_datetime(self._get_meta(conn, 'status_water'))
+                        last_batch = int(self._get_meta(conn, 'batch') or 0)
+
+                    if modified_water is None:
+                        return self._initialize(cursor)
+                    return self._poll(cursor, modified_water, status_water, last_batch + 1)
+                finally:
+                    cursor.close()
+            except Exception:
+                self._count('poll_errors')
+                raise
+
+    def _initialize(self, cursor) -> Dict:
+        """记录当前高水位，并载入保留天数内单据的内容
+
+        下一次轮询回看范围内的单据不载入：它们会在该次轮询中作为 before 未知的事件分发，由消费者回源所在日期，
+        避免载入期间发生的修改被当作重复版本去掉
+        """
+        cursor.execute(HIGH_WATER_SQL)
+        modified_water, status_water = (_to_datetime(value) or datetime(1970, 1, 1) for value in cursor.fetchone())
+        low_water = min(modified_water, status_water) - timedelta(seconds=self.overlap)
+
+        seeded = 0
+        with tuned(cursor, BULK, _CHANGE_TYPES), self._connect() as conn:
+            conn.execute("DELETE FROM feed_images")
+            cursor.execute(SEED_SQL, {'start_date': ymd(date.today() - timedelta(days=self.retention_days))})
+            while True:
+                rows = cursor.fetchmany(BULK.arraysize)
+                if not rows:
+                    break
+                images = []
+                for row in rows:
+                    modified, status_time = _to_datetime(row[3]), _to_datetime(row[4])
+                    if (modified is None or modified < low_water) and (status_time is None or status_time < low_water):
+                        images.append((row[0], row[1], _text(modified), _text(status_time), *row[5:]))
+                conn.executemany(_SAVE_IMAGE_SQL, images)
+                seeded += len(images)
+
+        with self._connect() as conn:
+            self._set_meta(conn, 'modified_water', _text(modified_water))
+            self._set_meta(conn, 'status_water', _text(status_water))
+            self._set_meta(conn, 'batch', 0)
+            self._set_meta(conn, 'polled_at', time.time())
+        return {'mode': 'init', 'images': seeded,
+                'modified_water': _text(modified_water), 'status_water': _text(status_water)}
+
+    def _poll(self, cursor, modified_water: datetime, status_water: datetime, number: int) -> Dict:
+        modified_since = modified_water - timedelta(seconds=self.overlap)
+        status_since = status_water - timedelta(seconds=self.overlap)
+        rows = fetch_rows(cursor, CHANGES_SQL, {'modified_since': modified_since, 'status_since': status_since},
+                          _CHANGE_TYPES, BULK)
+
+        known = self._load_images({row[0] for row in rows})
+        events = []
+        images = []
+        for row in rows:
+            bill_id, verno, created, modified, status_time = row[:5]
+            created, modified, status_time = (_to_datetime(value) for value in (created, modified, status_time))
+            if modified is not None and modified > modified_water:
+                modified_water = modified
+            if status_time is not None and status_time > status_water:
+                status_water = status_time
+
+            after = BillImage(*row[5:])
+            previous = known.get(bill_id)
+            # id + verno 相同视为同一版本；作废、审核不一定递增 verno，修改时间或单据状态变化时仍作为新版本
+            if previous is not None and previous[0] == (verno, _text(modified), _text(status_time)) \
+                    and previous[1].isactive == after.isactive and previous[1].status == after.status:
+                self._count('duplicates')
+                continue
+
+            before = previous[1] if previous is not None else None
+            if before is None and created is not None and created >= min(modified_since, status_since):
+                kind = INSERT
+            elif not after.valid and (before is None or before.valid):
+                kind = VOID
+            else:
+                kind = UPDATE
+            changed_at = max((value for value in (modified, status_time) if value is not None), default=None)
+            events.append(ChangeEvent(kind, bill_id, verno, changed_at, before, after))
+            images.append((bill_id, verno, _text(modified), _text(status_time), *after))
+
+        # 下一次轮询的回看起点，之后的事件 changed_at 都不早于它
+        low_water = min(modified_water, status_water) - timedelta(seconds=self.overlap)
+        batch = ChangeBatch(number, events, low_water)
+        errors = []
+        for consumer in self._consumers:
+            try:
+                consumer.apply_changes(cursor, batch)
+            except Exception as e:
+                self._count('consumer_errors')
+                errors.append(f"{type(consumer).__name__}: {e}")
+        if errors:
+            # 不保存检查点：下一次轮询从同样的高水位读取，以同一批次号重新投递
+            raise DispatchError(f"变更批次 {number} 分发失败，将重新投递: {'; '.join(errors)}")
+
+        self._save(number, images, modified_water, status_water)
+        kinds = {kind: sum(1 for event in events if event.kind == kind) for kind in (INSERT, UPDATE, VOID)}
+        self._count('polls')
+        self._count('rows', len(rows))
+        for kind, count in kinds.items():
+            self._count(kind, count)
+        return dict(kinds, mode='poll', batch=number, rows=len(rows), events=len(events),
+                    modified_water=_text(modified_water), status_water=_text(status_water))
+
+    def _load_images(self, ids: Iterable[int]) -> Dict[int, tuple]:
+        """检查点中各单据最近一次分发的 ((verno, modifieddate, statustime), BillImage)"""
+        ids = sorted(ids)
+        result = {}
+        with self._connect() as conn:
+            for offset in range(0, len(ids), _LOOKUP_CHUNK):
+                chunk = ids[offset:offset + _LOOKUP_CHUNK]
+                cursor = conn.execute(f"""
+                    SELECT id, verno, modifieddate, statustime, {', '.join(IMAGE_COLUMNS)}
+                    FROM feed_images
+                    WHERE id IN ({', '.join('?' * len(chunk))})
+                """, chunk)
+                for row in cursor:
+                    result[row[0]] = (tuple(row[1:4]), BillImage(*row[4:]))
+        return result
+
+    def _save(self, number: int, images: List[tuple], modified_water: datetime, status_water: datetime):
+        """保存各单据的最新版本、内容和高水位，并删除超过保留天数的单据内容"""
+        with self._connect() as conn:
+            conn.executemany(_SAVE_IMAGE_SQL, images)
+            conn.execute("DELETE FROM feed_images WHERE billdate < ?",
+                         (ymd(date.today() - timedelta(days=self.retention_days)),))
+            self._set_meta(conn, 'modified_water', _text(modified_water))
+            self._set_meta(conn, 'status_water', _text(status_water))
+            self._set_meta(conn, 'batch', number)
+            self._set_meta(conn, 'polled_at', time.time())
+
+    def status(self) -> Dict:
+        """高水位、批次号、检查点中的单据数、上次轮询时间"""
+        with self._connect() as conn:
+            polled_at = self._get_meta(conn, 'polled_at')
+            result = {
+                'path': self.path,
+                'modified_water': self._get_meta(conn, 'modified_water'),
+                'status_water': self._get_meta(conn, 'status_water'),
+                'batch': int(self._get_meta(conn, 'batch') or 0),
+                'images': conn.execute("SELECT COUNT(*) FROM feed_images").fetchone()[0],
+                'polled_at': float(polled_at) if polled_at else None,
+            }
+        result['lag_seconds'] = round(time.time() - result['polled_at'], 1) if result['polled_at'] else None
+        result['consumers'] = [type(consumer).__name__ for consumer in self._consumers]
+        with self._stats_lock:
+            result.update(self._stats)
+        return result
+
+
+class ChangeFeedPoller:
+    """后台线程，按固定间隔轮询变更"""
+
+    def __init__(self, feed: ChangeFeed, pool, interval: float = 30):
+        self.feed = feed
+        self.pool = pool
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.pool.acquire() as connection:
+                    result = self.feed.poll(connection)
+                if result['mode'] == 'init' or result['events']:
+                    print(f"变更捕获: {result}")
+            except Exception as e:
+                print(f"变更捕获失败: {e}")
+            self._stop.wait(self.interval)
+
+
+def create_change_feed() -> Optional[ChangeFeed]:
+    """按配置创建变更捕获，CHANGE_FEED_ENABLED=false 时返回 None"""
+    if not Config.CHANGE_FEED_ENABLED:
+        return None
+    return ChangeFeed(Config.CHANGE_FEED_PATH, Config.CHANGE_FEED_OVERLAP, Config.CHANGE_FEED_RETENTION_DAYS)
+
+
+if __name__ == '__main__':
+    from db_pool import get_session_pool
+
+    pool = get_session_pool(Config.DB_USERNAME, Config.DB_PASSWORD, Config.DB_DSN)
+    connection = pool.acquire()
+    try:
+        print(ChangeFeed(Config.CHANGE_FEED_PATH, Config.CHANGE_FEED_OVERLAP, Config.CHANGE_FEED_RETENTION_DAYS)
+              .poll(connection))
+    finally:
+        connection.close()
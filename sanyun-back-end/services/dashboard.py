@@ -0,0 +1,90 @@
+"""
+仪表盘批量查询
+一次请求返回概览、店铺排行、销售指标、趋势、会员分析和详细指标，
+各部件在有界线程池中并发执行，共用一次日期规范化和店铺维度刷新
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+from services.result_cache import normalize_date
+
+
+class DashboardService:
+    """仪表盘批量查询服务"""
+
+    WIDGETS = ('overview', 'top_stores', 'metrics', 'trend', 'member_analysis', 'detailed_metrics')
+
+    def __init__(self, sales_service, max_workers: int = 4):
+        self.sales_service = sales_service
+        # 所有仪表盘请求共用同一个线程池，限制同时占用的数据库连接数
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dashboard')
+
+    def get_dashboard(self, selected_date=None, analysis_type='month', limit=10, period=None,
+                      approx=False) -> Dict[str, Any]:
+        """并发获取全部仪表盘数据，单个部件失败不影响其他部件
+
+        period: 详细指标的统计周期，未传时按分析类型取 today 或 month
+        approx: 销售指标、会员分析、详细指标中的去重客户数使用 HLL 估算
+        """
+        summary, calls = self.plan(selected_date, analysis_type, limit, period, approx)
+        self.refresh_stores()
+        futures = {name: self.executor.submit(method, *args) for name, (method, args) in calls.items()}
+
+        outcomes = {}
+        for name, future in futures.items():
+            try:
+                outcomes[name] = future.result()
+            except Exception as e:
+                outcomes[name] = e
+        return self.collect(summary, outcomes)
+
+    def plan(self, selected_date=None, analysis_type='month', limit=10, period=None,
+             approx=False) -> Tuple[Dict[str, Any], Dict[str, Tuple[Callable, tuple]]]:
+        """规范化参数，返回 (仪表盘概要, {部件: (SalesService 方法, 参数)})"""
+        selected_date = normalize_date(selected_date)
+        analysis_type = (analysis_type or 'month').strip().lower()
+        period = period or ('today' if analysis_type == 'day' else 'month')
+        service = self.sales_service
+
+        calls = {
+            'overview': (service.get_sales_overview, (selected_date, analysis_type)),
+            'top_stores': (service.get_top_stores, (limit, selected_date, analysis_type)),
+            'metrics': (service.get_sales_metrics, (selected_date, analysis_type, approx)),
+            'trend': (service.get_sales_trend, (selected_date, analysis_type)),
+            'member_analysis': (service.get_member_analysis, (selected_date, analysis_type, approx)),
+            'detailed_metrics': (service.get_detailed_metrics, (selected_date, period, approx)),
+        }
+        summary = {'date': selected_date, 'type': analysis_type, 'period': period}
+        return summary, calls
+
+    def refresh_stores(self):
+        """在当前线程刷新一次店铺维度，避免各部件并发重复加载"""
+        connection = self.sales_service.get_connection()
+        cursor = connection.cursor()
+        try:
+            self.sales_service.stores.snapshot(cursor)
+        except Exception:
+            connection.mark_failed()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def collect(self, summary: Dict[str, Any], outcomes: Dict[str, Any]) -> Dict[str, Any]:
+        """按部件顺序组装结果，outcomes 中为异常的部件记入 errors"""
+        data = {}
+        errors = {}
+        for name in self.WIDGETS:
+            outcome = outcomes[name]
+            if isinstance(outcome, Exception):
+                print(f"获取仪表盘部件 {name} 失败: {outcome}")
+                data[name] = None
+                errors[name] = str(outcome)
+            else:
+                data[name] = outcome
+
+        return dict(summary, widgets=data, errors=errors)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
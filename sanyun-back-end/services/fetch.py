@@ -0,0 +1,121 @@
+"""
+批量取数
+按查询形状设置游标的 arraysize / prefetchrows，并安装输出类型处理器，让 NUMBER 列直接以 float / int 取回；
+大结果集按列装入 array.array（可零拷贝转为 NumPy 数组），不再逐行 float(...) 转换、逐行拼装 Python 对象
+"""
+
+import math
+import sys
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# int 列的空值取该值（各 ID、日期均为正数），float 列的空值取 nan
+NULL_INT = -1
+
+
+class Shape(NamedTuple):
+    """查询形状：arraysize 为每次往返取回的行数，prefetchrows 为 execute 时随同返回的行数"""
+    arraysize: int
+    prefetchrows: int
+
+
+# 店铺、日期级结果（几百到几千行）
+SMALL = Shape(1000, 1000)
+# 汇总表回源等十万行级结果
+BULK = Shape(5000, 5000)
+
+_TYPECODES = {float: 'd', int: 'q'}
+_NULLS = {float: math.nan, int: NULL_INT}
+
+
+def _driver_type(name: str):
+    """cx_Oracle 已加载时返回其数据库类型常量（如 DB_TYPE_BINARY_DOUBLE），否则返回 None"""
+    driver = sys.modules.get('cx_Oracle')
+    return getattr(driver, name, None) if driver is not None else None
+
+
+def number_handler(types: Sequence[Optional[type]]):
+    """输出类型处理器：第 i 列为 NUMBER 时按 types[i] 取回
+
+    float 列以 BINARY_DOUBLE 在服务端转换为双精度，int 列转换为 Python int，None 保持驱动默认。
+    处理器在每次定义结果列时按列顺序调用，以调用次数对列数取模得到列号
+    """
+    calls = [0]
+    binary_double = _driver_type('DB_TYPE_BINARY_DOUBLE')
+
+    def handler(cursor, name, default_type, size, precision, scale):
+        index = calls[0] % len(types)
+        calls[0] += 1
+        target = types[index]
+        if target is None or 'NUMBER' not in str(default_type):
+            return None
+        if target is float and binary_double is not None:
+            return cursor.var(binary_double, arraysize=cursor.arraysize)
+        return cursor.var(target, arraysize=cursor.arraysize)
+
+    return handler
+
+
+@contextmanager
+def tuned(cursor, shape: Shape, types: Optional[Sequence[Optional[type]]] = None):
+    """在 with 块内按 shape 设置游标（必须在 execute 之前），退出时恢复原设置，游标可继续用于其他查询"""
+    saved = {name: getattr(cursor, name) for name in ('arraysize', 'prefetchrows', 'outputtypehandler')
+             if hasattr(cursor, name)}
+    cursor.arraysize = shape.arraysize
+    if 'prefetchrows' in saved:
+        cursor.prefetchrows = shape.prefetchrows
+    if types is not None and 'outputtypehandler' in saved:
+        cursor.outputtypehandler = number_handler(types)
+    try:
+        yield cursor
+    finally:
+        for name, value in saved.items():
+            setattr(cursor, name, value)
+
+
+def _extend(column, values, kind):
+    length = len(column)
+    try:
+        column.extend(values)
+    except TypeError:
+        # 含空值（或驱动未按类型转换）时去掉已追加的部分，逐个转换
+        del column[length:]
+        null = _NULLS[kind]
+        column.extend(null if value is None else kind(value) for value in values)
+
+
+def fetch_columns(cursor, sql: str, binds: Optional[Dict[str, Any]], types: Sequence[Optional[type]],
+                  shape: Shape = BULK) -> List:
+    """执行查询，按列返回结果：types[i] 为 float / int 时第 i 列为 array('d') / array('q')，为 None 时为 list
+
+    每次 fetchmany 一批行后按列转置追加，空值见 NULL_INT / nan
+    """
+    with tuned(cursor, shape, types):
+        cursor.execute(sql, binds or {})
+        columns = [array(_TYPECODES[kind]) if kind is not None else [] for kind in types]
+        while True:
+            rows = cursor.fetchmany(shape.arraysize)
+            if not rows:
+                break
+            for column, values, kind in zip(columns, zip(*rows), types):
+                if kind is None:
+                    column.extend(values)
+                else:
+                    _extend(column, values, kind)
+    return columns
+
+
+def fetch_rows(cursor, sql: str, binds: Optional[Dict[str, Any]], types: Sequence[Optional[type]],
+               shape: Shape = SMALL) -> List[tuple]:
+    """执行查询并 fetchall，NUMBER 列按 types 直接取回为 float / int（不做空值替换）"""
+    with tuned(cursor, shape, types):
+        cursor.execute(sql, binds or {})
+        return cursor.fetchall()
+
+
+def as_numpy(column) -> np.ndarray:
+    """array('d') / array('q') 零拷贝转为 float64 / int64 数组"""
+    return np.frombuffer(column, dtype=np.float64 if column.typecode == 'd' else np.int64)
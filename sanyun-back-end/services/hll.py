@@ -0,0 +1,115 @@
+"""
+HyperLogLog 去重计数
+日汇总表中每行保存一份会员 ID 的稀疏 HLL 草图，任意日期区间的草图按寄存器取最大值合并后估算去重会员数，
+代替对原始会员 ID 的 COUNT(DISTINCT)。精度 PRECISION=12 时相对标准误差约 1.6%
+"""
+
+import math
+from typing import Iterable
+
+import numpy as np
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+# 相对标准误差（1σ），约 95% 的估计值落在 ±2 倍范围内
+RELATIVE_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+_MAX_RANK = 64 - PRECISION + 1
+
+
+def hash64(values) -> np.ndarray:
+    """splitmix64 混洗，把整数 ID 映射为均匀分布的 64 位哈希"""
+    x = np.asarray(values, dtype=np.int64).astype(np.uint64)
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def registers_from_ids(ids: Iterable[int]) -> np.ndarray:
+    """由会员 ID 计算稠密寄存器数组"""
+    registers = np.zeros(REGISTERS, dtype=np.uint8)
+    ids = np.fromiter(ids, dtype=np.int64)
+    if ids.size == 0:
+        return registers
+
+    hashed = hash64(ids)
+    index = (hashed & np.uint64(REGISTERS - 1)).astype(np.intp)
+    rest = hashed >> np.uint64(PRECISION)
+    # rank = 剩余位中最低位 1 的位置（从 1 开始），全 0 时取最大值
+    lowest_bit = rest & (~rest + np.uint64(1))
+    rank = np.full(ids.size, _MAX_RANK, dtype=np.uint8)
+    nonzero = rest != 0
+    rank[nonzero] = np.log2(lowest_bit[nonzero].astype(np.float64)).astype(np.uint8) + 1
+    np.maximum.at(registers, index, rank)
+    return registers
+
+
+def encode(registers: np.ndarray) -> bytes:
+    """稀疏编码：只保存非零寄存器，每个寄存器 4 字节（下标 << 8 | rank）"""
+    index = np.flatnonzero(registers).astype(np.uint32)
+    return ((index << np.uint32(8)) | registers[index].astype(np.uint32)).tobytes()
+
+
+def sketch(ids: Iterable[int]) -> bytes:
+    """会员 ID 集合的稀疏草图"""
+    return encode(registers_from_ids(ids))
+
+
+def merge(blobs: Iterable[bytes]) -> np.ndarray:
+    """合并多个稀疏草图为稠密寄存器数组"""
+    registers = np.zeros(REGISTERS, dtype=np.uint8)
+    data = b''.join(blob for blob in blobs if blob)
+    if data:
+        packed = np.frombuffer(data, dtype=np.uint32)
+        index = (packed >> np.uint32(8)).astype(np.intp)
+        np.maximum.at(registers, index, (packed & np.uint32(0xFF)).astype(np.uint8))
+    return registers
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+def estimate(registers: np.ndarray) -> float:
+    """由寄存器估算去重数
+
+    使用 Ertl 改进估计量，在小基数与大基数之间没有原始 HLL 在约 2.5 倍寄存器数附近的偏差，
+    也不需要 HLL++ 的经验偏差修正表
+    """
+    histogram = np.bincount(registers, minlength=_MAX_RANK + 1)
+    if histogram[0] == REGISTERS:
+        return 0.0
+
+    z = REGISTERS * _tau(1 - histogram[_MAX_RANK] / REGISTERS)
+    for rank in range(_MAX_RANK - 1, 0, -1):
+        z = 0.5 * (z + histogram[rank])
+    z += REGISTERS * _sigma(histogram[0] / REGISTERS)
+    return REGISTERS * REGISTERS / (2 * math.log(2)) / z
+
+
+def count(blobs: Iterable[bytes]) -> int:
+    """合并草图并返回四舍五入后的去重数估计"""
+    return int(round(estimate(merge(blobs))))
@@ -0,0 +1,103 @@
+"""
+向量化指标计算
+把各周期聚合值装入 (周期 × 字段) 的 NumPy 矩阵，一次性计算客单价、连带率、占比等派生指标及各周期间的变化率，
+周期数不限：既用于 当期/上期/去年同期 三周期的核心指标，也可用于 12 个月等趋势序列
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from services.period_metrics import PERIOD_MEASURES
+
+# 聚合矩阵的列顺序，与 PERIOD_MEASURES 一致
+MEASURES = tuple(measure for measure, _ in PERIOD_MEASURES)
+_COLUMN = {measure: index for index, measure in enumerate(MEASURES)}
+
+# 派生指标矩阵的列：(名称, 单位, 是否为整数)
+METRICS = (
+    ('销售额', '元', False),
+    ('折扣率', '%', False),
+    ('客单价', '元', False),
+    ('销售附加', '%', False),
+    ('活跃店铺', '家', True),
+    ('新客占比', '%', False),
+    ('会员回店', '%', False),
+    ('连带率', '', False),
+)
+_SALES_ATTACHMENT = 3
+
+
+def load_aggregates(aggregates: Sequence[Dict]) -> np.ndarray:
+    """[{字段: 值}, ...] -> (周期 × 字段) 矩阵，空值按 0 处理"""
+    return np.array([[float(row[measure] or 0) for measure in MEASURES] for row in aggregates],
+                    dtype=np.float64).reshape(len(aggregates), len(MEASURES))
+
+
+def safe_divide(numerator, denominator) -> np.ndarray:
+    """逐元素相除，分母不大于 0 时结果为 0"""
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype=np.float64),
+                                                 np.asarray(denominator, dtype=np.float64))
+    return np.divide(numerator, denominator, out=np.zeros(numerator.shape), where=denominator > 0)
+
+
+def percent_change(current, previous) -> np.ndarray:
+    """变化百分比 (current - previous) / previous * 100，previous 不大于 0 时为 0"""
+    current, previous = np.broadcast_arrays(np.asarray(current, dtype=np.float64),
+                                            np.asarray(previous, dtype=np.float64))
+    return safe_divide(current - previous, previous) * 100
+
+
+def derive(matrix: np.ndarray, new_customers=0, repeat_customers=0):
+    """由聚合矩阵计算派生指标，返回 (values, baselines)，均为 (周期 × METRICS) 矩阵
+
+    values 为各周期自身的指标值；baselines 为该周期作为对比基准时使用的值。
+    两者只有“销售附加”不同：当期按 (吊牌额 - 实收) / 吊牌额 计算，对比基准沿用原有的
+    (连带率 - 客单价) / 客单价 口径。新客、回店会员数为当期值，按原口径对所有周期使用同一个数
+    """
+    sales = matrix[:, _COLUMN['total_sales']]
+    list_price = matrix[:, _COLUMN['total_list_price']]
+    orders = matrix[:, _COLUMN['total_orders']]
+    lines = matrix[:, _COLUMN['total_lines']]
+    customers = matrix[:, _COLUMN['unique_customers']]
+
+    avg_order_value = safe_divide(sales, orders)
+    attachment_rate = safe_divide(lines, orders)
+
+    values = np.column_stack([
+        sales,
+        matrix[:, _COLUMN['avg_discount_rate']],
+        avg_order_value,
+        safe_divide(list_price - sales, list_price) * 100,
+        matrix[:, _COLUMN['active_stores']],
+        safe_divide(new_customers, customers) * 100,
+        safe_divide(repeat_customers, customers) * 100,
+        attachment_rate,
+    ])
+    baselines = values.copy()
+    baselines[:, _SALES_ATTACHMENT] = safe_divide((attachment_rate - avg_order_value) * 100, avg_order_value)
+    return values, baselines
+
+
+def compare_periods(aggregates: Sequence[Dict], new_customers=0, repeat_customers=0,
+                    change_keys: Sequence[str] = ('mom_change', 'yoy_change')) -> List[Dict]:
+    """第一个周期为当期，其余周期依次为 change_keys 对应的对比周期，返回核心指标列表"""
+    values, baselines = derive(load_aggregates(aggregates), new_customers, repeat_customers)
+    changes = percent_change(values[0], baselines[1:])
+
+    metrics = []
+    for index, (name, unit, integer) in enumerate(METRICS):
+        value = values[0, index]
+        metric = {'name': name, 'value': int(value) if integer else float(value), 'unit': unit}
+        for row, key in enumerate(change_keys):
+            metric[key] = float(changes[row, index])
+        metrics.append(metric)
+    return metrics
+
+
+def period_over_period(values: np.ndarray) -> np.ndarray:
+    """按时间顺序排列的 N 个周期，逐期计算相对上一期的变化百分比，第一期为 0"""
+    values = np.asarray(values, dtype=np.float64)
+    changes = np.zeros(values.shape)
+    changes[1:] = percent_change(values[1:], values[:-1])
+    return changes
@@ -0,0 +1,100 @@
+"""
+单次扫描的多周期聚合
+把当期、上期、去年同期等多个日期区间合并为一次 m_retail 扫描，按 CASE WHEN billdate BETWEEN ... 分桶聚合
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+# (字段名, 聚合表达式)；{cond} 替换为该周期的 billdate 区间条件
+PERIOD_MEASURES = (
+    ('total_sales', "NVL(SUM(CASE WHEN {cond} THEN tot_amt_actual END), 0)"),
+    ('total_list_price', "NVL(SUM(CASE WHEN {cond} THEN tot_amt_list END), 0)"),
+    ('avg_discount_rate', "NVL(AVG(CASE WHEN {cond} AND avg_discount > 0 THEN avg_discount END), 0)"),
+    ('total_orders', "COUNT(CASE WHEN {cond} THEN 1 END)"),
+    ('total_quantity', "NVL(SUM(CASE WHEN {cond} THEN tot_qty END), 0)"),
+    ('total_lines', "NVL(SUM(CASE WHEN {cond} THEN tot_lines END), 0)"),
+    ('active_stores', "COUNT(DISTINCT CASE WHEN {cond} THEN c_store_id END)"),
+    ('unique_customers', "COUNT(DISTINCT CASE WHEN {cond} THEN c_vip_id END)"),
+    ('member_orders', "COUNT(DISTINCT CASE WHEN {cond} AND c_vip_id IS NOT NULL THEN id END)"),
+)
+
+# 当期新客（当期开卡且当期有消费）与回店会员（当期消费超过一次），一次扫描当期会员消费
+CUSTOMER_RETENTION_SQL = """
+    SELECT
+        COUNT(CASE WHEN v.enterdate >= :current_start AND v.enterdate <= :current_end THEN 1 END) as new_customers,
+        COUNT(CASE WHEN r.visit_count > 1 THEN 1 END) as repeat_customers
+    FROM (
+        SELECT c_vip_id, COUNT(*) as visit_count
+        FROM m_retail
+        WHERE billdate >= :current_start AND billdate <= :current_end
+        AND c_vip_id IS NOT NULL
+        GROUP BY c_vip_id
+    ) r
+    LEFT JOIN c_vips v ON v.id = r.c_vip_id
+"""
+
+
+def _select_measures(names: Optional[Sequence[str]]):
+    if names is None:
+        return PERIOD_MEASURES
+    return tuple(measure for measure in PERIOD_MEASURES if measure[0] in names)
+
+
+def build_period_aggregate_query(periods: Dict[str, Tuple[int, int]],
+                                 store_filter: Tuple[str, Dict[str, int]],
+                                 measures: Sequence[str] = None) -> Tuple[str, Dict[str, int]]:
+    """生成多周期条件聚合SQL
+
+    periods: {周期名: (开始日期, 结束日期)}，日期为 YYYYMMDD 整数
+    store_filter: 排除仓库店铺的 (条件, 绑定变量)，见 StoreDimension.warehouse_filter
+    measures: 只计算 PERIOD_MEASURES 中的这些字段，None 表示全部
+    返回 (sql, 绑定变量)，结果列按 周期 × 字段 顺序排列
+    """
+    filter_sql, filter_binds = store_filter
+    columns = []
+    ranges = []
+    binds = dict(filter_binds)
+
+    for name, (start, end) in periods.items():
+        start_bind, end_bind = f"{name}_start", f"{name}_end"
+        binds[start_bind] = start
+        binds[end_bind] = end
+
+        cond = f"billdate BETWEEN :{start_bind} AND :{end_bind}"
+        ranges.append(cond)
+        for measure, expression in _select_measures(measures):
+            columns.append(f"{expression.format(cond=cond)} as {name}_{measure}")
+
+    select_list = ',\n            '.join(columns)
+    sql = f"""
+        SELECT
+            {select_list}
+        FROM m_retail
+        WHERE ({' OR '.join(ranges)})
+        AND {filter_sql}
+    """
+    return sql, binds
+
+
+def fetch_period_aggregates(cursor, periods: Dict[str, Tuple[int, int]],
+                            store_filter: Tuple[str, Dict[str, int]],
+                            measures: Sequence[str] = None) -> Dict[str, Dict]:
+    """一次扫描获取所有周期的聚合值，返回 {周期名: {字段名: 值}}"""
+    sql, binds = build_period_aggregate_query(periods, store_filter, measures)
+    cursor.execute(sql, binds)
+    row = cursor.fetchone()
+
+    selected = _select_measures(measures)
+    width = len(selected)
+    result = {}
+    for index, name in enumerate(periods):
+        values = row[index * width:(index + 1) * width]
+        result[name] = {measure: value for (measure, _), value in zip(selected, values)}
+    return result
+
+
+def fetch_customer_retention(cursor, current_start: int, current_end: int) -> Tuple[int, int]:
+    """获取当期新客数和回店会员数"""
+    cursor.execute(CUSTOMER_RETENTION_SQL, {'current_start': current_start, 'current_end': current_end})
+    row = cursor.fetchone()
+    return (row[0] or 0), (row[1] or 0)
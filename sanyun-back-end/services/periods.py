@@ -0,0 +1,155 @@
+"""
+统计周期日历
+按 (粒度, 日期) 缓存 PeriodSpec：当期、上期、去年同期的起止日期（YYYYMMDD 整数），
+各查询不再各自用 monthrange、字符串拼接推算区间；多个 PeriodSpec 的区间可以合并进一次条件聚合扫描
+"""
+
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+
+# 每种粒度一个周期包含的月数（日、周按天计算）
+_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+
+
+def ymd(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def from_ymd(value: int) -> date:
+    return date(value // 10000, value // 100 % 100, value % 100)
+
+
+def parse_date(value: Optional[str]) -> date:
+    """YYYY-MM-DD 字符串转日期，未传时取今天"""
+    if not value:
+        return date.today()
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _add_months(day: date, months: int) -> date:
+    """加减月数，目标月没有该日时取月末（如 2月29日 减一年为 2月28日）"""
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return date(year, month, min(day.day, _month_days(year, month)))
+
+
+def _month_days(year: int, month: int) -> int:
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return (following - timedelta(days=1)).day
+
+
+class DateRange(NamedTuple):
+    """闭区间 [start, end]，YYYYMMDD 整数；可直接解包为 (start, end)"""
+    start: int
+    end: int
+
+    @property
+    def first_day(self) -> date:
+        return from_ymd(self.start)
+
+    @property
+    def last_day(self) -> date:
+        return from_ymd(self.end)
+
+    @property
+    def days(self) -> int:
+        return (self.last_day - self.first_day).days + 1
+
+    def until(self, last_day: date) -> 'DateRange':
+        """截止到 last_day（不超过原区间结束日）"""
+        return DateRange(self.start, min(self.end, ymd(last_day)))
+
+
+class PeriodSpec(NamedTuple):
+    """anchor 所在周期（周从周一开始）及上期、去年同期
+
+    day: 当日 / 前一日 / 去年同日
+    week: 当周 / 上周 / 52 周前的同一周（星期对齐）
+    month、quarter、year: 当月（季、年）/ 上一个月（季、年）/ 去年同月（季、年）
+    """
+    granularity: str
+    anchor: date
+    current: DateRange
+    previous: DateRange
+    last_year: DateRange
+
+    @property
+    def span(self) -> DateRange:
+        """覆盖当期、上期、去年同期的最小区间"""
+        return DateRange(min(self.current.start, self.previous.start, self.last_year.start),
+                         max(self.current.end, self.previous.end, self.last_year.end))
+
+    def ranges(self) -> Dict[str, DateRange]:
+        """{'current', 'prev', 'lastyear'} 区间，可直接传给 fetch_period_aggregates"""
+        return {'current': self.current, 'prev': self.previous, 'lastyear': self.last_year}
+
+
+def _period_start(granularity: str, day: date) -> date:
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    months = _MONTHS[granularity]
+    return date(day.year, (day.month - 1) // months * months + 1, 1)
+
+
+def _period_range(granularity: str, start: date) -> DateRange:
+    if granularity == 'day':
+        end = start
+    elif granularity == 'week':
+        end = start + timedelta(days=6)
+    else:
+        end = _add_months(start, _MONTHS[granularity]) - timedelta(days=1)
+    return DateRange(ymd(start), ymd(end))
+
+
+def _shift(granularity: str, start: date, periods: int) -> date:
+    """start 前后移动若干个周期后的周期开始日"""
+    if granularity == 'day':
+        return start + timedelta(days=periods)
+    if granularity == 'week':
+        return start + timedelta(weeks=periods)
+    return _add_months(start, _MONTHS[granularity] * periods)
+
+
+@lru_cache(maxsize=4096)
+def period_spec(granularity: str, anchor: date) -> PeriodSpec:
+    """anchor 所在的完整周期"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"不支持的统计周期: {granularity}，可选值: {', '.join(GRANULARITIES)}")
+    start = _period_start(granularity, anchor)
+    if granularity == 'week':
+        last_year_start = start - timedelta(weeks=52)
+    elif granularity == 'day':
+        last_year_start = _add_months(anchor, -12)
+    else:
+        last_year_start = _add_months(start, -12)
+    return PeriodSpec(
+        granularity,
+        anchor,
+        _period_range(granularity, start),
+        _period_range(granularity, _shift(granularity, start, -1)),
+        _period_range(granularity, last_year_start),
+    )
+
+
+@lru_cache(maxsize=4096)
+def to_date_spec(granularity: str, anchor: date) -> PeriodSpec:
+    """截至 anchor 的周期（本周至今、本月至今等），上期和去年同期取相同的天数，不超过其周期末"""
+    spec = period_spec(granularity, anchor)
+    elapsed = (anchor - spec.current.first_day).days
+    previous, last_year = spec.previous, spec.last_year
+    return spec._replace(
+        current=spec.current.until(anchor),
+        previous=previous.until(previous.first_day + timedelta(days=elapsed)),
+        last_year=last_year.until(last_year.first_day + timedelta(days=elapsed)),
+    )
+
+
+def merge_ranges(specs: Dict[str, PeriodSpec], names=('current', 'prev', 'lastyear')) -> Dict[str, DateRange]:
+    """把多个 PeriodSpec 的区间合并为一个 {前缀_周期: 区间}，用于一次扫描聚合全部周期"""
+    return {f"{prefix}_{name}": spec.ranges()[name] for prefix, spec in specs.items() for name in names}
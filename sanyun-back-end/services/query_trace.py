@@ -0,0 +1,348 @@
+"""
+查询追踪
+包装 SalesService 借出的连接和游标，按接口记录每条 SQL 的指纹、绑定变量、返回行数、执行/取数耗时和往返次数：
+每个接口、每种 SQL 保留最近若干次耗时用于计算 p50/p95/p99，超过阈值或执行出错的查询追加写入慢查询日志，
+全部统计可以按 Prometheus 文本格式输出
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# 超过该数量的新 SQL 指纹计入 'other'，避免拼接了字面量的 SQL 撑大统计
+MAX_FINGERPRINTS = 500
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w:])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:\?|:\w+)(?:\s*,\s*(?:\?|:\w+))*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """去掉字面量和空白差异后的 SQL：字符串、数字替换为 ?，IN 列表合并为 (?)"""
+    text = _STRING.sub('?', sql)
+    text = _NUMBER.sub('?', text)
+    text = _SPACES.sub(' ', text).strip()
+    return _IN_LIST.sub('(?)', text)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """最近邻取整的百分位数，values 已排序"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def _label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Series:
+    """一组查询（同一接口或同一 SQL 指纹）的累计值和最近耗时窗口"""
+
+    __slots__ = ('count', 'errors', 'slow', 'seconds', 'fetch_seconds', 'rows', 'roundtrips', 'recent')
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.seconds = 0.0
+        self.fetch_seconds = 0.0
+        self.rows = 0
+        self.roundtrips = 0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds: float, fetch_seconds: float, rows: int, roundtrips: int, error: bool, slow: bool):
+        self.count += 1
+        self.errors += error
+        self.slow += slow
+        self.seconds += seconds
+        self.fetch_seconds += fetch_seconds
+        self.rows += rows
+        self.roundtrips += roundtrips
+        self.recent.append(seconds)
+
+    def quantiles(self) -> Dict[float, float]:
+        values = sorted(self.recent)
+        return {q: _percentile(values, q) for q in QUANTILES}
+
+
+class TracedCursor:
+    """游标代理：execute 开始一条查询记录，下一次 execute 或 close 时结束并提交给 QueryTracer"""
+
+    def __init__(self, tracer: 'QueryTracer', raw):
+        self._tracer = tracer
+        self._raw = raw
+        self._query = None
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        # arraysize、prefetchrows、outputtypehandler 等设置作用于原游标
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._raw, name, value)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def execute(self, sql, parameters=None, **kwargs):
+        self._finish()
+        query = {'sql': sql, 'binds': parameters if parameters is not None else kwargs or None,
+                 'rows': 0, 'fetches': 0, 'fetch_seconds': 0.0,
+                 'arraysize': getattr(self._raw, 'arraysize', 100) or 100}
+        started = time.perf_counter()
+        try:
+            if parameters is None:
+                result = self._raw.execute(sql, **kwargs)
+            else:
+                result = self._raw.execute(sql, parameters, **kwargs)
+        except Exception as e:
+            query['execute_seconds'] = time.perf_counter() - started
+            self._tracer.record(query, error=e)
+            raise
+        query['execute_seconds'] = time.perf_counter() - started
+        self._query = query
+        return self if result is self._raw else result
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = getattr(self._raw, method)(*args)
+        query = self._query
+        if query is not None:
+            query['fetch_seconds'] += time.perf_counter() - started
+            query['fetches'] += 1
+            if method == 'fetchone':
+                query['rows'] += result is not None
+            else:
+                query['rows'] += len(result)
+        return result
+
+    def fetchone(self):
+        return self._fetch('fetchone')
+
+    def fetchmany(self, *args):
+        return self._fetch('fetchmany', *args)
+
+    def fetchall(self):
+        return self._fetch('fetchall')
+
+    def _finish(self):
+        query, self._query = self._query, None
+        if query is not None:
+            # 11g 客户端取不到单条语句的往返次数：execute 一次，之后每取满 arraysize 行一次
+            query['roundtrips'] = 1 + query['rows'] // query['arraysize']
+            self._tracer.record(query)
+
+    def close(self):
+        self._finish()
+        self._raw.close()
+
+
+class TracedConnection:
+    """连接代理，cursor() 返回 TracedCursor，其余属性和 close()/discard()/mark_failed() 转给原连接"""
+
+    def __init__(self, tracer: 'QueryTracer', raw):
+        self._tracer = tracer
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self._tracer, self._raw.cursor(*args, **kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._raw.mark_failed()
+        self._raw.close()
+
+
+class QueryTracer:
+    """查询追踪统计
+
+    - slow_ms: 执行 + 取数超过该毫秒数的查询写入慢查询日志
+    - slow_log: 慢查询日志路径（每行一个 JSON），为空时只保留在内存中
+    - window: 每个接口、每种 SQL 计算百分位数时保留的最近查询数
+    """
+
+    def __init__(self, slow_ms: float = 500, slow_log: Optional[str] = None, window: int = 1000,
+                 recent_slow: int = 100):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.window = window
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._endpoints: Dict[str, _Series] = {}
+        self._sql: Dict[tuple, _Series] = {}
+        self._texts: Dict[str, str] = {}
+        self._calls: Dict[str, Dict[str, float]] = {}
+        self._recent_slow = deque(maxlen=recent_slow)
+
+    def wrap(self, connection) -> TracedConnection:
+        return TracedConnection(self, connection)
+
+    @property
+    def current_endpoint(self) -> str:
+        return getattr(self._local, 'endpoint', None) or 'other'
+
+    @contextmanager
+    def span(self, endpoint: str):
+        """在当前线程中把之后执行的查询归到 endpoint，并统计接口调用次数、耗时和异常"""
+        outer = getattr(self._local, 'endpoint', None)
+        self._local.endpoint = endpoint
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._local.endpoint = outer
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                calls = self._calls.setdefault(endpoint, {'calls': 0, 'errors': 0, 'seconds': 0.0})
+                calls['calls'] += 1
+                calls['errors'] += failed
+                calls['seconds'] += elapsed
+
+    def record(self, query: Dict[str, Any], error: Exception = None):
+        """记录一条已完成（或出错）的查询"""
+        endpoint = self.current_endpoint
+        text = fingerprint(query['sql'])
+        sql_id = hashlib.md5(text.encode('utf-8')).hexdigest()[:12]
+        fetch_seconds = query['fetch_seconds']
+        seconds = query['execute_seconds'] + fetch_seconds
+        roundtrips = query.get('roundtrips', 1)
+        slow = seconds * 1000 >= self.slow_ms
+
+        with self._lock:
+            if sql_id not in self._texts:
+                if len(self._texts) >= MAX_FINGERPRINTS:
+                    sql_id, text = 'other', 'other'
+                self._texts.setdefault(sql_id, text)
+            for series in (self._endpoints.setdefault(endpoint, _Series(self.window)),
+                           self._sql.setdefault((endpoint, sql_id), _Series(self.window))):
+                series.add(seconds, fetch_seconds, query['rows'], roundtrips, error is not None, slow)
+
+        if slow or error is not None:
+            entry = {
+                'time': datetime.now().isoformat(sep=' ', timespec='milliseconds'),
+                'endpoint': endpoint,
+                'fingerprint': sql_id,
+                'sql': text,
+                'binds': query['binds'],
+                'rows': query['rows'],
+                'execute_ms': round(query['execute_seconds'] * 1000, 2),
+                'fetch_ms': round(fetch_seconds * 1000, 2),
+                'roundtrips': roundtrips,
+                'error': str(error) if error is not None else None,
+            }
+            self._write_slow(entry)
+
+    def _write_slow(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self._recent_slow.append(entry)
+            if not self.slow_log:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.slow_log) or '.', exist_ok=True)
+                with open(self.slow_log, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            except OSError as e:
+                print(f"写入慢查询日志失败: {e}")
+
+    def recent_slow(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._recent_slow)
+
+    def stats(self) -> Dict[str, Any]:
+        """按接口汇总的查询次数、耗时百分位数（毫秒）、行数、往返次数"""
+        with self._lock:
+            result = {}
+            for endpoint, series in self._endpoints.items():
+                calls = self._calls.get(endpoint, {})
+                result[endpoint] = {
+                    'calls': calls.get('calls', 0),
+                    'call_errors': calls.get('errors', 0),
+                    'queries': series.count,
+                    'errors': series.errors,
+                    'slow': series.slow,
+                    'rows': series.rows,
+                    'roundtrips': series.roundtrips,
+                    'seconds': round(series.seconds, 4),
+                    **{f"p{round(q * 100)}_ms": round(v * 1000, 2) for q, v in series.quantiles().items()},
+                }
+            return result
+
+    def prometheus(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+
+        def summary(name, help_text, items):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for labels, series in items:
+                for q, value in series.quantiles().items():
+                    lines.append(f'{name}{{{labels},quantile="{q}"}} {value:.6f}')
+                lines.append(f"{name}_sum{{{labels}}} {series.seconds:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {series.count}")
+
+        def counter(name, help_text, items, field):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, series in items:
+                value = getattr(series, field) if not isinstance(series, dict) else series[field]
+                lines.append(f"{name}{{{labels}}} {value:.6f}" if isinstance(value, float)
+                             else f"{name}{{{labels}}} {value}")
+
+        with self._lock:
+            endpoints = [(f'endpoint="{_label(endpoint)}"', series)
+                         for endpoint, series in sorted(self._endpoints.items())]
+            statements = [(f'endpoint="{_label(endpoint)}",fingerprint="{sql_id}"', series)
+                          for (endpoint, sql_id), series in sorted(self._sql.items())]
+            calls = [(f'endpoint="{_label(endpoint)}"', values)
+                     for endpoint, values in sorted(self._calls.items())]
+
+            summary('sanyun_query_duration_seconds', '按接口统计的单条 SQL 执行加取数耗时', endpoints)
+            summary('sanyun_sql_duration_seconds', '按接口和 SQL 指纹统计的执行加取数耗时', statements)
+            counter('sanyun_sql_fetch_seconds_total', '取数耗时', statements, 'fetch_seconds')
+            counter('sanyun_sql_rows_total', '返回行数', statements, 'rows')
+            counter('sanyun_sql_roundtrips_total', '估算的往返次数', statements, 'roundtrips')
+            counter('sanyun_sql_errors_total', '执行出错次数', statements, 'errors')
+            counter('sanyun_sql_slow_total', '超过慢查询阈值的次数', statements, 'slow')
+            counter('sanyun_endpoint_calls_total', '接口调用次数（不含缓存命中）', calls, 'calls')
+            counter('sanyun_endpoint_errors_total', '接口抛出异常次数', calls, 'errors')
+            counter('sanyun_endpoint_seconds_total', '接口累计耗时', calls, 'seconds')
+
+            lines.append("# HELP sanyun_sql_info SQL 指纹对应的规范化语句")
+            lines.append("# TYPE sanyun_sql_info gauge")
+            for sql_id, text in sorted(self._texts.items()):
+                lines.append(f'sanyun_sql_info{{fingerprint="{sql_id}",sql="{_label(text[:300])}"}} 1')
+        return '\n'.join(lines) + '\n'
+
+
+def create_tracer() -> Optional[QueryTracer]:
+    """按配置创建查询追踪，QUERY_TRACE_ENABLED=false 时返回 None"""
+    if not Config.QUERY_TRACE_ENABLED:
+        return None
+    return QueryTracer(Config.SLOW_QUERY_MS, Config.SLOW_QUERY_LOG, Config.QUERY_TRACE_WINDOW)
@@ -0,0 +1,209 @@
+"""
+查询结果缓存
+按规范化后的参数缓存 SalesService 的查询结果：
+已结束的历史周期（过去的日、月）长时间缓存，包含今天的周期只短时间缓存；LRU 限制条目数。
+每条结果记录所依赖的单据日期范围，注册为变更捕获（change_feed）的消费者后，按变更单据的日期清除受影响的结果
+"""
+
+import bisect
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class ResultCache:
+    """带 TTL 的线程安全 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 1024, open_ttl: float = 60, closed_ttl: float = 43200):
+        self.max_entries = max_entries
+        self.open_ttl = open_ttl
+        self.closed_ttl = closed_ttl
+        self._lock = threading.Lock()
+        # 键 -> (过期时间, 值, 依赖的 (开始日期, 结束日期)，None 表示未知)
+        self._entries: 'OrderedDict[Tuple, Tuple[float, Any, Optional[Tuple[int, int]]]]' = OrderedDict()
+        # 每次按日期清除加一，查询开始后有清除的结果不写入
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'purges': 0,
+                       'invalidations': 0, 'stale_skips': 0}
+        self._by_name: Dict[str, Dict[str, int]] = {}
+
+    def get(self, key: Tuple, count_miss: bool = True) -> Tuple[bool, Any]:
+        """返回 (是否命中, 值)；count_miss=False 时未命中不计入统计（随后还会再查一次的预查）"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                entry = None
+
+            counters = self._by_name.setdefault(key[0], {'hits': 0, 'misses': 0})
+            if entry is None:
+                if count_miss:
+                    self._stats['misses'] += 1
+                    counters['misses'] += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            counters['hits'] += 1
+            return True, entry[1]
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, key: Tuple, value: Any, ttl: float, span: Optional[Tuple[int, int]] = None,
+            generation: Optional[int] = None):
+        """span 为结果依赖的单据日期范围（YYYYMMDD）；generation 为查询开始时的 self.generation，
+        之后发生过按日期清除时不写入，避免缓存清除前读到的旧数据
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self._stats['stale_skips'] += 1
+                return
+            self._entries[key] = (time.monotonic() + ttl, value, span)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def ttl_for(self, period_end: Optional[date]) -> float:
+        """周期已结束（早于今天）用长 TTL，否则用短 TTL"""
+        if period_end is not None and period_end < date.today():
+            return self.closed_ttl
+        return self.open_ttl
+
+    def purge(self, name: str = None) -> int:
+        """清除全部缓存，或只清除某一类查询的缓存，返回清除条目数"""
+        with self._lock:
+            if name is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [key for key in self._entries if key[0] == name]
+                for key in keys:
+                    del self._entries[key]
+                removed = len(keys)
+            self._stats['purges'] += 1
+            return removed
+
+    def purge_range(self, start_date: int, end_date: int) -> int:
+        """清除依赖 [start_date, end_date] 内单据（或依赖范围未知）的结果，返回清除条目数"""
+        return self._invalidate(lambda span: span[0] <= end_date and start_date <= span[1])
+
+    def apply_changes(self, cursor, batch):
+        """按变更事件的单据日期清除受影响的结果（ChangeFeed 的消费者，应在日汇总表、店铺排行之后注册）"""
+        days = sorted({day for event in batch.events for day in event.billdates})
+        if days:
+            self._invalidate(lambda span: bisect.bisect_left(days, span[0]) < bisect.bisect_right(days, span[1]))
+
+    def _invalidate(self, affected: Callable[[Tuple[int, int]], bool]) -> int:
+        with self._lock:
+            keys = [key for key, (_, _, span) in self._entries.items() if span is None or affected(span)]
+            for key in keys:
+                del self._entries[key]
+            self._generation += 1
+            self._stats['invalidations'] += len(keys)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats,
+                        size=len(self._entries),
+                        max_entries=self.max_entries,
+                        open_ttl=self.open_ttl,
+                        closed_ttl=self.closed_ttl,
+                        hit_rate=round(self._stats['hits'] / lookups * 100, 1) if lookups else 0,
+                        by_name={name: dict(counters) for name, counters in self._by_name.items()})
+
+
+def normalize_date(value: Optional[str]) -> str:
+    """把日期参数规范为 YYYY-MM-DD，未传时取今天"""
+    if not value:
+        return date.today().strftime('%Y-%m-%d')
+    return datetime.strptime(value.strip(), '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+def cached_query(name: str, period_end: Callable[[Dict[str, Any]], Optional[date]],
+                 date_param: str = 'selected_date', fallback: Callable[[], Any] = None,
+                 error_message: str = None, span: Callable[[Dict[str, Any]], Tuple[int, int]] = None):
+    """SalesService 方法的结果缓存装饰器
+
+    name: 缓存分类名，用于统计和按类清除
+    period_end: 根据规范化后的参数返回所查询周期的最后一天，返回 None 表示总是包含今天
+    span: 根据规范化后的参数返回结果依赖的单据日期范围 (开始日期, 结束日期)，为 None 时任何单据变更都会清除该结果
+    date_param: 日期参数名，未传时按今天填充后再调用原方法，保证缓存键与查询结果一致
+    fallback: 查询出错时返回的默认结果（不写入缓存）；为 None 时异常照常抛出
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        def prepare(self, args, kwargs):
+            """规范化参数，返回 (参数, 缓存键)"""
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            params.pop('self')
+            params[date_param] = normalize_date(params[date_param])
+            for key, value in params.items():
+                if isinstance(value, str):
+                    params[key] = value.strip().lower()
+            return params, (name,) + tuple(sorted(params.items()))
+
+        def cached_call(self, args, kwargs):
+            params, key = prepare(self, args, kwargs)
+            cache = getattr(self, 'cache', None)
+            if cache is not None:
+                hit, value = cache.get(key)
+                if hit:
+                    return value
+
+            def compute():
+                generation = cache.generation if cache is not None else None
+                tracer = getattr(self, 'tracer', None)
+                if tracer is None:
+                    value = method(self, **params)
+                else:
+                    # 查询追踪按缓存分类名归属接口
+                    with tracer.span(name):
+                        value = method(self, **params)
+                if cache is not None:
+                    cache.set(key, value, cache.ttl_for(period_end(params)),
+                              tuple(span(params)) if span is not None else None, generation)
+                return value
+
+            # 相同参数的并发调用只执行一次查询
+            flights = getattr(self, 'flights', None)
+            return compute() if flights is None else flights.do(key, compute)
+
+        def lookup(self, *args, **kwargs):
+            """只查缓存、不执行查询，返回 (缓存键, 是否命中, 值)；未命中不计入统计，参数无效时缓存键为 None"""
+            try:
+                _, key = prepare(self, args, kwargs)
+            except Exception:
+                return None, False, None
+            cache = getattr(self, 'cache', None)
+            if cache is None:
+                return key, False, None
+            return (key,) + cache.get(key, count_miss=False)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return cached_call(self, args, kwargs)
+            except Exception as e:
+                if fallback is None:
+                    raise
+                print(f"{error_message or name}: {e}")
+                return fallback()
+
+        # 异步服务先在事件循环中调用 lookup，命中时不必占用线程池
+        wrapper.lookup = lookup
+        return wrapper
+    return decorator
@@ -0,0 +1,629 @@
+"""
+m_retail 日汇总表
+按 (billdate, c_store_id, 单据状态) 在本地 SQLite 中保存每日每店的预聚合数据及会员消费次数，
+按 modifieddate 高水位增量同步，或注册为变更捕获（change_feed）的消费者按单据变更增量更新；
+SalesService 优先从汇总表取数，汇总表未覆盖或同步滞后时回退 Oracle
+
+单独执行一次同步:
+
+    python -m services.rollup
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from services import hll
+from services.change_feed import INSERT, Settled, settled_mark
+from services.fetch import BULK, NULL_INT, as_numpy, fetch_columns
+from services.periods import from_ymd, ymd
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS daily_store_sales (
+    billdate       INTEGER NOT NULL,
+    c_store_id     INTEGER,
+    bill_state     INTEGER NOT NULL,
+    sales          REAL NOT NULL,
+    amount_cnt     INTEGER NOT NULL,
+    list_amt       REAL NOT NULL,
+    orders         INTEGER NOT NULL,
+    qty            NUMERIC NOT NULL,
+    lines          NUMERIC NOT NULL,
+    member_orders  INTEGER NOT NULL,
+    member_sales   REAL NOT NULL,
+    discount_sum   REAL NOT NULL,
+    discount_cnt   INTEGER NOT NULL,
+    vip_ids        BLOB,
+    vip_visits     BLOB,
+    vip_hll        BLOB,
+    PRIMARY KEY (billdate, c_store_id, bill_state)
+);
+CREATE TABLE IF NOT EXISTS rollup_meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+# 表结构版本，与文件中记录的不一致时清空重建并重新回填
+SCHEMA_VERSION = 2
+
+# bill_state: 1 表示有效单据（isactive = 'Y' AND status = 1），0 表示其余单据
+BILL_STATE_SQL = "CASE WHEN isactive = 'Y' AND status = 1 THEN 1 ELSE 0 END"
+
+# 按 日期 × 店铺 × 单据状态 × 会员 分组，一次扫描得到汇总值和会员消费次数；非会员单据合并为 c_vip_id 为空的一组
+SOURCE_SQL = f"""
+    SELECT
+        billdate,
+        c_store_id,
+        {BILL_STATE_SQL} as bill_state,
+        c_vip_id,
+        NVL(SUM(tot_amt_actual), 0),
+        COUNT(tot_amt_actual),
+        NVL(SUM(tot_amt_list), 0),
+        COUNT(*),
+        NVL(SUM(tot_qty), 0),
+        NVL(SUM(tot_lines), 0),
+        NVL(SUM(CASE WHEN avg_discount > 0 THEN avg_discount END), 0),
+        COUNT(CASE WHEN avg_discount > 0 THEN 1 END)
+    FROM m_retail
+    WHERE billdate >= :start_date AND billdate <= :end_date
+    GROUP BY billdate, c_store_id, {BILL_STATE_SQL}, c_vip_id
+"""
+
+# 自高水位以来有修改的单据所在日期
+CHANGED_DAYS_SQL = """
+    SELECT billdate, MAX(modifieddate)
+    FROM m_retail
+    WHERE modifieddate >= :since
+    GROUP BY billdate
+"""
+
+HIGH_WATER_SQL = "SELECT MAX(modifieddate) FROM m_retail"
+
+# 指定开卡日期区间内的会员，用于和汇总表中的消费会员求交集得到新客数
+NEW_VIPS_SQL = """
+    SELECT id FROM c_vips
+    WHERE enterdate >= :current_start AND enterdate <= :current_end
+"""
+
+# 单次回源查询最多覆盖的天数
+REFRESH_CHUNK_DAYS = 31
+
+_SUMMED_COLUMNS = ('sales', 'amount_cnt', 'list_amt', 'orders', 'qty', 'lines',
+                   'member_orders', 'member_sales', 'discount_sum', 'discount_cnt')
+
+# 金额列按差值更新后保留 4 位小数（NUMBER(18, 4)），避免反复加减累积浮点误差
+_AMOUNT_COLUMNS = ('sales', 'list_amt', 'member_sales', 'discount_sum')
+
+# SOURCE_SQL 的列类型（日期、店铺、单据状态、会员，其后为 _SOURCE_MEASURES）
+_SOURCE_MEASURES = ('sales', 'amount_cnt', 'list_amt', 'orders', 'qty', 'lines', 'discount_sum', 'discount_cnt')
+_SOURCE_TYPES = (int, int, int, int, float, int, float, int, int, int, float, int)
+
+
+def _add_delta(deltas: Dict, image, sign: int):
+    """单据内容对所在汇总行各列的贡献乘以 sign（-1 / 1）累加到 deltas，口径与 SOURCE_SQL 一致"""
+    amount = image.tot_amt_actual
+    member = image.c_vip_id is not None
+    discount = image.avg_discount is not None and image.avg_discount > 0
+    key = (image.billdate, image.c_store_id, 1 if image.valid else 0)
+    delta = deltas.get(key)
+    if delta is None:
+        delta = deltas[key] = {'sums': dict.fromkeys(_SUMMED_COLUMNS, 0), 'vips': {}}
+    sums = delta['sums']
+    sums['sales'] += sign * (amount or 0)
+    sums['amount_cnt'] += sign * (amount is not None)
+    sums['list_amt'] += sign * (image.tot_amt_list or 0)
+    sums['orders'] += sign
+    sums['qty'] += sign * (image.tot_qty or 0)
+    sums['lines'] += sign * (image.tot_lines or 0)
+    sums['member_orders'] += sign * member
+    sums['member_sales'] += sign * (amount or 0) * member
+    sums['discount_sum'] += (sign * image.avg_discount) if discount else 0
+    sums['discount_cnt'] += sign * discount
+    if member:
+        delta['vips'][image.c_vip_id] = delta['vips'].get(image.c_vip_id, 0) + sign
+
+
+def _excluded(store_id, exclude) -> bool:
+    """与 Oracle 中 c_store_id NOT IN (...) 一致：排除列表非空时店铺为空的单据也被排除"""
+    return store_id in exclude or (store_id is None and bool(exclude))
+
+
+def _day_ranges(days: Iterable[int], chunk_days: int = REFRESH_CHUNK_DAYS) -> List[Tuple[int, int]]:
+    """把日期集合合并为连续区间，每个区间不超过 chunk_days 天"""
+    ranges = []
+    start = previous = None
+    for day in sorted({from_ymd(value) for value in days}):
+        if start is not None and day - previous == timedelta(days=1) and (day - start).days < chunk_days:
+            previous = day
+            continue
+        if start is not None:
+            ranges.append((ymd(start), ymd(previous)))
+        start = previous = day
+    if start is not None:
+        ranges.append((ymd(start), ymd(previous)))
+    return ranges
+
+
+class RollupStore:
+    """日汇总表
+
+    - path: SQLite 文件路径
+    - max_lag: 距上次成功同步超过该秒数时不再提供数据，由调用方回退 Oracle
+    - overlap: 增量同步时高水位向前回看的秒数，覆盖提交晚于修改时间的单据
+    """
+
+    def __init__(self, path: str, max_lag: float = 900, overlap: float = 600):
+        self.path = path
+        self.max_lag = max_lag
+        self.overlap = overlap
+        # 注册到 ChangeFeed 后为 True：回填之后不再自行增量同步，由 apply_changes 按变更事件更新
+        self.feed_driven = False
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'served': 0, 'fallbacks': 0, 'syncs': 0, 'sync_errors': 0, 'days_refreshed': 0,
+                       'deltas_applied': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA_SQL)
+            if self._get_meta(conn, 'schema_version') != str(SCHEMA_VERSION):
+                conn.executescript("DROP TABLE daily_store_sales; DELETE FROM rollup_meta;")
+                conn.executescript(SCHEMA_SQL)
+                self._set_meta(conn, 'schema_version', SCHEMA_VERSION)
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程复用一个 SQLite 连接；with 语句块结束时提交事务"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    # ---------- 元数据 ----------
+
+    def _get_meta(self, conn, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM rollup_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key: str, value):
+        conn.execute("INSERT OR REPLACE INTO rollup_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def status(self) -> Dict:
+        """覆盖范围、高水位、上次同步时间"""
+        with self._connect() as conn:
+            covered_from = self._get_meta(conn, 'covered_from')
+            synced_at = self._get_meta(conn, 'synced_at')
+            result = {
+                'path': self.path,
+                'covered_from': int(covered_from) if covered_from else None,
+                'high_water': self._get_meta(conn, 'high_water'),
+                'synced_at': float(synced_at) if synced_at else None,
+                'feed_batch': self._get_meta(conn, 'feed_batch'),
+                'rows': conn.execute("SELECT COUNT(*) FROM daily_store_sales").fetchone()[0],
+            }
+        result['lag_seconds'] = round(time.time() - result['synced_at'], 1) if result['synced_at'] else None
+        result['fresh'] = result['lag_seconds'] is not None and result['lag_seconds'] <= self.max_lag
+        with self._stats_lock:
+            result.update(self._stats)
+        return result
+
+    def can_serve(self, start_date: int, end_date: int) -> bool:
+        """汇总表是否覆盖 [start_date, end_date] 且同步未滞后"""
+        with self._connect() as conn:
+            covered_from = self._get_meta(conn, 'covered_from')
+            synced_at = self._get_meta(conn, 'synced_at')
+        ok = (covered_from is not None and synced_at is not None
+              and start_date >= int(covered_from)
+              and time.time() - float(synced_at) <= self.max_lag)
+        self._count('served' if ok else 'fallbacks')
+        return ok
+
+    # ---------- 同步 ----------
+
+    def sync(self, connection, backfill_days: int = 800) -> Dict:
+        """同步汇总表：首次回填最近 backfill_days 天，之后只重算高水位以来有修改的日期
+
+        feed_driven 时回填（或切换到变更捕获前最后一次增量同步）之后记录加载时刻，此后由 apply_changes 更新
+        """
+        with self._sync_lock:
+            try:
+                cursor = connection.cursor()
+                try:
+                    with self._connect() as conn:
+                        high_water = self._get_meta(conn, 'high_water')
+                        covered_from = self._get_meta(conn, 'covered_from')
+                        feed_settled = self._get_meta(conn, 'feed_settled')
+
+                    if high_water is None or covered_from is None:
+                        result = self._backfill(cursor, backfill_days)
+                    elif self.feed_driven and feed_settled is not None:
+                        return {'mode': 'feed', 'days': 0, 'high_water': high_water}
+                    else:
+                        result = self._incremental(cursor, datetime.fromisoformat(high_water), int(covered_from))
+                    if self.feed_driven:
+                        with self._connect() as conn:
+                            self._set_meta(conn, 'feed_settled', Settled(settled_mark(cursor)).dumps())
+                finally:
+                    cursor.close()
+            except Exception:
+                self._count('sync_errors')
+                raise
+
+            self._count('syncs')
+            self._count('days_refreshed', result['days'])
+            return result
+
+    def _backfill(self, cursor, backfill_days: int) -> Dict:
+        # 先记录高水位，回填期间的修改会在下一次增量同步中重算
+        cursor.execute(HIGH_WATER_SQL)
+        high_water = self._to_datetime(cursor.fetchone()[0]) or datetime(1970, 1, 1)
+
+        today = date.today()
+        covered_from = ymd(today - timedelta(days=backfill_days))
+        days = [ymd(today - timedelta(days=offset)) for offset in range(backfill_days + 1)]
+        for start_date, end_date in _day_ranges(days):
+            self._refresh_range(cursor, start_date, end_date)
+
+        with self._connect() as conn:
+            self._set_meta(conn, 'covered_from', covered_from)
+            self._set_meta(conn, 'high_water', high_water.isoformat(sep=' '))
+            self._set_meta(conn, 'synced_at', time.time())
+        return {'mode': 'backfill', 'days': len(days), 'high_water': high_water.isoformat(sep=' ')}
+
+    def _incremental(self, cursor, high_water: datetime, covered_from: int) -> Dict:
+        since = high_water - timedelta(seconds=self.overlap)
+        cursor.execute(CHANGED_DAYS_SQL, {'since': since})
+        days = []
+        for billdate, modified in cursor.fetchall():
+            modified = self._to_datetime(modified)
+            if modified is not None and modified > high_water:
+                high_water = modified
+            # 覆盖范围之前的日期不在汇总表中，查询时本来就会回退 Oracle
+            if billdate is not None and billdate >= covered_from:
+                days.append(billdate)
+
+        for start_date, end_date in _day_ranges(days):
+            self._refresh_range(cursor, start_date, end_date)
+
+        with self._connect() as conn:
+            self._set_meta(conn, 'high_water', high_water.isoformat(sep=' '))
+            self._set_meta(conn, 'synced_at', time.time())
+        return {'mode': 'incremental', 'days': len(days), 'high_water': high_water.isoformat(sep=' ')}
+
+    def _refresh_range(self, cursor, start_date: int, end_date: int):
+        """回源重算 [start_date, end_date] 的汇总行并整体替换
+
+        回源结果按列取回为数组，排序后同一 (日期, 店铺, 单据状态) 的行相邻，各列用 reduceat 分组求和
+        """
+        columns = [as_numpy(column) for column in fetch_columns(
+            cursor, SOURCE_SQL, {'start_date': start_date, 'end_date': end_date}, _SOURCE_TYPES, BULK)]
+        billdate, store_id, bill_state, vip_id = columns[:4]
+        measures = dict(zip(_SOURCE_MEASURES, columns[4:]))
+
+        rows = []
+        if len(billdate):
+            # 会员列放在最后一个排序键，组内会员 ID 升序
+            order = np.lexsort((vip_id, bill_state, store_id, billdate))
+            keys = np.stack((billdate, store_id, bill_state))[:, order]
+            starts = np.flatnonzero(np.r_[True, np.any(keys[:, 1:] != keys[:, :-1], axis=0)])
+            bounds = np.r_[starts, len(order)]
+
+            vips = vip_id[order]
+            member = vips != NULL_INT
+            sorted_measures = {name: values[order] for name, values in measures.items()}
+            sorted_measures['member_orders'] = np.where(member, sorted_measures['orders'], 0)
+            sorted_measures['member_sales'] = np.where(member, sorted_measures['sales'], 0.0)
+            sums = {column: np.add.reduceat(sorted_measures[column], starts).tolist() for column in _SUMMED_COLUMNS}
+            visits = sorted_measures['orders']
+
+            for index, (low, high) in enumerate(zip(bounds[:-1], bounds[1:])):
+                group_member = member[low:high]
+                group_vips = vips[low:high][group_member]
+                store = int(keys[1, low])
+                rows.append((int(keys[0, low]), None if store == NULL_INT else store, int(keys[2, low]),
+                             *(sums[column][index] for column in _SUMMED_COLUMNS),
+                             group_vips.tobytes(),
+                             visits[low:high][group_member].tobytes(),
+                             hll.sketch(group_vips)))
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM daily_store_sales WHERE billdate >= ? AND billdate <= ?",
+                         (start_date, end_date))
+            conn.executemany(f"""
+                INSERT INTO daily_store_sales
+                    (billdate, c_store_id, bill_state, {', '.join(_SUMMED_COLUMNS)}, vip_ids, vip_visits, vip_hll)
+                VALUES ({', '.join('?' * (len(_SUMMED_COLUMNS) + 6))})
+            """, rows)
+
+    def apply_changes(self, cursor, batch):
+        """按变更事件增量更新汇总表（ChangeFeed 的消费者）
+
+        事件前后的单据内容分别从所在 (日期, 店铺, 单据状态) 行中减去、加上，不回源；
+        可能已包含在回源结果中的事件、before 未知的修改事件以及崩溃后重新投递的批次，改为回源重算所在日期。
+        批次号的确认与差值写入在同一个事务中，多个进程共用同一个汇总表文件时同一批次的差值只写入一次
+        """
+        with self._sync_lock:
+            with self._connect() as conn:
+                covered_from = self._get_meta(conn, 'covered_from')
+                feed_settled = self._get_meta(conn, 'feed_settled')
+                last_batch = self._get_meta(conn, 'feed_batch')
+            # 尚未回填（或尚未切换到变更捕获）时忽略，之后的回源会包含这些变更
+            if covered_from is None or feed_settled is None:
+                return
+            covered_from = int(covered_from)
+            settled = Settled.loads(feed_settled)
+            redelivered = last_batch is not None and batch.number <= int(last_batch)
+
+            refresh_days = set()
+            deltas = {}
+            for event in batch.events:
+                days = [day for day in event.billdates if day >= covered_from]
+                if not days:
+                    continue
+                if redelivered or (event.before is None and event.kind != INSERT) or settled.ambiguous(event):
+                    refresh_days.update(days)
+                    continue
+                for image, sign in ((event.before, -1), (event.after, 1)):
+                    if image is not None and image.billdate is not None and image.billdate >= covered_from:
+                        _add_delta(deltas, image, sign)
+
+            refreshed = set()
+            mark = None
+            while True:
+                for start_date, end_date in _day_ranges(refresh_days - refreshed):
+                    self._refresh_range(cursor, start_date, end_date)
+                if refresh_days - refreshed:
+                    refreshed |= refresh_days
+                    mark = settled_mark(cursor)
+                deltas = {key: delta for key, delta in deltas.items() if key[0] not in refreshed}
+                if self._commit_batch(batch, deltas, refreshed, mark):
+                    break
+                # 其他进程已应用过该批次，差值作废，相关日期改为回源
+                refresh_days = refreshed | {key[0] for key in deltas}
+                deltas = {}
+            self._count('days_refreshed', len(refreshed))
+            self._count('deltas_applied', len(deltas))
+
+    def _commit_batch(self, batch, deltas: Dict, refreshed, mark: Optional[datetime]) -> bool:
+        """在同一个 BEGIN IMMEDIATE 事务中确认批次号、写入差值和批次号
+
+        有差值且 feed_batch 已不小于该批次号（其他进程已应用）时不写入，返回 False
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            last_batch = self._get_meta(conn, 'feed_batch')
+            last_batch = int(last_batch) if last_batch is not None else None
+            if deltas and last_batch is not None and batch.number <= last_batch:
+                return False
+            settled = Settled.loads(self._get_meta(conn, 'feed_settled'))
+            if refreshed:
+                settled.mark_days(refreshed, mark)
+            settled.prune(batch.low_water)
+            for key, delta in deltas.items():
+                self._apply_delta(conn, key, delta)
+            self._set_meta(conn, 'feed_settled', settled.dumps())
+            self._set_meta(conn, 'feed_batch', max(batch.number, last_batch or 0))
+            self._set_meta(conn, 'synced_at', time.time())
+        return True
+
+    def _apply_delta(self, conn, key: Tuple[int, Optional[int], int], delta: Dict):
+        """把一组差值合并进汇总行：单数减到 0 时删除该行，会员消费次数减到 0 时移除该会员，HLL 草图按会员重建"""
+        row = conn.execute(f"""
+            SELECT {', '.join(_SUMMED_COLUMNS)}, vip_ids, vip_visits
+            FROM daily_store_sales
+            WHERE billdate = ? AND c_store_id IS ? AND bill_state = ?
+        """, key).fetchone()
+        sums = list(row[:len(_SUMMED_COLUMNS)]) if row else [0] * len(_SUMMED_COLUMNS)
+        visits = {}
+        if row and row[-2]:
+            visits = dict(zip(np.frombuffer(row[-2], dtype=np.int64).tolist(),
+                              np.frombuffer(row[-1], dtype=np.int64).tolist()))
+
+        values = {}
+        for column, value in zip(_SUMMED_COLUMNS, sums):
+            total = (value or 0) + delta['sums'][column]
+            values[column] = round(total, 4) if column in _AMOUNT_COLUMNS else total
+        for vip_id, count in delta['vips'].items():
+            visits[vip_id] = visits.get(vip_id, 0) + count
+            if visits[vip_id] <= 0:
+                del visits[vip_id]
+
+        conn.execute("DELETE FROM daily_store_sales WHERE billdate = ? AND c_store_id IS ? AND bill_state = ?", key)
+        if values['orders'] <= 0:
+            return
+        vip_ids = np.array(sorted(visits), dtype=np.int64)
+        conn.execute(f"""
+            INSERT INTO daily_store_sales
+                (billdate, c_store_id, bill_state, {', '.join(_SUMMED_COLUMNS)}, vip_ids, vip_visits, vip_hll)
+            VALUES ({', '.join('?' * (len(_SUMMED_COLUMNS) + 6))})
+        """, (*key, *(values[column] for column in _SUMMED_COLUMNS), vip_ids.tobytes(),
+              np.array([visits[vip_id] for vip_id in vip_ids.tolist()], dtype=np.int64).tobytes(),
+              hll.sketch(vip_ids)))
+
+    @staticmethod
+    def _to_datetime(value) -> Optional[datetime]:
+        if value is None or isinstance(value, datetime):
+            return value
+        return datetime.fromisoformat(str(value))
+
+    # ---------- 查询 ----------
+
+    def store_totals(self, start_date: int, end_date: int, active_only: bool = False) -> Dict[Optional[int], Dict]:
+        """按店铺汇总区间内的数据，返回 {c_store_id: {字段: 值}}"""
+        states = (1,) if active_only else (0, 1)
+        with self._connect() as conn:
+            cursor = conn.execute(f"""
+                SELECT c_store_id, {', '.join(f'SUM({column})' for column in _SUMMED_COLUMNS)}
+                FROM daily_store_sales
+                WHERE billdate >= ? AND billdate <= ?
+                AND bill_state IN ({', '.join('?' * len(states))})
+                GROUP BY c_store_id
+            """, (start_date, end_date, *states))
+            return {row[0]: dict(zip(_SUMMED_COLUMNS, row[1:])) for row in cursor}
+
+    def daily_totals(self, start_date: int, end_date: int, active_only: bool = False) -> Dict[int, Tuple[float, int]]:
+        """按日汇总区间内全部店铺的数据，返回 {billdate: (销售额, 单数)}"""
+        states = (1,) if active_only else (0, 1)
+        with self._connect() as conn:
+            cursor = conn.execute(f"""
+                SELECT billdate, SUM(sales), SUM(orders)
+                FROM daily_store_sales
+                WHERE billdate >= ? AND billdate <= ?
+                AND bill_state IN ({', '.join('?' * len(states))})
+                GROUP BY billdate
+            """, (start_date, end_date, *states))
+            return {row[0]: (row[1], row[2]) for row in cursor}
+
+    def vip_visits(self, start_date: int, end_date: int, exclude_stores: Iterable[int] = (),
+                   active_only: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """区间内消费过的会员（升序去重）及各自的消费单数"""
+        exclude = set(exclude_stores)
+        states = (1,) if active_only else (0, 1)
+        id_blobs = []
+        visit_blobs = []
+        with self._connect() as conn:
+            cursor = conn.execute(f"""
+                SELECT c_store_id, vip_ids, vip_visits
+                FROM daily_store_sales
+                WHERE billdate >= ? AND billdate <= ?
+                AND bill_state IN ({', '.join('?' * len(states))})
+                AND vip_ids IS NOT NULL
+            """, (start_date, end_date, *states))
+            for store_id, id_blob, visit_blob in cursor:
+                if not _excluded(store_id, exclude):
+                    id_blobs.append(id_blob)
+                    visit_blobs.append(visit_blob)
+
+        ids = np.frombuffer(b''.join(id_blobs), dtype=np.int64)
+        visits = np.frombuffer(b''.join(visit_blobs), dtype=np.int64)
+        vip_ids, inverse = np.unique(ids, return_inverse=True)
+        return vip_ids, np.bincount(inverse, weights=visits, minlength=len(vip_ids)).astype(np.int64)
+
+    def distinct_vips(self, start_date: int, end_date: int, exclude_stores: Iterable[int] = (),
+                      active_only: bool = False, approx: bool = False) -> int:
+        """区间内消费过的去重会员数；approx=True 时合并 HLL 草图估算，相对标准误差见 hll.RELATIVE_ERROR"""
+        exclude = set(exclude_stores)
+        states = (1,) if active_only else (0, 1)
+        column = 'vip_hll' if approx else 'vip_ids'
+        with self._connect() as conn:
+            cursor = conn.execute(f"""
+                SELECT c_store_id, {column}
+                FROM daily_store_sales
+                WHERE billdate >= ? AND billdate <= ?
+                AND bill_state IN ({', '.join('?' * len(states))})
+                AND {column} IS NOT NULL
+            """, (start_date, end_date, *states))
+            blobs = [blob for store_id, blob in cursor if not _excluded(store_id, exclude)]
+
+        if approx:
+            return hll.count(blobs)
+        data = b''.join(blobs)
+        return len(np.unique(np.frombuffer(data, dtype=np.int64))) if data else 0
+
+    def period_totals(self, start_date: int, end_date: int, exclude_stores: Iterable[int] = (),
+                      active_only: bool = False, distinct_customers: bool = True, approx: bool = False) -> Dict:
+        """区间汇总，字段与 period_metrics.PERIOD_MEASURES 一致，另含 member_sales、amount_cnt
+
+        approx=True 时 unique_customers 为 HLL 估算值
+        """
+        exclude = set(exclude_stores)
+        totals = dict.fromkeys(_SUMMED_COLUMNS, 0)
+        active_stores = 0
+        for store_id, values in self.store_totals(start_date, end_date, active_only).items():
+            if _excluded(store_id, exclude):
+                continue
+            for column in _SUMMED_COLUMNS:
+                totals[column] += values[column] or 0
+            if store_id is not None and values['orders']:
+                active_stores += 1
+
+        result = {
+            'total_sales': totals['sales'],
+            'total_list_price': totals['list_amt'],
+            'avg_discount_rate': totals['discount_sum'] / totals['discount_cnt'] if totals['discount_cnt'] else 0,
+            'total_orders': totals['orders'],
+            'total_quantity': totals['qty'],
+            'total_lines': totals['lines'],
+            'active_stores': active_stores,
+            'member_orders': totals['member_orders'],
+            'member_sales': totals['member_sales'],
+            'amount_cnt': totals['amount_cnt'],
+        }
+        if distinct_customers:
+            result['unique_customers'] = self.distinct_vips(start_date, end_date, exclude, active_only, approx)
+        return result
+
+    def customer_retention(self, cursor, current_start: int, current_end: int) -> Tuple[int, int]:
+        """当期新客数和回店会员数，与 period_metrics.fetch_customer_retention 一致（不排除仓库店铺）"""
+        vip_ids, visits = self.vip_visits(current_start, current_end)
+        repeat_customers = int(np.count_nonzero(visits > 1))
+
+        new_vips = as_numpy(fetch_columns(cursor, NEW_VIPS_SQL, {'current_start': current_start,
+                                                                'current_end': current_end}, (int,), BULK)[0])
+        new_customers = int(np.count_nonzero(np.isin(new_vips, vip_ids, assume_unique=True)))
+        return new_customers, repeat_customers
+
+
+class RollupSyncer:
+    """后台线程，按固定间隔增量同步汇总表"""
+
+    def __init__(self, rollup: RollupStore, pool, interval: float = 300, backfill_days: int = 800):
+        self.rollup = rollup
+        self.pool = pool
+        self.interval = interval
+        self.backfill_days = backfill_days
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='rollup-sync', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.pool.acquire() as connection:
+                    result = self.rollup.sync(connection, self.backfill_days)
+                print(f"汇总表同步完成: {result}")
+            except Exception as e:
+                print(f"汇总表同步失败: {e}")
+            self._stop.wait(self.interval)
+
+
+def create_rollup() -> Optional[RollupStore]:
+    """按配置创建汇总表，ROLLUP_ENABLED=false 时返回 None"""
+    if not Config.ROLLUP_ENABLED:
+        return None
+    return RollupStore(Config.ROLLUP_PATH, Config.ROLLUP_MAX_LAG, Config.ROLLUP_OVERLAP)
+
+
+if __name__ == '__main__':
+    from db_pool import get_session_pool
+
+    pool = get_session_pool(Config.DB_USERNAME, Config.DB_PASSWORD, Config.DB_DSN)
+    connection = pool.acquire()
+    try:
+        print(RollupStore(Config.ROLLUP_PATH, Config.ROLLUP_MAX_LAG, Config.ROLLUP_OVERLAP)
+              .sync(connection, Config.ROLLUP_BACKFILL_DAYS))
+    finally:
+        connection.close()
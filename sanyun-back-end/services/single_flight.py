@@ -0,0 +1,99 @@
+"""
+相同查询合并（single-flight）
+多个请求同时发起参数完全相同的查询时，只有第一个真正执行，其余等待并共享它的结果（或异常），
+例如开会时几十个客户端同时打开同一天的仪表盘
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    """一次正在执行的查询"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """按键合并并发调用，键的第一个元素为查询分类名，用于分类统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        # 事件循环中的合并：(事件循环, 键) -> Task
+        self._tasks: Dict[tuple, asyncio.Task] = {}
+        self._stats = {'calls': 0, 'executions': 0, 'coalesced': 0, 'errors': 0}
+        self._by_name: Dict[str, Dict[str, int]] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """执行 fn()，同一键已有调用在执行时等待它完成并返回同一结果"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            self._record(key, coalesced=not leader)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fn()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def do_async(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """do() 的协程版本：同一事件循环中的相同调用共享一个 Task，等待者不占用线程
+
+        factory 通常把阻塞查询交给线程池，线程中的调用再经过 do() 与同步请求合并，
+        因此这里只统计被合并的调用，执行次数由 do() 统计
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = loop.create_task(factory())
+                task.add_done_callback(lambda _: self._forget_task(task_key))
+            else:
+                self._record(key, coalesced=True)
+        # shield: 某个等待者被取消（客户端断开）不影响其他等待者
+        return await asyncio.shield(task)
+
+    def _forget_task(self, task_key: tuple):
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def _record(self, key: Hashable, coalesced: bool):
+        name = key[0] if isinstance(key, tuple) and key else str(key)
+        counters = self._by_name.setdefault(name, {'calls': 0, 'executions': 0, 'coalesced': 0})
+        self._stats['calls'] += 1
+        counters['calls'] += 1
+        field = 'coalesced' if coalesced else 'executions'
+        self._stats[field] += 1
+        counters[field] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._stats['calls']
+            return dict(self._stats,
+                        in_flight=len(self._flights) + len(self._tasks),
+                        coalesce_rate=round(self._stats['coalesced'] / calls * 100, 1) if calls else 0,
+                        by_name={name: dict(counters) for name, counters in self._by_name.items()})
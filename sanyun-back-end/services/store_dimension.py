@@ -0,0 +1,121 @@
+"""
+店铺维度缓存
+一次性加载 c_store (id, name, isactive, 是否仓库)，按 TTL 或变更检测刷新，
+把仓库/库房店铺 ID 以绑定变量列表传给查询，替代每条 SQL 中的 LIKE '%仓库%' 子查询
+"""
+
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Optional, Tuple
+
+from services.fetch import SMALL, fetch_rows
+
+StoreInfo = namedtuple('StoreInfo', ['id', 'name', 'isactive', 'is_warehouse'])
+
+# Oracle IN 列表最多 1000 个表达式
+IN_LIST_LIMIT = 1000
+
+
+class _Snapshot:
+    """某一时刻的店铺维度，只读，整体替换"""
+
+    def __init__(self, stores: Dict[int, StoreInfo], signature):
+        self.stores = stores
+        self.signature = signature
+        self.warehouse_ids = tuple(sorted(s.id for s in stores.values() if s.is_warehouse))
+        # 参与排行的店铺：启用、非仓库、有名称
+        self.retail_stores = tuple(s for s in stores.values()
+                                   if s.isactive == 'Y' and s.name and not s.is_warehouse)
+
+
+class StoreDimension:
+    """店铺维度缓存
+
+    - ttl: 超过该秒数无条件重新加载
+    - check_interval: 超过该秒数执行一次轻量的变更检测查询（行数 + 最大修改时间），有变化才重新加载
+    """
+
+    WAREHOUSE_KEYWORDS = ('仓库', '库房')
+
+    LOAD_SQL = "SELECT id, name, isactive FROM c_store"
+    SIGNATURE_SQL = "SELECT COUNT(*), MAX(modifieddate) FROM c_store"
+
+    def __init__(self, ttl: float = 3600, check_interval: float = 60):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    def snapshot(self, cursor) -> _Snapshot:
+        """返回最新的店铺维度，必要时用传入的游标刷新"""
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if (snapshot is not None and now - self._loaded_at < self.ttl
+                and now - self._checked_at < self.check_interval):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            now = time.monotonic()
+            if snapshot is None or now - self._loaded_at >= self.ttl:
+                return self._reload(cursor)
+
+            if now - self._checked_at >= self.check_interval:
+                cursor.execute(self.SIGNATURE_SQL)
+                signature = tuple(cursor.fetchone())
+                self._checked_at = now
+                if signature != snapshot.signature:
+                    return self._reload(cursor, signature)
+            return self._snapshot
+
+    def invalidate(self):
+        """下次访问时强制重新加载"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def warehouse_filter(self, cursor, column: str = 'c_store_id') -> Tuple[str, Dict[str, int]]:
+        """生成排除仓库店铺的条件及绑定变量"""
+        warehouse_ids = self.snapshot(cursor).warehouse_ids
+        if not warehouse_ids:
+            return '1 = 1', {}
+
+        clauses = []
+        binds = {}
+        for offset in range(0, len(warehouse_ids), IN_LIST_LIMIT):
+            names = []
+            for index, store_id in enumerate(warehouse_ids[offset:offset + IN_LIST_LIMIT], offset):
+                names.append(f":wh{index}")
+                binds[f"wh{index}"] = store_id
+            clauses.append(f"{column} NOT IN ({', '.join(names)})")
+        return ' AND '.join(clauses), binds
+
+    def retail_stores(self, cursor) -> Tuple[StoreInfo, ...]:
+        """启用的非仓库店铺"""
+        return self.snapshot(cursor).retail_stores
+
+    def get(self, cursor, store_id: int) -> Optional[StoreInfo]:
+        return self.snapshot(cursor).stores.get(store_id)
+
+    def _reload(self, cursor, signature=None) -> _Snapshot:
+        if signature is None:
+            cursor.execute(self.SIGNATURE_SQL)
+            signature = tuple(cursor.fetchone())
+
+        stores = {}
+        for store_id, name, isactive in fetch_rows(cursor, self.LOAD_SQL, None, (int, None, None), SMALL):
+            stores[store_id] = StoreInfo(store_id, name, isactive, self.is_warehouse_name(name))
+
+        now = time.monotonic()
+        self._snapshot = _Snapshot(stores, signature)
+        self._loaded_at = now
+        self._checked_at = now
+        self.reloads += 1
+        return self._snapshot
+
+    @classmethod
+    def is_warehouse_name(cls, name: Optional[str]) -> bool:
+        return bool(name) and any(keyword in name for keyword in cls.WAREHOUSE_KEYWORDS)
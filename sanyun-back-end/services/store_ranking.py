@@ -0,0 +1,273 @@
+"""
+开放周期的店铺排行
+在内存中维护今天所在月份 每日 × 店铺 的销售额、单数，每次轮询只按 modifieddate 高水位重算有单据变更的日期；
+当月内任意一天或整月的排行按销售额排好序缓存，直到相关日期有变更，任意 limit 都直接取前若干名。
+注册为变更捕获（change_feed）的消费者后不再自行轮询，按单据变更前后的内容增量更新。
+已结束的月份不在这里维护，由日汇总表或 Oracle 提供
+"""
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from services.change_feed import INSERT, Settled, settled_mark
+from services.fetch import BULK, NULL_INT, fetch_columns
+from services.periods import DateRange, period_spec
+
+# 按 日 × 店铺 汇总，口径与 get_top_stores 的 Oracle 查询一致（不过滤单据状态）
+DAY_STORE_SQL = """
+    SELECT billdate, c_store_id, NVL(SUM(tot_amt_actual), 0), COUNT(id), COUNT(tot_amt_actual)
+    FROM m_retail
+    WHERE billdate >= :start_date AND billdate <= :end_date
+    GROUP BY billdate, c_store_id
+"""
+
+# 自高水位以来有修改、且属于当前月份的单据日期
+CHANGED_DAYS_SQL = """
+    SELECT billdate, MAX(modifieddate)
+    FROM m_retail
+    WHERE modifieddate >= :since
+    AND billdate >= :start_date AND billdate <= :end_date
+    GROUP BY billdate
+"""
+
+HIGH_WATER_SQL = "SELECT MAX(modifieddate) FROM m_retail"
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+class StoreRanking:
+    """当月店铺排行
+
+    - poll_interval: 距上次轮询超过该秒数时，下一次查询先增量刷新
+    - overlap: 高水位向前回看的秒数，覆盖提交晚于修改时间的单据
+    - max_lag: 由变更捕获驱动时，超过该秒数没有收到变更批次则不再提供排行，由调用方回退
+    """
+
+    def __init__(self, poll_interval: float = 30, overlap: float = 600, max_lag: float = 900):
+        self.poll_interval = poll_interval
+        self.overlap = overlap
+        self.max_lag = max_lag
+        # 注册到 ChangeFeed 后为 True：只在首次查询和换月时加载，之后由 apply_changes 按变更事件更新
+        self.feed_driven = False
+        self._settled = Settled()
+        # 加载后最近一次应用的变更批次号
+        self._batch: Optional[int] = None
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._month: Optional[DateRange] = None
+        # billdate -> {c_store_id: (销售额, 单数, 有金额的单数)}
+        self._days: Dict[int, Dict[int, Tuple[float, int, int]]] = {}
+        # (开始日期, 结束日期) -> (店铺维度快照, 按销售额降序排列的排行)
+        self._ranked: Dict[Tuple[int, int], Tuple[object, List[Dict]]] = {}
+        self._high_water: Optional[datetime] = None
+        self._polled_at = 0.0
+        self._stats = {'served': 0, 'rebuilds': 0, 'polls': 0, 'days_refreshed': 0, 'poll_errors': 0,
+                       'deltas_applied': 0}
+
+    def covers(self, start_date: int, end_date: int) -> bool:
+        """[start_date, end_date] 是否在今天所在的月份内（由变更捕获驱动且批次中断超过 max_lag 时为 False）"""
+        month = period_spec('month', date.today()).current
+        if self.feed_driven and self._month == month and time.monotonic() - self._polled_at > self.max_lag:
+            return False
+        return month.start <= start_date and end_date <= month.end
+
+    def top(self, cursor, start_date: int, end_date: int, snapshot, limit: int) -> List[Dict]:
+        """区间内销售额前 limit 名的店铺 {'name', 'sales', 'orders', 'avg_order'}
+
+        snapshot 为店铺维度快照，没有销售的启用店铺也参与排行，同销售额按快照中的顺序
+        """
+        self.refresh(cursor)
+        key = (start_date, end_date)
+        with self._lock:
+            cached = self._ranked.get(key)
+            if cached is None or cached[0] is not snapshot:
+                cached = self._ranked[key] = (snapshot, self._rank(start_date, end_date, snapshot))
+                self._stats['rebuilds'] += 1
+            self._stats['served'] += 1
+        return [dict(store) for store in cached[1][:limit]]
+
+    def _rank(self, start_date: int, end_date: int, snapshot) -> List[Dict]:
+        totals = {}
+        for billdate, stores in self._days.items():
+            if start_date <= billdate <= end_date:
+                for store_id, (sales, orders, amount_cnt) in stores.items():
+                    total = totals.get(store_id)
+                    if total is None:
+                        totals[store_id] = [sales, orders, amount_cnt]
+                    else:
+                        total[0] += sales
+                        total[1] += orders
+                        total[2] += amount_cnt
+
+        ranking = []
+        for store in snapshot.retail_stores:
+            total = totals.get(store.id)
+            ranking.append({
+                'name': store.name,
+                'sales': float(total[0]) if total else 0.0,
+                'orders': total[1] if total else 0,
+                'avg_order': float(total[0] / total[2]) if total and total[2] else 0.0
+            })
+        # sort 是稳定排序，与 heapq.nlargest 的并列顺序一致
+        ranking.sort(key=lambda store: store['sales'], reverse=True)
+        return ranking
+
+    def refresh(self, cursor, force: bool = False):
+        """到了轮询间隔（或换月）时增量刷新；其他线程正在刷新时直接使用现有数据"""
+        month = period_spec('month', date.today()).current
+        polling = not self.feed_driven and (force or time.monotonic() - self._polled_at >= self.poll_interval)
+        if self._month == month and not polling:
+            return
+        # 首次加载或换月时必须等待加载完成，否则只有一个线程轮询
+        if not self._poll_lock.acquire(blocking=self._month != month):
+            return
+        try:
+            if self._month != month:
+                self._load(cursor, month)
+            elif not self.feed_driven and (force or time.monotonic() - self._polled_at >= self.poll_interval):
+                self._poll(cursor)
+        except Exception as e:
+            self._stats['poll_errors'] += 1
+            print(f"店铺排行刷新失败: {e}")
+            if self._month != month:
+                raise
+        finally:
+            self._poll_lock.release()
+
+    def _load(self, cursor, month: DateRange):
+        """加载整个月份；先记录高水位，加载期间的修改在下一次轮询中重算"""
+        cursor.execute(HIGH_WATER_SQL)
+        high_water = _to_datetime(cursor.fetchone()[0]) or datetime(1970, 1, 1)
+        days = self._fetch_days(cursor, month.start, month.end)
+        settled = Settled(settled_mark(cursor)) if self.feed_driven else Settled()
+        with self._lock:
+            self._month = month
+            self._settled = settled
+            self._batch = None
+            self._days = days
+            self._ranked.clear()
+            self._high_water = high_water
+            self._polled_at = time.monotonic()
+            self._stats['days_refreshed'] += len(days)
+
+    def _poll(self, cursor):
+        month = self._month
+        cursor.execute(CHANGED_DAYS_SQL, {'since': self._high_water - timedelta(seconds=self.overlap),
+                                          'start_date': month.start, 'end_date': month.end})
+        high_water = self._high_water
+        changed = []
+        for billdate, modified in cursor.fetchall():
+            modified = _to_datetime(modified)
+            if modified is not None and modified > high_water:
+                high_water = modified
+            changed.append(billdate)
+
+        refreshed = {}
+        if changed:
+            refreshed = self._fetch_days(cursor, min(changed), max(changed))
+        with self._lock:
+            for billdate in changed:
+                self._days[billdate] = refreshed.get(billdate, {})
+            if changed:
+                first, last = min(changed), max(changed)
+                self._ranked = {key: value for key, value in self._ranked.items()
+                                if key[1] < first or key[0] > last}
+            self._high_water = high_water
+            self._polled_at = time.monotonic()
+            self._stats['polls'] += 1
+            self._stats['days_refreshed'] += len(changed)
+
+    def apply_changes(self, cursor, batch):
+        """按变更事件增量更新当月各天的店铺汇总（ChangeFeed 的消费者），口径与 DAY_STORE_SQL 一致
+
+        可能已包含在加载结果中的事件、before 未知的修改事件以及重新投递的批次改为回源重算所在日期；
+        尚未加载或已换月时忽略，下一次查询会重新加载整月
+        """
+        with self._poll_lock:
+            month = self._month
+            if month is None or month != period_spec('month', date.today()).current:
+                return
+            redelivered = self._batch is not None and batch.number <= self._batch
+
+            refresh_days = set()
+            deltas = {}
+            for event in batch.events:
+                if not any(month.start <= day <= month.end for day in event.billdates):
+                    continue
+                if redelivered or (event.before is None and event.kind != INSERT) or self._settled.ambiguous(event):
+                    refresh_days.update(day for day in event.billdates if month.start <= day <= month.end)
+                    continue
+                for image, sign in ((event.before, -1), (event.after, 1)):
+                    if image is not None and image.billdate is not None and month.start <= image.billdate <= month.end:
+                        store_id = NULL_INT if image.c_store_id is None else image.c_store_id
+                        delta = deltas.setdefault((image.billdate, store_id), [0.0, 0, 0])
+                        delta[0] += sign * (image.tot_amt_actual or 0)
+                        delta[1] += sign
+                        delta[2] += sign * (image.tot_amt_actual is not None)
+
+            refreshed = {}
+            if refresh_days:
+                refreshed = self._fetch_days(cursor, min(refresh_days), max(refresh_days))
+                mark = settled_mark(cursor)
+            with self._lock:
+                for billdate in refresh_days:
+                    self._days[billdate] = refreshed.get(billdate, {})
+                applied = 0
+                for (billdate, store_id), (sales, orders, amount_cnt) in deltas.items():
+                    if billdate in refresh_days:
+                        continue
+                    stores = self._days.setdefault(billdate, {})
+                    current = stores.get(store_id, (0.0, 0, 0))
+                    total = (round(current[0] + sales, 4), current[1] + orders, current[2] + amount_cnt)
+                    if total[1] > 0:
+                        stores[store_id] = total
+                    else:
+                        stores.pop(store_id, None)
+                    applied += 1
+
+                changed = refresh_days | {billdate for billdate, _ in deltas}
+                if changed:
+                    self._ranked = {key: value for key, value in self._ranked.items()
+                                    if not any(key[0] <= billdate <= key[1] for billdate in changed)}
+                if refresh_days:
+                    self._settled.mark_days(refresh_days, mark)
+                self._settled.prune(batch.low_water)
+                self._batch = batch.number
+                self._polled_at = time.monotonic()
+                self._stats['polls'] += 1
+                self._stats['days_refreshed'] += len(refresh_days)
+                self._stats['deltas_applied'] += applied
+
+    @staticmethod
+    def _fetch_days(cursor, start_date: int, end_date: int) -> Dict[int, Dict[int, Tuple[float, int, int]]]:
+        columns = fetch_columns(cursor, DAY_STORE_SQL, {'start_date': start_date, 'end_date': end_date},
+                                (int, int, float, int, int), BULK)
+        days = {}
+        for billdate, store_id, sales, orders, amount_cnt in zip(*columns):
+            days.setdefault(billdate, {})[store_id] = (sales, orders, amount_cnt)
+        return days
+
+    def status(self) -> Dict:
+        with self._lock:
+            return dict(self._stats,
+                        feed_driven=self.feed_driven,
+                        feed_batch=self._batch,
+                        month=list(self._month) if self._month else None,
+                        days=len(self._days),
+                        rankings=len(self._ranked),
+                        high_water=self._high_water.isoformat(sep=' ') if self._high_water else None,
+                        polled_seconds_ago=round(time.monotonic() - self._polled_at, 1) if self._polled_at else None)
+
+
+def create_ranking() -> Optional[StoreRanking]:
+    """按配置创建当月店铺排行，RANKING_ENABLED=false 时返回 None"""
+    if not Config.RANKING_ENABLED:
+        return None
+    return StoreRanking(Config.RANKING_POLL_INTERVAL, Config.ROLLUP_OVERLAP, Config.ROLLUP_MAX_LAG)
@@ -0,0 +1,110 @@
+"""
+销售趋势时间序列
+一次 GROUP BY billdate 查询（或日汇总表）取得区间内每日的有效单据销售额和单数，
+再按日、周、月分桶并计算每个点相对上一个点的增长率
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from services.metrics_engine import period_over_period, safe_divide
+from services.periods import ymd
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# 未指定开始日期时返回的点数
+DEFAULT_POINTS = {'day': 30, 'week': 12, 'month': 12}
+
+# 单次请求最多覆盖的天数
+MAX_DAYS = 3700
+
+# 有效单据（isactive = 'Y' AND status = 1）按日汇总，与 get_sales_trend 的口径一致
+DAILY_SALES_SQL = """
+    SELECT billdate, NVL(SUM(tot_amt_actual), 0) as total_sales, COUNT(*) as total_orders
+    FROM m_retail
+    WHERE billdate >= :start_date AND billdate <= :end_date
+    AND isactive = 'Y' AND status = 1
+    GROUP BY billdate
+"""
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """day 所在分桶的第一天：周从周一开始，月从 1 日开始"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: date, granularity: str) -> date:
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def previous_bucket(start: date, granularity: str) -> date:
+    return bucket_start(start - timedelta(days=1), granularity)
+
+
+def default_start(end: date, granularity: str) -> date:
+    """默认返回以 end 所在分桶结尾的 DEFAULT_POINTS 个点"""
+    start = bucket_start(end, granularity)
+    for _ in range(DEFAULT_POINTS[granularity] - 1):
+        start = previous_bucket(start, granularity)
+    return start
+
+
+def bucket_ranges(start: date, end: date, granularity: str) -> List[Tuple[date, date]]:
+    """把 [start, end] 按分桶切分，start 对齐到分桶开始，最后一个分桶截止到 end"""
+    ranges = []
+    current = bucket_start(start, granularity)
+    while current <= end:
+        following = next_bucket(current, granularity)
+        ranges.append((current, min(following - timedelta(days=1), end)))
+        current = following
+    return ranges
+
+
+def query_range(start: date, end: date, granularity: str) -> Tuple[date, date]:
+    """实际需要查询的日期区间：多取一个前置分桶，使第一个点也能计算增长率"""
+    return previous_bucket(bucket_start(start, granularity), granularity), end
+
+
+def build_series(daily: Dict[int, Tuple[float, int]], start: date, end: date, granularity: str) -> List[Dict]:
+    """由 {billdate: (销售额, 单数)} 生成分桶序列，每个点带相对上一个点的增长率"""
+    first, _ = query_range(start, end, granularity)
+    days = (end - first).days + 1
+    sales = np.zeros(days)
+    orders = np.zeros(days)
+    for offset in range(days):
+        value = daily.get(ymd(first + timedelta(days=offset)))
+        if value is not None:
+            sales[offset] = float(value[0] or 0)
+            orders[offset] = value[1] or 0
+
+    # 前置分桶 + 请求的分桶，按各分桶第一天的偏移量分段求和
+    ranges = [(first, bucket_start(start, granularity) - timedelta(days=1))] + bucket_ranges(start, end, granularity)
+    offsets = np.array([(bucket_first - first).days for bucket_first, _ in ranges])
+    bucket_sales = np.add.reduceat(sales, offsets)
+    bucket_orders = np.add.reduceat(orders, offsets)
+
+    growth = period_over_period(bucket_sales)[1:]
+    avg_order_value = safe_divide(bucket_sales[1:], bucket_orders[1:])
+
+    points = []
+    for index, (bucket_first, bucket_last) in enumerate(ranges[1:]):
+        points.append({
+            'period': bucket_first.strftime('%Y-%m' if granularity == 'month' else '%Y-%m-%d'),
+            'start_date': bucket_first.strftime('%Y-%m-%d'),
+            'end_date': bucket_last.strftime('%Y-%m-%d'),
+            'sales': float(bucket_sales[index + 1]),
+            'orders': int(bucket_orders[index + 1]),
+            'avg_order_value': float(avg_order_value[index]),
+            'growth_rate': round(float(growth[index]), 1)
+        })
+    return points
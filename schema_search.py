@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库结构搜索索引
+对表名、字段名及中文注释建立单字和二元组（bigram）倒排索引，子串和前缀搜索只需求几个倒排表的交集
+再核对候选文本，不必在每次搜索时遍历所有表和字段
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+
+# 匹配方式的排序权重：完全相同 < 前缀 < 单词开头（下划线之后）< 其他子串；注释匹配排在名称匹配之后
+EXACT, PREFIX, WORD, SUBSTRING = 0, 1, 2, 3
+COMMENT_PENALTY = 4
+
+
+def grams(text: str) -> Set[str]:
+    """文本的全部单字和二元组"""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class NgramIndex:
+    """文本 -> 引用的二元组倒排索引，相同文本只索引一次"""
+
+    def __init__(self):
+        self.texts = []
+        self.refs = []
+        self.weights = []
+        self.postings = {}
+        self._ids = {}
+
+    def add(self, text: str, ref: tuple, weight: int = 0):
+        """添加一条可搜索文本，weight 为注释等次要文本的排序惩罚"""
+        text = text.lower()
+        key = (text, weight)
+        text_id = self._ids.get(key)
+        if text_id is None:
+            text_id = self._ids[key] = len(self.texts)
+            self.texts.append(text)
+            self.refs.append([])
+            self.weights.append(weight)
+            for gram in grams(text):
+                self.postings.setdefault(gram, set()).add(text_id)
+        self.refs[text_id].append(ref)
+
+    def _candidates(self, keyword: str) -> Set[int]:
+        """包含 keyword 全部二元组（单个字符时为该字符）的文本"""
+        keys = [keyword[i:i + 2] for i in range(len(keyword) - 1)] or [keyword]
+        postings = [self.postings.get(gram) for gram in keys]
+        if not all(postings):
+            return set()
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def search(self, keyword: str, limit: int = None, accept=None) -> List[tuple]:
+        """按匹配方式、文本长度排序返回引用，同一引用只返回一次；accept 用于过滤引用"""
+        keyword = keyword.lower()
+        if not keyword:
+            return []
+
+        ranked = []
+        for text_id in self._candidates(keyword):
+            text = self.texts[text_id]
+            position = text.find(keyword)
+            if position < 0:
+                continue
+            if text == keyword:
+                rank = EXACT
+            elif position == 0:
+                rank = PREFIX
+            elif text[position - 1] in '_ ':
+                rank = WORD
+            else:
+                rank = SUBSTRING
+            ranked.append((rank + self.weights[text_id], len(text), text, text_id))
+        ranked.sort()
+
+        results, seen = [], set()
+        for _, _, _, text_id in ranked:
+            for ref in self.refs[text_id]:
+                if ref in seen or (accept is not None and not accept(ref)):
+                    continue
+                seen.add(ref)
+                results.append(ref)
+                if limit is not None and len(results) >= limit:
+                    return results
+        return results
+
+
+class SchemaSearchIndex:
+    """表、字段搜索索引
+
+    表引用为 (数据库, 表名, schema, 字段数)，字段引用为 (数据库, 表名, 字段名, 类型)，
+    搜索结果只包含这些摘要信息，表的完整定义在需要显示时再按表名读取
+    """
+
+    def __init__(self):
+        self.tables = NgramIndex()
+        self.columns = NgramIndex()
+        self._table_names = {}
+
+    def add_database(self, db_name: str, tables: Dict):
+        """把一个数据库的所有表和字段加入索引"""
+        for table_name, table_info in tables.items():
+            self.add_table(db_name, table_name, table_info['schema'], table_info['column_count'],
+                           table_info.get('comment'))
+            self.add_columns(db_name, table_name, [(column['name'], column['type'], column.get('comment'))
+                                                   for column in table_info['columns']])
+
+    def add_table(self, db_name: str, table_name: str, schema: str, column_count: int, comment: str = None):
+        ref = (db_name, table_name, schema, column_count)
+        self.tables.add(table_name, ref)
+        if comment:
+            self.tables.add(comment, ref, COMMENT_PENALTY)
+        self._table_names.setdefault(table_name.lower(), []).append((db_name, table_name))
+
+    def add_columns(self, db_name: str, table_name: str, columns):
+        """columns 为 (字段名, 类型, 注释) 序列"""
+        for column_name, column_type, comment in columns:
+            ref = (db_name, table_name, column_name, column_type)
+            self.columns.add(column_name, ref)
+            if comment:
+                self.columns.add(comment, ref, COMMENT_PENALTY)
+
+    def search_tables(self, keyword: str, database: str = None, limit: int = None) -> List[Tuple]:
+        return self.tables.search(keyword, limit, self._database_filter(database))
+
+    def search_columns(self, keyword: str, database: str = None, limit: int = None) -> List[Tuple]:
+        return self.columns.search(keyword, limit, self._database_filter(database))
+
+    def find_table(self, table_name: str, database: str = None) -> Optional[Tuple[str, str]]:
+        """不区分大小写查找表，返回 (数据库, 实际表名)"""
+        for db_name, actual_name in self._table_names.get(table_name.lower(), []):
+            if database is None or db_name == database:
+                return db_name, actual_name
+        return None
+
+    @staticmethod
+    def _database_filter(database: Optional[str]):
+        if database is None:
+            return None
+        return lambda ref: ref[0] == database
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库结构紧凑存储
+把 *_schema.json 转成带表偏移头的二进制文件：启动时只读取头部（数据库概要、模块分类、各表的偏移和摘要），
+表定义和字段搜索数据通过内存映射在用到时才解码
+
+文件布局:
+    MAGIC(8 字节) | 版本、头部长度（2 个 uint32）| 头部 JSON | 字段搜索段 JSON | 各表定义 JSON ...
+"""
+
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List
+
+MAGIC = b'QBSCHEMA'
+VERSION = 1
+_PREFIX = struct.Struct('<II')
+
+# 头部中保留的数据库概要字段
+SUMMARY_KEYS = ('database', 'total_tables', 'total_indexes', 'total_constraints', 'categories', 'tablespaces')
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def store_path(schema_file: Path) -> Path:
+    """*_schema.json 对应的紧凑存储文件"""
+    return schema_file.with_suffix('.store')
+
+
+def write_store(path: Path, analysis: Dict):
+    """由分析结果（*_schema.json 的内容）写出紧凑存储文件"""
+    tables = analysis['tables']
+    columns = {name: [[column['name'], column['type'], column.get('comment')] for column in table['columns']]
+               for name, table in tables.items()}
+
+    # 偏移量相对于头部之后的数据段
+    body = [_dumps(columns)]
+    offset = len(body[0])
+    entries = {}
+    for name, table in tables.items():
+        data = _dumps(table)
+        entries[name] = [offset, len(data), table['schema'], table['column_count'], table.get('comment')]
+        body.append(data)
+        offset += len(data)
+
+    header = {key: analysis[key] for key in SUMMARY_KEYS if key in analysis}
+    header['columns'] = [0, len(body[0])]
+    header['tables'] = entries
+    header_data = _dumps(header)
+
+    temp_path = Path(str(path) + '.tmp')
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_PREFIX.pack(VERSION, len(header_data)))
+        f.write(header_data)
+        for data in body:
+            f.write(data)
+    os.replace(temp_path, path)
+
+
+class SchemaStore:
+    """只读打开紧凑存储文件：构造时读取头部，表定义按需从内存映射中解码"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            if self._file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"不是数据库结构存储文件: {self.path}")
+            version, header_length = _PREFIX.unpack(self._file.read(_PREFIX.size))
+            if version != VERSION:
+                raise ValueError(f"存储文件版本 {version} 不受支持: {self.path}")
+            self.header = json.loads(self._file.read(header_length).decode('utf-8'))
+            self._body = len(MAGIC) + _PREFIX.size + header_length
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._cache = {}
+
+    def _decode(self, offset: int, length: int):
+        start = self._body + offset
+        return json.loads(self._map[start:start + length].decode('utf-8'))
+
+    def table(self, table_name: str) -> Dict:
+        """解码单个表的完整定义"""
+        table = self._cache.get(table_name)
+        if table is None:
+            offset, length = self.header['tables'][table_name][:2]
+            table = self._cache[table_name] = self._decode(offset, length)
+        return table
+
+    def columns(self) -> Dict[str, List[list]]:
+        """字段搜索数据 {表名: [[字段名, 类型, 注释], ...]}"""
+        return self._decode(*self.header['columns'])
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def open_store(schema_file: Path) -> SchemaStore:
+    """打开 *_schema.json 对应的紧凑存储，不存在或比 JSON 旧时先由 JSON 重新生成"""
+    path = store_path(schema_file)
+    if not path.exists() or path.stat().st_mtime < schema_file.stat().st_mtime:
+        with open(schema_file, 'r', encoding='utf-8') as f:
+            write_store(path, json.load(f))
+    return SchemaStore(path)